@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Offline download benchmarks for nexis_downloader.py
+
+Runs NexisDownloader against the local stand-in server (standin_server.py)
+and reports numbers instead of pass/fail:
+
+    throughput   MB/s for one large model, optionally behind a per-connection cap
+    resume       cost of finishing an interrupted download versus a fresh one
+    checksum     hashing time left after a streamed download versus a full re-read
+    scaling      wall time as the number of models grows
+    faults       a download through 429 replies, a mid-stream disconnect and latency
+    hf           a filtered HuggingFace repo fetch
+
+Results can be written with --json and compared against an earlier run with
+--baseline; a metric that is worse than the baseline by more than
+--tolerance makes the run exit non-zero, so regressions show up in CI
+without network access.
+
+Downloader settings are read from the environment as usual, e.g.
+NEXIS_SEGMENT_SIZE_MB=8 to benchmark smaller range pieces.
+
+    python3 benchmarks/run_benchmarks.py --size-mb 64 --json results.json
+    python3 benchmarks/run_benchmarks.py --baseline results.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from nexis_downloader import NexisDownloader
+from nexis_hashing import StreamingHasher, hash_file
+from nexis_transfer import SegmentedDownloader
+from standin_server import StandinServer
+
+import requests
+
+MB = 1024 * 1024
+
+
+def _payload(size):
+    return os.urandom(size)
+
+
+def _downloader(server, workspace, verbose=False):
+    downloader = NexisDownloader(debug_mode=verbose, workspace_dir=workspace)
+    downloader.civitai_api_base = server.url
+    downloader.hf_endpoint = server.url
+    if not verbose:
+        downloader.log = lambda *args, **kwargs: None
+    downloader.create_directory_structure()
+    return downloader
+
+
+def _events(downloader, event):
+    return [e for e in downloader.metrics.events if e['event'] == event]
+
+
+def _timed_download(server, workspace, version_id, verbose=False):
+    downloader = _downloader(server, workspace, verbose)
+    started = time.monotonic()
+    ok = downloader.download_civitai_model(version_id, 'checkpoints')
+    elapsed = time.monotonic() - started
+    if not ok:
+        raise RuntimeError(f"Benchmark download of {version_id} failed")
+    return downloader, elapsed
+
+
+def bench_throughput(size, bandwidth_bps=None, verbose=False):
+    with StandinServer(bandwidth_bps=bandwidth_bps) as server, tempfile.TemporaryDirectory() as workspace:
+        server.add_civitai_model(1001, "throughput.safetensors", _payload(size))
+        downloader, elapsed = _timed_download(server, workspace, '1001', verbose)
+        transfer = _events(downloader, 'transfer')[-1]
+        return {
+            'throughput_seconds': elapsed,
+            'throughput_mbps': size / MB / elapsed,
+            'throughput_ttfb_seconds': transfer['ttfb_seconds'],
+            'throughput_connections': transfer['connections'],
+        }
+
+
+def _interrupt(server, part_file, journal_file, url):
+    """Leave a journaled partial file behind by failing one range mid-stream"""
+    engine = SegmentedDownloader(requests.Session(), lambda *a, **k: None, max_piece_attempts=1,
+                                 piece_size=max(256 * 1024, len(server.models['1002']['data']) // 16))
+    try:
+        engine.download(url, part_file, StreamingHasher(part_file), journal_path=journal_file)
+    except requests.RequestException:
+        return
+    raise RuntimeError("The stand-in server did not interrupt the download")
+
+
+def bench_resume(size, verbose=False):
+    data = _payload(size)
+    with StandinServer() as server, tempfile.TemporaryDirectory() as workspace:
+        server.add_civitai_model(1002, "resume.safetensors", data)
+        _, fresh = _timed_download(server, workspace, '1002', verbose)
+
+    with StandinServer(disconnect_after=size // 64) as server, tempfile.TemporaryDirectory() as workspace:
+        server.add_civitai_model(1002, "resume.safetensors", data)
+        output_file = Path(workspace) / "downloads_tmp" / "checkpoints" / "resume.safetensors"
+        output_file.parent.mkdir(parents=True)
+        _interrupt(server, NexisDownloader._part_file(output_file), NexisDownloader._journal_file(output_file),
+                   f"{server.url}/files/1002/resume.safetensors")
+        server.reset_stats()
+        downloader, resumed = _timed_download(server, workspace, '1002', verbose)
+        transfer = _events(downloader, 'transfer')[-1]
+        return {
+            'resume_seconds': resumed,
+            'resume_fresh_seconds': fresh,
+            'resume_cost_ratio': resumed / fresh if fresh else 0.0,
+            'resume_reused_fraction': transfer['resumed_bytes'] / size,
+            'resume_refetched_fraction': server.stats['bytes_sent'] / size,
+        }
+
+
+def bench_checksum(size, verbose=False):
+    with StandinServer() as server, tempfile.TemporaryDirectory() as workspace:
+        server.add_civitai_model(1003, "checksum.safetensors", _payload(size))
+        downloader, _ = _timed_download(server, workspace, '1003', verbose)
+        output_file = Path(workspace) / "downloads_tmp" / "checkpoints" / "checksum.safetensors"
+        streaming = sum(e['duration_seconds'] for e in _events(downloader, 'checksum'))
+
+        started = time.monotonic()
+        hash_file(output_file)
+        reread = time.monotonic() - started
+
+        started = time.monotonic()
+        downloader.verified.file_hash(output_file)
+        manifest = time.monotonic() - started
+        return {
+            'checksum_streaming_tail_seconds': streaming,
+            'checksum_full_reread_seconds': reread,
+            'checksum_manifest_hit_seconds': manifest,
+        }
+
+
+def bench_scaling(size, counts, verbose=False):
+    results = {}
+    for count in counts:
+        with StandinServer() as server, tempfile.TemporaryDirectory() as workspace:
+            for index in range(count):
+                server.add_civitai_model(2000 + index, f"model_{index}.safetensors", _payload(size))
+            downloader = _downloader(server, workspace, verbose)
+            jobs = [{'source': 'civitai', 'category': 'loras', 'item_id': str(2000 + index)}
+                    for index in range(count)]
+            started = time.monotonic()
+            downloader.prefetch_civitai_metadata([job['item_id'] for job in jobs])
+            outcome = downloader.run_download_jobs(jobs)
+            elapsed = time.monotonic() - started
+            if outcome['loras']['failed']:
+                raise RuntimeError(f"{outcome['loras']['failed']} scaling downloads failed")
+            results[f'scaling_{count}_seconds'] = elapsed
+            results[f'scaling_{count}_mbps'] = count * size / MB / elapsed
+    return results
+
+
+def bench_faults(size, verbose=False):
+    with StandinServer(latency=0.02, rate_limited_requests=1, disconnect_after=size // 8) as server, \
+            tempfile.TemporaryDirectory() as workspace:
+        server.add_civitai_model(1004, "faults.safetensors", _payload(size))
+        downloader, elapsed = _timed_download(server, workspace, '1004', verbose)
+        transfer = _events(downloader, 'transfer')[-1]
+        return {
+            'faults_seconds': elapsed,
+            'faults_range_retries': transfer['retries'],
+            'faults_rate_limited': server.stats['rate_limited'],
+        }
+
+
+def bench_hf(size, verbose=False):
+    files = {
+        "unet/diffusion_pytorch_model.fp16.safetensors": _payload(size),
+        "unet/diffusion_pytorch_model.safetensors": _payload(size),
+        "unet/diffusion_pytorch_model.bin": _payload(size),
+        "vae/diffusion_pytorch_model.fp16.safetensors": _payload(size // 4),
+        "unet/config.json": b'{"sample_size": 128}',
+        "vae/config.json": b'{"scaling_factor": 0.13025}',
+    }
+    with StandinServer() as server, tempfile.TemporaryDirectory() as workspace:
+        server.add_hf_repo("bench/diffusers", files)
+        downloader = _downloader(server, workspace, verbose)
+        started = time.monotonic()
+        ok = downloader.download_hf_repo("bench/diffusers?include=*.fp16.safetensors;*.json")
+        elapsed = time.monotonic() - started
+        if not ok:
+            raise RuntimeError("Benchmark HF fetch failed")
+        total = sum(len(data) for data in files.values())
+        return {
+            'hf_seconds': elapsed,
+            'hf_fetched_fraction': server.stats['bytes_sent'] / total,
+        }
+
+
+SCENARIOS = ('throughput', 'resume', 'checksum', 'scaling', 'faults', 'hf')
+
+
+def run(scenarios, size, counts, bandwidth_bps=None, verbose=False):
+    results = {}
+    for name in scenarios:
+        started = time.monotonic()
+        if name == 'throughput':
+            results.update(bench_throughput(size, bandwidth_bps, verbose))
+        elif name == 'resume':
+            results.update(bench_resume(size, verbose))
+        elif name == 'checksum':
+            results.update(bench_checksum(size, verbose))
+        elif name == 'scaling':
+            results.update(bench_scaling(max(size // 8, 64 * 1024), counts, verbose))
+        elif name == 'faults':
+            results.update(bench_faults(size, verbose))
+        elif name == 'hf':
+            results.update(bench_hf(size // 2, verbose))
+        print(f"[BENCH] {name} finished in {time.monotonic() - started:.1f}s", file=sys.stderr)
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """Metrics worse than baseline by more than tolerance (seconds: lower is better, mbps: higher)"""
+    worse = []
+    for key, value in results.items():
+        previous = baseline.get(key)
+        if not isinstance(previous, (int, float)) or not previous:
+            continue
+        if key.endswith('_seconds') and value > previous * (1 + tolerance):
+            worse.append((key, previous, value))
+        elif key.endswith('_mbps') and value < previous * (1 - tolerance):
+            worse.append((key, previous, value))
+    return worse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline nexis_downloader.py benchmarks")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--size-mb', type=float, default=64, help="Model size for single-file scenarios")
+    parser.add_argument('--counts', default='1,4,16', help="Model counts for the scaling scenario")
+    parser.add_argument('--bandwidth-mbps', type=float, default=0,
+                        help="Per-connection bandwidth cap for the throughput scenario (0 = none)")
+    parser.add_argument('--json', help="Write results to this file")
+    parser.add_argument('--baseline', help="Compare against results from an earlier --json run")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed regression (fraction)")
+    parser.add_argument('--verbose', action='store_true', help="Show downloader logs")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = run(scenarios, int(args.size_mb * MB), [int(c) for c in args.counts.split(',') if c.strip()],
+                  bandwidth_bps=args.bandwidth_mbps * MB or None, verbose=args.verbose)
+    for key, value in sorted(results.items()):
+        print(f"{key:40} {value:12.4f}" if isinstance(value, float) else f"{key:40} {value:>12}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
+
+    if args.baseline:
+        worse = regressions(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for key, previous, value in worse:
+            print(f"[BENCH] REGRESSION {key}: {previous:.4f} -> {value:.4f}")
+        return 1 if worse else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the CivitAI and HuggingFace endpoints nexis_downloader.py uses
+
+Serves, from memory:
+
+    /api/v1/model-versions/<id>              CivitAI model-version metadata
+    /api/download/models/<id>                redirects to /files/<id>/<name>, like CivitAI's CDN
+                                             (?fp=&size=&format= pick a variant file)
+    /files/<id>/<name>                       model bytes, with Range support
+    /api/models/<repo>/revision/<rev>        HF revision listing (?blobs=true fields)
+    /<repo>/resolve/<commit>/<path>          HF file bytes, with Range support
+
+Faults can be injected to reproduce slow or flaky mirrors: per-request
+latency, a per-connection bandwidth cap, a number of 429 replies before a
+path is served, and a mid-stream disconnect after a number of bytes on the
+first transfer of each file.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlencode, urlparse
+
+CHUNK_SIZE = 64 * 1024
+
+
+class StandinServer:
+    """Threaded HTTP server holding fake CivitAI models and HF repos"""
+
+    def __init__(self, latency=0.0, bandwidth_bps=None, rate_limited_requests=0,
+                 disconnect_after=None, ranges=True):
+        self.latency = latency
+        self.bandwidth_bps = bandwidth_bps
+        self.rate_limited_requests = rate_limited_requests
+        self.disconnect_after = disconnect_after
+        self.ranges = ranges
+        self.models = {}
+        self.repos = {}
+        self.files = {}
+        self.lock = threading.Lock()
+        self._throttled = {}
+        self._disconnected = set()
+        self.reset_stats()
+        self._server = None
+
+    def reset_stats(self):
+        self.stats = {'requests': 0, 'bytes_sent': 0, 'rate_limited': 0, 'disconnects': 0,
+                      'range_requests': 0, 'peak_streams': 0}
+        self._streams = 0
+
+    def add_civitai_model(self, version_id, name, data, metadata=None):
+        self.models[str(version_id)] = {'name': name, 'data': data,
+                                        'sha256': hashlib.sha256(data).hexdigest(), 'variants': []}
+        self.models[str(version_id)]['metadata'] = metadata or {'format': 'SafeTensor', 'fp': 'fp16',
+                                                                'size': 'pruned'}
+
+    def add_civitai_variant(self, version_id, name, data, metadata):
+        """Another file of an existing model version (e.g. fp16 next to fp32)"""
+        self.models[str(version_id)]['variants'].append({
+            'name': name, 'data': data, 'sha256': hashlib.sha256(data).hexdigest(), 'metadata': metadata})
+
+    def add_file(self, path, data):
+        """A plain file served at /static/<path>, e.g. a seed pack"""
+        self.files[path] = data
+        return f"{self.url}/static/{quote(path)}"
+
+    def add_hf_repo(self, repo_id, files, commit=None):
+        commit = commit or hashlib.sha1(repo_id.encode()).hexdigest()
+        self.repos[repo_id] = {'commit': commit, 'files': dict(files)}
+        return commit
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.standin = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def _should_throttle(self, path):
+        with self.lock:
+            seen = self._throttled.get(path, 0)
+            if seen < self.rate_limited_requests:
+                self._throttled[path] = seen + 1
+                self.stats['rate_limited'] += 1
+                return True
+            return False
+
+    def _disconnect_budget(self, path, is_probe):
+        """Bytes to send before dropping the connection, or None to send everything"""
+        if self.disconnect_after is None or is_probe:
+            return None
+        with self.lock:
+            if path in self._disconnected:
+                return None
+            self._disconnected.add(path)
+            self.stats['disconnects'] += 1
+        return self.disconnect_after
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        standin = self.server.standin
+        standin._count('requests')
+        if standin.latency:
+            time.sleep(standin.latency)
+
+        parsed = urlparse(self.path)
+        path = unquote(parsed.path)
+        if standin._should_throttle(path):
+            return self._reply(429, b'{"error": "Too Many Requests"}', {'Retry-After': '0'})
+
+        parts = path.strip('/').split('/')
+        if path.startswith('/api/v1/model-versions/'):
+            return self._model_version(parts[-1])
+        if path.startswith('/api/download/models/'):
+            model = standin.models.get(parts[-1])
+            if not model:
+                return self._reply(404, b'{"error": "Not Found"}')
+            query = parse_qs(parsed.query)
+            wanted = {key: query[key][0] for key in ('fp', 'size', 'format') if key in query}
+            chosen = next((f for f in [model] + model['variants']
+                           if all(f['metadata'].get(key) == value for key, value in wanted.items())), model)
+            return self._reply(307, b'', {'Location': f"/files/{parts[-1]}/{quote(chosen['name'])}"})
+        if path.startswith('/files/') and len(parts) == 3:
+            model = standin.models.get(parts[1])
+            chosen = model and next((f for f in [model] + model['variants'] if f['name'] == parts[2]), None)
+            if not chosen:
+                return self._reply(404, b'')
+            return self._serve_bytes(path, chosen['data'], chosen['sha256'])
+        if path.startswith('/static/') and path[len('/static/'):] in standin.files:
+            data = standin.files[path[len('/static/'):]]
+            return self._serve_bytes(path, data, hashlib.sha256(data).hexdigest())
+        if path.startswith('/api/models/') and '/revision/' in path:
+            repo_id, _, revision = path[len('/api/models/'):].partition('/revision/')
+            return self._listing(repo_id, revision)
+        if '/resolve/' in path:
+            repo_id, _, rest = path.strip('/').partition('/resolve/')
+            commit, _, file_path = rest.partition('/')
+            repo = standin.repos.get(repo_id)
+            if not repo or commit != repo['commit'] or file_path not in repo['files']:
+                return self._reply(404, b'')
+            data = repo['files'][file_path]
+            return self._serve_bytes(path, data, hashlib.sha256(data).hexdigest())
+        return self._reply(404, b'')
+
+    def _model_version(self, version_id):
+        model = self.server.standin.models.get(version_id)
+        if not model:
+            return self._reply(404, b'{"error": "Not Found"}')
+        body = {
+            'id': int(version_id) if version_id.isdigit() else version_id,
+            'modelId': version_id,
+            'baseModel': 'SDXL 1.0',
+            'files': [{
+                'name': f['name'],
+                'sizeKB': len(f['data']) / 1024,
+                'hashes': {'SHA256': f['sha256'].upper()},
+                'downloadUrl': f"{self.server.standin.url}/api/download/models/{version_id}?"
+                               + urlencode({'type': 'Model', **f['metadata']}),
+                'type': 'Model',
+                'primary': f is model,
+                'metadata': f['metadata'],
+            } for f in [model] + model['variants']],
+        }
+        return self._reply(200, json.dumps(body).encode(), {'Content-Type': 'application/json'})
+
+    def _listing(self, repo_id, revision):
+        repo = self.server.standin.repos.get(repo_id)
+        if not repo:
+            return self._reply(404, b'{"error": "Repository not found"}')
+        siblings = []
+        for name, data in sorted(repo['files'].items()):
+            blob_id = hashlib.sha1(f"blob {len(data)}\0".encode() + data).hexdigest()
+            sibling = {'rfilename': name, 'size': len(data), 'blobId': blob_id}
+            if len(data) >= 1024:
+                sibling['lfs'] = {'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+            siblings.append(sibling)
+        body = {'id': repo_id, 'sha': repo['commit'], 'siblings': siblings}
+        return self._reply(200, json.dumps(body).encode(), {'Content-Type': 'application/json'})
+
+    def _serve_bytes(self, path, data, etag):
+        standin = self.server.standin
+        headers = {'ETag': f'"{etag}"', 'Accept-Ranges': 'bytes' if standin.ranges else 'none'}
+        start, end = 0, len(data) - 1
+        byte_range = self.headers.get('Range')
+        status = 200
+        if byte_range and standin.ranges and byte_range.startswith('bytes='):
+            first, _, last = byte_range[len('bytes='):].partition('-')
+            start = int(first)
+            end = min(int(last) if last else len(data) - 1, len(data) - 1)
+            if start >= len(data):
+                return self._reply(416, b'', {'Content-Range': f'bytes */{len(data)}'})
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{end}/{len(data)}'
+            standin._count('range_requests')
+        body = memoryview(data)[start:end + 1]
+        budget = standin._disconnect_budget(path, byte_range == 'bytes=0-0')
+        self._send_headers(status, len(body), headers)
+        with standin.lock:
+            standin._streams += 1
+            standin.stats['peak_streams'] = max(standin.stats['peak_streams'], standin._streams)
+        try:
+            self._write_throttled(body if budget is None else body[:budget])
+        finally:
+            with standin.lock:
+                standin._streams -= 1
+        if budget is not None and budget < len(body):
+            # Drop the connection mid-body, as a flaky CDN edge would
+            self.close_connection = True
+
+    def _write_throttled(self, body):
+        standin = self.server.standin
+        started = time.monotonic()
+        sent = 0
+        try:
+            for offset in range(0, len(body), CHUNK_SIZE):
+                chunk = body[offset:offset + CHUNK_SIZE]
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                if standin.bandwidth_bps:
+                    ahead = sent / standin.bandwidth_bps - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        standin._count('bytes_sent', sent)
+
+    def _send_headers(self, status, length, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(length))
+        self.end_headers()
+
+    def _reply(self, status, body, headers=None):
+        self._send_headers(status, len(body), headers)
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -13,83 +13,173 @@ PYTHON="${PYTHON:-${VIRTUAL_ENV}/bin/python}"
 # ---- Logging helper ----
 log() { echo "[$(date -u +'%Y-%m-%dT%H:%M:%SZ')] $*"; }
 
+# ---- Startup mode ----
+# sequential:  download and organize models, then start services (default)
+# progressive: start services first; models appear in models/ as they are verified
+STARTUP_MODE="${NEXIS_STARTUP_MODE:-sequential}"
+export NEXIS_STARTUP_MODE="${STARTUP_MODE}"
+
 # ---- Signal handling ----
 SERVICE_MANAGER_PID=""
+DOWNLOAD_PID=""
 
 forward_signal() {
   local sig="$1"
   log "Signal $sig received."
+  if [[ -n "${DOWNLOAD_PID}" ]] && kill -0 "${DOWNLOAD_PID}" 2>/dev/null; then
+    log "Stopping background downloads (pid=${DOWNLOAD_PID}); they resume on next start..."
+    # Signal the whole group: the downloader and prewarm run as children of the subshell
+    kill -TERM -- "-${DOWNLOAD_PID}" 2>/dev/null || true
+  fi
   if [[ -n "${SERVICE_MANAGER_PID}" ]] && kill -0 "${SERVICE_MANAGER_PID}" 2>/dev/null; then
-    log "Forwarding $sig to service manager (pid=${SERVICE_MANAGER_PID})..."
+    log "Forwarding $sig to supervisor (pid=${SERVICE_MANAGER_PID})..."
     kill -"$sig" "${SERVICE_MANAGER_PID}" || true
     wait "${SERVICE_MANAGER_PID}" || true
   else
-    log "Service manager not running; nothing to forward."
+    log "Supervisor not running; nothing to forward."
   fi
   exit 0
 }
 trap 'forward_signal TERM' TERM
 trap 'forward_signal INT'  INT
 
+# ---- Startup profile ----
+# Wall time of every boot phase, written to <state dir>/startup_profile.json
+export NEXIS_STATE_DIR="${NEXIS_STATE_DIR:-${WORKSPACE}/.nexis}"
+PROFILE_FILE="${NEXIS_STATE_DIR}/startup_profile.json"
+BOOT_STARTED_NS=$(date +%s%N)
+PROFILE_PHASES=()
+PHASE_NAME=""
+PHASE_STARTED_NS=0
+
+ms_since() { echo $(( ($(date +%s%N) - $1) / 1000000 )); }
+seconds() { printf '%d.%03d' $(( $1 / 1000 )) $(( $1 % 1000 )); }
+
+phase() {
+  # phase <name>: close the running phase (if any) and start timing the next; "" only closes
+  if [[ -n "${PHASE_NAME}" ]]; then
+    PROFILE_PHASES+=("{\"name\": \"${PHASE_NAME}\", \"seconds\": $(seconds "$(ms_since "${PHASE_STARTED_NS}")")}")
+  fi
+  PHASE_NAME="${1:-}"
+  PHASE_STARTED_NS=$(date +%s%N)
+}
+
+write_profile() {
+  phase ""
+  local total phases
+  total=$(ms_since "${BOOT_STARTED_NS}")
+  phases=$(IFS=,; echo "${PROFILE_PHASES[*]}")
+  mkdir -p "${NEXIS_STATE_DIR}"
+  printf '{"started_at": %d, "mode": "%s", "boot_cache": "%s", "total_seconds": %s, "phases": [%s]}\n' \
+    "$(( BOOT_STARTED_NS / 1000000000 ))" "${STARTUP_MODE}" "${BOOT_CACHE}" "$(seconds "${total}")" "${phases}" \
+    > "${PROFILE_FILE}.tmp" && mv -f "${PROFILE_FILE}.tmp" "${PROFILE_FILE}"
+  log "Startup took $(seconds "${total}")s before services started; profile: ${PROFILE_FILE}"
+}
+
 # ---- Startup sequence ----
 log "Starting Nexis Entrypoint..."
 log "Using Python: $(command -v python 2>/dev/null || echo 'not-in-PATH'), $($PYTHON -V 2>/dev/null || echo 'venv-python not found')"
 log "WORKSPACE: ${WORKSPACE}"
 
-# ---- Comprehensive ComfyUI package structure fix ----
 COMFYUI_PATH="${WORKSPACE}/ComfyUI"
-log "Ensuring ComfyUI package structure..."
-
-if [ -d "$COMFYUI_PATH" ]; then
-    # Find all directories that contain Python files and ensure they have __init__.py
-    find "$COMFYUI_PATH" -type d | while read -r dir; do
-        # Check if directory contains any .py files
-        if [ -n "$(find "$dir" -maxdepth 1 -name "*.py" -print -quit)" ]; then
-            init_file="$dir/__init__.py"
-            if [ ! -f "$init_file" ]; then
-                log "Creating missing package init: $init_file"
-                touch "$init_file"
-            fi
-        fi
-    done
-    
-    # Explicitly handle critical directories that must be packages
-    for critical_dir in utils app comfy model_management nodes execution; do
-        full_path="$COMFYUI_PATH/$critical_dir"
-        if [ -d "$full_path" ]; then
-            init_file="$full_path/__init__.py"
-            if [ ! -f "$init_file" ]; then
-                log "Creating critical package init: $init_file"
-                touch "$init_file"
-            fi
-        fi
-    done
-    
-    # Handle nested critical directories
-    for nested_dir in utils/install_util app/frontend_management; do
-        parent_dir="$COMFYUI_PATH/$(dirname "$nested_dir")"
-        if [ -d "$parent_dir" ]; then
-            init_file="$parent_dir/__init__.py"
-            if [ ! -f "$init_file" ]; then
-                log "Creating nested package init: $init_file"
-                touch "$init_file"
-            fi
-        fi
-    done
+COMFYUI_VERSION="$(. /home/comfyuser/config/versions.conf 2>/dev/null; echo "${COMFYUI_VERSION:-unknown}")"
+PYTORCH_VERSION="$(. /home/comfyuser/config/versions.conf 2>/dev/null; echo "${PYTORCH_VERSION:-unknown}")"
+
+# ---- Boot cache ----
+# The package fix-up, dependency validation and ComfyUI import test only need to
+# run when ComfyUI, the venv or the pinned versions changed. A stamp records the
+# versions of the last clean run; its mtime is compared with the source tree
+# (runtime data directories excluded) and the venv. NEXIS_BOOT_CACHE=false always
+# runs the checks; the supervisor removes the stamp if ComfyUI fails to start.
+export NEXIS_BOOT_STAMP="${NEXIS_STATE_DIR}/boot.stamp"
+BOOT_KEY="comfyui=${COMFYUI_VERSION} torch=${PYTORCH_VERSION}"
+
+boot_cache_fresh() {
+  [[ "${NEXIS_BOOT_CACHE:-true}" != "false" && -f "${NEXIS_BOOT_STAMP}" && -d "${COMFYUI_PATH}" ]] || return 1
+  [[ "$(head -n 1 "${NEXIS_BOOT_STAMP}")" == "${BOOT_KEY}" ]] || return 1
+  local changed
+  changed=$(find "${COMFYUI_PATH}" -mindepth 1 \
+      \( -path "${COMFYUI_PATH}/models" -o -path "${COMFYUI_PATH}/output" -o -path "${COMFYUI_PATH}/input" \
+         -o -path "${COMFYUI_PATH}/temp" -o -path "${COMFYUI_PATH}/user" -o -name __pycache__ -o -name .git \) -prune \
+      -o \( -type d -o -name '*.py' \) -newer "${NEXIS_BOOT_STAMP}" -print -quit 2>/dev/null)
+  if [[ -z "${changed}" ]]; then
+    changed=$(find "${VIRTUAL_ENV}/lib" -maxdepth 3 -type d -newer "${NEXIS_BOOT_STAMP}" -print -quit 2>/dev/null)
+  fi
+  if [[ -n "${changed}" ]]; then
+    log "Boot cache: ${changed} changed since the last clean boot"
+    return 1
+  fi
+}
+
+fix_package_structure() {
+  # Every directory holding .py files must be a package: one walk, no fork per directory
+  find "$COMFYUI_PATH" -name '*.py' -printf '%h\n' | sort -u | while read -r dir; do
+    init_file="$dir/__init__.py"
+    if [ ! -f "$init_file" ]; then
+      log "Creating missing package init: $init_file"
+      touch "$init_file"
+    fi
+  done
+
+  # Explicitly handle critical directories that must be packages
+  for critical_dir in utils app comfy model_management nodes execution; do
+    full_path="$COMFYUI_PATH/$critical_dir"
+    if [ -d "$full_path" ]; then
+      init_file="$full_path/__init__.py"
+      if [ ! -f "$init_file" ]; then
+        log "Creating critical package init: $init_file"
+        touch "$init_file"
+      fi
+    fi
+  done
+
+  # Handle nested critical directories
+  for nested_dir in utils/install_util app/frontend_management; do
+    parent_dir="$COMFYUI_PATH/$(dirname "$nested_dir")"
+    if [ -d "$parent_dir" ]; then
+      init_file="$parent_dir/__init__.py"
+      if [ ! -f "$init_file" ]; then
+        log "Creating nested package init: $init_file"
+        touch "$init_file"
+      fi
+    fi
+  done
+}
+
+phase boot_check
+if boot_cache_fresh; then
+  BOOT_CACHE=hit
+  log "ComfyUI ${COMFYUI_VERSION} and the venv are unchanged since the last clean boot; skipping pre-flight checks."
+  export NEXIS_DEPENDENCIES_VALIDATED=1 NEXIS_SKIP_IMPORT_CHECK=1
 else
+  BOOT_CACHE=miss
+  # ---- Comprehensive ComfyUI package structure fix ----
+  phase package_fixup
+  log "Ensuring ComfyUI package structure..."
+  if [ -d "$COMFYUI_PATH" ]; then
+    fix_package_structure
+  else
     log "WARNING: ComfyUI directory not found at $COMFYUI_PATH"
-fi
+  fi
 
-# (Optional) runtime dependency check – only when a CUDA driver is present
-# Decide whether to skip CUDA probe
-if ! nvidia-smi >/dev/null 2>&1; then
-  export SKIP_CUDA_CHECK=1
-fi
+  # (Optional) runtime dependency check – only when a CUDA driver is present
+  phase validate_dependencies
+  # Decide whether to skip CUDA probe
+  if ! nvidia-smi >/dev/null 2>&1; then
+    export SKIP_CUDA_CHECK=1
+  fi
 
-/home/comfyuser/scripts/validate_dependencies.sh \
-  || log "Dependency validation reported issues (continuing anyway)"
+  if /home/comfyuser/scripts/validate_dependencies.sh; then
+    export NEXIS_DEPENDENCIES_VALIDATED=1  # system_setup.sh need not repeat it
+    mkdir -p "${NEXIS_STATE_DIR}"
+    printf '%s\n' "${BOOT_KEY}" > "${NEXIS_BOOT_STAMP}"
+  else
+    log "Dependency validation reported issues (continuing anyway)"
+  fi
+fi
 
 # 1) System setup (fail hard if this fails)
+phase system_setup
 log "Running system setup..."
 if ! /home/comfyuser/scripts/system_setup.sh; then
   log "System setup failed. Exiting."
@@ -99,29 +189,76 @@ fi
 # 2) Ensure debug directory (use WORKSPACE, not /workspace)
 mkdir -p "${WORKSPACE}/debug/failed_downloads"
 
-# 3) Model downloads (soft-fail)
-log "Running download manager..."
-if ! /home/comfyuser/scripts/download_manager.sh; then
-  log "Download manager failed. Continuing without models."
-fi
+run_downloads() {
+  verify_models
+  # 3) Model downloads (soft-fail); the downloader also organizes them into models/
+  log "Running download manager..."
+  if ! /home/comfyuser/scripts/download_manager.sh; then
+    log "Download manager failed. Continuing without models."
+  fi
+  prewarm_models
+}
 
-# 4) File organization (soft-fail)
-log "Running file organizer..."
-if ! /home/comfyuser/scripts/file_organizer.sh; then
-  log "File organizer failed. Continuing with existing files."
-fi
+verify_models() {
+  # Optional: structural check of existing .safetensors files; quarantined ones are downloaded again below
+  case "${NEXIS_VERIFY_MODELS:-off}" in
+    report)
+      python3 /home/comfyuser/scripts/nexis_safetensors.py \
+        || log "Model verification found broken safetensors files (see above)" ;;
+    quarantine)
+      python3 /home/comfyuser/scripts/nexis_safetensors.py --quarantine \
+        || log "Broken safetensors files moved to ${WORKSPACE}/debug/corrupted_models" ;;
+  esac
+}
+
+prewarm_models() {
+  # Optional: read selected models into the page cache in the background, at low priority
+  [[ -n "${NEXIS_PREWARM:-}" ]] || return 0
+  log "Prewarming models matching: ${NEXIS_PREWARM}"
+  local cmd=(nice -n 10 python3 /home/comfyuser/scripts/nexis_prewarm.py)
+  if command -v ionice >/dev/null 2>&1; then
+    cmd=(ionice -c 2 -n 7 "${cmd[@]}")
+  fi
+  "${cmd[@]}" &
+}
 
-# 5) Launch services
-log "Starting service manager..."
-/home/comfyuser/scripts/service_manager.sh &
-SERVICE_MANAGER_PID=$!
-log "Service manager started (pid=${SERVICE_MANAGER_PID})."
+start_services() {
+  # 4) Launch services; the supervisor restarts a crashed ComfyUI or FileBrowser in place
+  log "Starting supervisor..."
+  "$PYTHON" /home/comfyuser/scripts/nexis_supervisor.py &
+  SERVICE_MANAGER_PID=$!
+  log "Supervisor started (pid=${SERVICE_MANAGER_PID})."
+}
+
+if [[ "${STARTUP_MODE}" == "progressive" ]]; then
+  log "Progressive startup: services start now, models are added as they are verified."
+  log "Download progress: ${NEXIS_STATE_DIR:-${WORKSPACE}/.nexis}/status.json"
+  phase start_services
+  start_services
+  # Job control gives the background job its own process group (pgid = DOWNLOAD_PID)
+  set -m
+  run_downloads &
+  DOWNLOAD_PID=$!
+  set +m
+  log "Background downloads started (pid=${DOWNLOAD_PID})."
+else
+  phase downloads
+  run_downloads
+  phase start_services
+  start_services
+fi
+write_profile
 
 # ---- Health monitoring ----
 while true; do
   if ! kill -0 "${SERVICE_MANAGER_PID}" 2>/dev/null; then
-    log "Service manager has exited. Shutting down."
+    log "Supervisor has exited. Shutting down."
     exit 1
   fi
+  if [[ -n "${DOWNLOAD_PID}" ]] && ! kill -0 "${DOWNLOAD_PID}" 2>/dev/null; then
+    wait "${DOWNLOAD_PID}" || true
+    log "Background downloads finished."
+    DOWNLOAD_PID=""
+  fi
   sleep 30
 done
\ No newline at end of file
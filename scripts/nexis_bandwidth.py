@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Nexis bandwidth shaping - one budget for every download in the process
+
+All range connections, single-stream downloads and HF file fetches draw from
+a shared token bucket (NEXIS_BANDWIDTH_LIMIT_MBPS) and from per-host
+connection budgets (NEXIS_HOST_CONNECTIONS), so parallel downloads share the
+link instead of starving one another or saturating the NIC.
+
+Limits can change while downloads run. A watcher thread applies:
+
+    <state dir>/bandwidth.json   {"limit_mbps": 20}  (operator override, 0 = unlimited)
+    ComfyUI /queue               NEXIS_BUSY_BANDWIDTH_MBPS while a prompt is queued or running
+
+so interactive generation is not slowed down by downloads in progressive
+startup mode.
+"""
+
+import json
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+from nexis_state import read_json
+
+MB = 1024 * 1024
+
+
+class TokenBucket:
+    """Blocking token bucket in bytes per second; a rate of None means unlimited"""
+
+    def __init__(self, rate=None, burst_seconds=1.0):
+        self.burst_seconds = burst_seconds
+        self._lock = threading.Lock()
+        self._rate = None
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.set_rate(rate)
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self._rate = rate if rate and rate > 0 else None
+            if self._rate is not None:
+                self._tokens = min(self._tokens, self._capacity())
+
+    def _capacity(self):
+        return self._rate * self.burst_seconds
+
+    def _refill(self):
+        now = time.monotonic()
+        if self._rate is not None:
+            self._tokens = min(self._capacity(), self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def consume(self, amount):
+        """Wait until amount bytes may be sent; chunks larger than the burst go into debt"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._rate is None:
+                    return
+                if self._tokens > 0:
+                    self._tokens -= amount
+                    return
+                # Sleep in short steps so a rate change takes effect promptly
+                wait = min(-self._tokens / self._rate + 0.001, 0.25)
+            time.sleep(wait)
+
+
+class HostBudget:
+    """Counting limit on open connections per host, shared by all downloads"""
+
+    def __init__(self, limit):
+        self._limit = max(1, limit)
+        self._active = {}
+        self._changed = threading.Condition()
+
+    @property
+    def limit(self):
+        return self._limit
+
+    def set_limit(self, limit):
+        with self._changed:
+            self._limit = max(1, limit)
+            self._changed.notify_all()
+
+    def active(self, host):
+        with self._changed:
+            return self._active.get(host, 0)
+
+    def acquire(self, host, timeout=None):
+        """Take a slot for host; returns False if none freed up within timeout"""
+        with self._changed:
+            if not self._changed.wait_for(lambda: self._active.get(host, 0) < self._limit, timeout):
+                return False
+            self._active[host] = self._active.get(host, 0) + 1
+            return True
+
+    def release(self, host):
+        with self._changed:
+            self._active[host] -= 1
+            if not self._active[host]:
+                del self._active[host]
+            self._changed.notify_all()
+
+    @contextmanager
+    def slot(self, host):
+        self.acquire(host)
+        try:
+            yield
+        finally:
+            self.release(host)
+
+
+class BandwidthShaper:
+    """The process-wide bucket and host budgets, with runtime limit changes"""
+
+    def __init__(self, limit_bps=None, host_connections=24, busy_limit_bps=None,
+                 control_file=None, queue_url=None, log=None, poll_interval=5.0):
+        self.limit_bps = limit_bps
+        self.busy_limit_bps = busy_limit_bps
+        self.control_file = control_file
+        self.queue_url = queue_url
+        self.log = log or (lambda *args, **kwargs: None)
+        self.poll_interval = poll_interval
+        self.bucket = TokenBucket(limit_bps)
+        self.hosts = HostBudget(host_connections)
+        self.busy = False
+        self._override = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def consume(self, amount):
+        self.bucket.consume(amount)
+
+    def limited(self):
+        """True when a limit is configured, always or while ComfyUI is busy"""
+        return bool(self.limit_bps or self.busy_limit_bps)
+
+    def effective_limit(self):
+        """The configured limit, replaced by an override and lowered while ComfyUI is busy"""
+        limit = self.limit_bps if self._override is None else self._override
+        if self.busy and self.busy_limit_bps:
+            limit = min(limit, self.busy_limit_bps) if limit else self.busy_limit_bps
+        return limit or None
+
+    def apply(self, busy=None, override=None):
+        """Update the runtime inputs and retune the bucket; override 0 means unlimited"""
+        if busy is not None:
+            self.busy = busy
+        if override is not None:
+            self._override = override if override > 0 else 0
+        limit = self.effective_limit()
+        if limit != self.bucket.rate:
+            self.log(f"Bandwidth limit now {_describe(limit)}"
+                     f"{' (ComfyUI queue active)' if self.busy and self.busy_limit_bps else ''}")
+            self.bucket.set_rate(limit)
+
+    def start(self):
+        """Start watching the control file and ComfyUI queue, if either is configured"""
+        if self._thread is not None or not (self.control_file or (self.queue_url and self.busy_limit_bps)):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="nexis-bandwidth", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.poll_interval)
+
+    def poll(self):
+        override = None
+        if self.control_file is not None:
+            data = read_json(self.control_file)
+            if isinstance(data, dict) and isinstance(data.get('limit_mbps'), (int, float)):
+                override = data['limit_mbps'] * MB
+            elif self._override is not None:
+                self._override = None  # control file removed: back to the configured limit
+        busy = comfyui_busy(self.queue_url) if self.queue_url and self.busy_limit_bps else None
+        self.apply(busy=busy, override=override)
+
+
+def comfyui_busy(queue_url, timeout=2.0):
+    """True while ComfyUI has prompts running or pending; False when unreachable"""
+    try:
+        with urllib.request.urlopen(queue_url, timeout=timeout) as response:
+            queue = json.load(response)
+    except (OSError, ValueError):
+        return False
+    return bool(queue.get('queue_running') or queue.get('queue_pending'))
+
+
+def _describe(limit):
+    return f"{limit / MB:.1f} MB/s" if limit else "unlimited"
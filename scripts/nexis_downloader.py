@@ -4,216 +4,919 @@ Nexis Download Manager - Python Implementation
 Combines Hearmeman's reliable CivitAI approach with Phoenix's parallel processing capabilities
 """
 
+import argparse
 import requests
 import os
 import subprocess
 import sys
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
+from urllib.parse import quote, urlparse
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from nexis_bandwidth import MB, BandwidthShaper
+from nexis_eviction import AccessLog, Evictor, parse_pins
+from nexis_hashing import StreamingHasher, VerifiedManifest, hash_file
+from nexis_locks import LockTimeout, single_flight
+from nexis_hf import HfListingCache, file_url, git_blob_id, is_commit_sha, parse_hf_spec, select_files
+from nexis_lockfile import LockFile, job_key
+from nexis_manifest import ManifestError, load_manifest, make_job, merge_jobs, prioritize
+from nexis_metadata import CivitaiMetadataCache
+from nexis_metrics import MetricsRecorder, format_bytes
+from nexis_organizer import ModelOrganizer
+from nexis_planner import allocated_bytes, available_bytes, plan_downloads
+from nexis_retry import HostRetry, HostUnavailable, host_of
+from nexis_variants import parse_civitai_spec, parse_policy, select_variant, variant_url
+from nexis_seedpack import SeedPack, SeedPackError, matches, write_pack
+from nexis_safetensors import InvalidSafetensors, check as check_safetensors
+from nexis_status import DownloadStatus
+from nexis_store import ModelStore
+from nexis_transfer import SegmentedDownloader
+
+# aria2c exit codes worth retrying: timeout, network problem, name resolution,
+# unexpected HTTP response (429/5xx) and server overloaded
+ARIA2C_RETRY_EXIT_CODES = frozenset({2, 6, 19, 22, 29})
+
 
 class NexisDownloader:
-    def __init__(self, debug_mode=False):
+    def __init__(self, debug_mode=False, workspace_dir=None):
         self.debug_mode = debug_mode
-        self.download_tmp_dir = Path("/home/comfyuser/workspace/downloads_tmp")
+        self.workspace_dir = Path(workspace_dir or os.getenv('WORKSPACE', '/home/comfyuser/workspace'))
+        self.download_tmp_dir = self.workspace_dir / "downloads_tmp"
         self.download_tmp_dir.mkdir(exist_ok=True)
+        self.models_dir = self.workspace_dir / "models"
+        self.state_dir = Path(os.getenv('NEXIS_STATE_DIR', str(self.workspace_dir / ".nexis")))
+        self._log_lock = threading.Lock()
+
+        # One bandwidth budget for every download: a shared token bucket plus a
+        # connection budget per host, also used to size the HTTP connection pool
+        self.host_connections = _env_int('NEXIS_HOST_CONNECTIONS', 24)
+        self.shaper = BandwidthShaper(
+            limit_bps=_env_int('NEXIS_BANDWIDTH_LIMIT_MBPS', 0) * MB or None,
+            host_connections=self.host_connections,
+            busy_limit_bps=_env_int('NEXIS_BUSY_BANDWIDTH_MBPS', 0) * MB or None,
+            control_file=self.state_dir / "bandwidth.json",
+            queue_url=f"http://127.0.0.1:{os.getenv('COMFYUI_PORT', '8188')}/queue",
+            log=self.log
+        )
         self.session = self._create_session()
 
+        # Per-phase timing events (events.jsonl) and a Prometheus textfile
+        self.metrics = MetricsRecorder(Path(os.getenv('NEXIS_METRICS_DIR', str(self.state_dir / "metrics"))))
+
+        # Per-host retries (Retry-After, adaptive backoff) and circuit breakers;
+        # jobs for a paused host are requeued up to max_deferrals times
+        self.retry = HostRetry(
+            attempts=_env_int('NEXIS_RETRY_ATTEMPTS', 5),
+            max_delay=_env_int('NEXIS_RETRY_MAX_DELAY_SECONDS', 60),
+            failure_threshold=_env_int('NEXIS_CIRCUIT_FAILURES', 5),
+            cooldown=_env_int('NEXIS_CIRCUIT_COOLDOWN_SECONDS', 30),
+            emit=self.metrics.emit, log=self.log
+        )
+        self.max_deferrals = _env_int('NEXIS_MAX_DEFERRALS', 3)
+
+        # Persistent CivitAI metadata, plus an in-memory view for this run
+        self.metadata_cache = CivitaiMetadataCache(
+            self.state_dir / "civitai_metadata",
+            max_age_hours=_env_int('NEXIS_METADATA_MAX_AGE_HOURS', 168)
+        )
+        self.metadata_workers = _env_int('NEXIS_METADATA_WORKERS', 8)
+        self.civitai_api_base = os.getenv('CIVITAI_API_BASE', 'https://civitai.com').rstrip('/')
+
+        # Which file of a CivitAI version to download: an item's own ?variant=,
+        # else its category's policy, else the global one (none: the first file)
+        self.civitai_variant = self._variant_policy('NEXIS_CIVITAI_VARIANT')
+        self.civitai_variants = {
+            category: self._variant_policy(f"NEXIS_CIVITAI_VARIANT_{category.upper()}")
+            for category in ('checkpoints', 'loras', 'vae')
+        }
+
+        # Files already hashed, trusted while their size/mtime/inode are unchanged
+        self.verified = VerifiedManifest(self.state_dir / "verified_files.json")
+
+        # Content-addressed store shared by all categories and HF trees
+        self.store = ModelStore(Path(os.getenv('NEXIS_MODEL_STORE_DIR', str(self.state_dir / "store"))))
+        self.store_min_size = _env_int('NEXIS_STORE_MIN_SIZE_MB', 1) * 1024 * 1024
+
+        # 'native' (the default) downloads in-process over adaptive range connections
+        # and hashes while downloading; 'aria2c', the default before it, shells out
+        # with a fixed 8 connections and hashes the finished file
+        self.download_backend = os.getenv('NEXIS_DOWNLOAD_BACKEND', 'native').strip().lower()
+        self.max_connections_per_host = _env_int('NEXIS_MAX_CONNECTIONS_PER_HOST', 16)
+        self.segment_size = _env_int('NEXIS_SEGMENT_SIZE_MB', 32) * 1024 * 1024
+
+        # HF repos are listed through the Hub API and fetched file by file;
+        # 'cli' keeps the previous huggingface-cli snapshot download
+        self.hf_endpoint = os.getenv('HF_ENDPOINT', 'https://huggingface.co').rstrip('/')
+        self.hf_backend = os.getenv('NEXIS_HF_BACKEND', 'native').strip().lower()
+        self.hf_file_workers = _env_int('NEXIS_HF_FILE_WORKERS', 4)
+        self.hf_listing_cache = HfListingCache(self.state_dir / "hf_listings")
+        if self.shaper.limited():
+            # Only in-process transfers draw from the token bucket and host budgets
+            if self.hf_backend == 'cli':
+                self.log("ℹ️ huggingface-cli ignores the bandwidth limit, so HuggingFace repos are "
+                         "downloaded with the native backend")
+            if self.download_backend == 'aria2c':
+                self.log("ℹ️ aria2c gets a fixed share of the bandwidth limit when each download starts; "
+                         "later changes and the busy-time limit do not apply to it")
+        self._hf_listings = {}
+        self._hf_listings_lock = threading.Lock()
+        self._civitai_info = {}
+        self._civitai_info_lock = threading.Lock()
+
+        # Cross-process single-flight locks, shared by every process using this state dir
+        self.locks_dir = self.state_dir / "locks"
+        self.lock_timeout = _env_int('NEXIS_LOCK_WAIT_MINUTES', 120) * 60
+
+        # Pre-flight disk planning: what to do when a run does not fit
+        self.disk_policy = os.getenv('NEXIS_DISK_POLICY', 'trim').strip().lower()
+        self.disk_reserve = _env_int('NEXIS_DISK_RESERVE_MB', 1024) * 1024 * 1024
+
+        # Parallel copy workers when organizing across filesystems
+        self.copy_workers = _env_int('NEXIS_COPY_WORKERS', 4)
+
+        # 'progressive' startup runs ComfyUI while downloads continue, so each
+        # verified model is moved into models/ as soon as it is ready
+        self.startup_mode = os.getenv('NEXIS_STARTUP_MODE', 'sequential').strip().lower()
+        self.publish_on_verify = self.startup_mode == 'progressive'
+        self.status = DownloadStatus(self.state_dir / "status.json", mode=self.startup_mode)
+
+        # What the last run resolved; an unchanged restart is served from it without
+        # network calls unless refresh is set (--refresh / NEXIS_REFRESH=true)
+        self.lockfile = LockFile(self.state_dir / "nexis.lock.json")
+        self.refresh = os.getenv('NEXIS_REFRESH', 'false').lower() == 'true'
+
+        # Models requested by each run, and LRU eviction of the others when a run
+        # would fill the models volume past the high-water mark (unset: never evict)
+        self.model_access = AccessLog(self.state_dir / "model_access.json")
+        high_water = min(100, _env_int('NEXIS_EVICTION_HIGH_WATER_PERCENT', 0))
+        self.evictor = Evictor(
+            self.workspace_dir, self.store, self.verified, self.lockfile, self.model_access, self.log,
+            high_water=high_water / 100,
+            low_water=min(high_water, _env_int('NEXIS_EVICTION_LOW_WATER_PERCENT', max(1, high_water - 10))) / 100,
+            pins=parse_pins(os.getenv('NEXIS_EVICTION_PINS', '')), metrics=self.metrics
+        ) if high_water else None
+
+        # Optional manifest of prioritized items, merged with the *_TO_DOWNLOAD lists
+        self.manifest_path = os.getenv('NEXIS_DOWNLOAD_MANIFEST', '').strip() or None
+
+        # Scheduler limits: a global worker cap plus one cap per download source
+        self.max_concurrent_downloads = _env_int('NEXIS_MAX_CONCURRENT_DOWNLOADS', 6)
+        self.source_limits = {
+            'hf': _env_int('NEXIS_MAX_HF_DOWNLOADS', 2),
+            'civitai': _env_int('NEXIS_MAX_CIVITAI_DOWNLOADS', 4),
+        }
+
     def _create_session(self):
         """Create a requests session with retry logic."""
         session = requests.Session()
+        # Connection-level retries only: status retries, Retry-After and backoff
+        # are handled per host by self.retry
         retry_strategy = Retry(
-            total=5,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
+            total=2,
+            backoff_factor=0.5,
+            status=0,
+            respect_retry_after_header=False,
             allowed_methods=["HEAD", "GET", "OPTIONS"]
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # The default pool keeps 10 connections per host; range workers need one each
+        adapter = HTTPAdapter(max_retries=retry_strategy, pool_maxsize=self.host_connections)
         session.mount("https://", adapter)
         session.mount("http://", adapter)
         return session
 
+    def _variant_policy(self, name):
+        """A variant policy from the environment, normalized to 'pref;pref', or None"""
+        try:
+            return ';'.join(parse_policy(os.getenv(name, ''))) or None
+        except ValueError as e:
+            self.log(f"❌ ERROR: Ignoring {name}: {e}")
+            return None
+
     def log(self, message, is_debug=False):
         """Logging function with debug support"""
         prefix = "[DOWNLOAD-DEBUG]" if is_debug else "[DOWNLOAD]"
         if is_debug and not self.debug_mode:
             return
-        print(f"  {prefix} {message}")
+        with self._log_lock:
+            print(f"  {prefix} {message}")
 
     def download_hf_repos(self, repos_list, token=None):
-        """Download HuggingFace repositories using huggingface-cli"""
+        """Download HuggingFace repositories (entries may carry a revision and file filters)"""
         if not repos_list:
             self.log("No Hugging Face repos specified to download.")
             return True
             
         self.log("Found Hugging Face repos to download...")
         
-        repos = [repo.strip() for repo in repos_list.split(',') if repo.strip()]
-        
+        jobs = [
+            {'source': 'hf', 'category': 'huggingface', 'item_id': repo_id}
+            for repo_id in _parse_list(repos_list)
+        ]
+        self.run_download_jobs(jobs, hf_token=token)
+        return True
+
+    def download_hf_repo(self, repo_spec, token=None):
+        """Download a single HuggingFace repository, optionally pinned and filtered"""
+        spec = parse_hf_spec(repo_spec)
+        if self._use_hf_cli():
+            return self._download_hf_repo_cli(spec, token)
+        return self._download_hf_repo_native(spec, token)
+
+    def _use_hf_cli(self):
+        """huggingface-cli bypasses the bandwidth shaper, so it is only used while no limit is set"""
+        return self.hf_backend == 'cli' and not self.shaper.limited()
+
+    def _download_hf_repo_native(self, spec, token=None):
+        """Fetch the selected files of a repo in-process, several files at a time"""
+        repo_id = spec['repo_id']
+        repo_dir = self.download_tmp_dir / "huggingface" / repo_id
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+
+        self.log(f"Starting HF download: {repo_id}")
+        if not token:
+            self.log("No HuggingFace token provided", is_debug=True)
+
+        listing = self._get_hf_listing(spec, headers)
+        if listing is None:
+            self.log(f"❌ ERROR: Failed to download '{repo_id}'.")
+            self._log_hf_hint(token)
+            return False
+
+        files = select_files(listing['siblings'], spec['include'], spec['exclude'])
+        self.log(f"{repo_id}@{listing['sha'][:12]}: {len(files)} of {len(listing['siblings'])} files selected",
+                 is_debug=True)
+
+        with ThreadPoolExecutor(max_workers=self.hf_file_workers, thread_name_prefix="nexis-hf") as executor:
+            results = list(executor.map(
+                lambda sibling: self._download_hf_file(repo_id, listing['sha'], sibling, repo_dir, headers),
+                files))
+
+        failed = results.count(False)
+        if failed:
+            self.log(f"❌ ERROR: Failed to download {failed} of {len(files)} files from '{repo_id}'.")
+            return False
+        # A repo is only usable once complete, so it is published as a whole
+        for sibling in files:
+            self._publish(repo_dir / sibling['rfilename'], self.models_dir / repo_id / sibling['rfilename'])
+        self.log(f"✅ Completed HF download: {repo_id}")
+        return True
+
+    def _get_hf_listing(self, spec, headers):
+        """Resolve a revision to a commit listing, using the cache whenever it is valid"""
+        repo_id, revision = spec['repo_id'], spec['revision']
+        with self._hf_listings_lock:
+            listing = self._hf_listings.get((repo_id, revision))
+        if listing is None:
+            listing = self._fetch_hf_listing(spec, headers)
+            if listing is not None:
+                with self._hf_listings_lock:
+                    self._hf_listings[(repo_id, revision)] = listing
+        return listing
+
+    def _fetch_hf_listing(self, spec, headers):
+        repo_id, revision = spec['repo_id'], spec['revision']
+        if is_commit_sha(revision):
+            listing = self.hf_listing_cache.get(repo_id, revision)
+            if listing:
+                self.log(f"Using cached file listing for {repo_id}@{revision[:12]}", is_debug=True)
+                return listing
+
+        api_url = f"{self.hf_endpoint}/api/models/{repo_id}/revision/{quote(revision, safe='')}?blobs=true"
+        started = time.monotonic()
+        try:
+            response = self.retry.call(host_of(api_url),
+                                       lambda: self.session.get(api_url, headers=headers, timeout=30))
+            self.metrics.emit('metadata', source='hf', item=repo_id, status=response.status_code,
+                              duration_seconds=time.monotonic() - started)
+            response.raise_for_status()
+            data = response.json()
+            listing = self.hf_listing_cache.get(repo_id, data['sha'])
+            if listing and revision == data['sha']:
+                return listing
+            return self.hf_listing_cache.put(repo_id, data, revision=revision)
+        except (requests.exceptions.RequestException, ValueError, KeyError, HostUnavailable) as e:
+            listing = self.hf_listing_cache.resolve(repo_id, revision)
+            if listing:
+                self.log(f"Could not list {repo_id}@{revision} ({e}); using cached listing "
+                         f"for {listing['sha'][:12]}")
+                return listing
+            if isinstance(e, HostUnavailable):
+                raise
+            self.log(f"Failed to list files of {repo_id}@{revision}: {e}", is_debug=True)
+            return None
+
+    def _download_hf_file(self, repo_id, commit, sibling, repo_dir, headers):
+        """Fetch one repo file under a cross-process lock so concurrent runs share it"""
+        key = (f"sha256-{sibling['sha256']}" if sibling['sha256']
+               else f"hf-{repo_id}-{commit}-{sibling['rfilename']}")
+        try:
+            with single_flight(self.locks_dir, key, log=self.log, timeout=self.lock_timeout) as waited:
+                if waited:
+                    self._reload_shared_state()
+                return self._fetch_hf_file(repo_id, commit, sibling, repo_dir, headers)
+        except LockTimeout as e:
+            self.log(f"❌ ERROR: {e}")
+            return False
+
+    def _fetch_hf_file(self, repo_id, commit, sibling, repo_dir, headers):
+        """Fetch one repo file unless the store or a verified local copy already has it"""
+        path = sibling['rfilename']
+        sha256 = sibling['sha256']
+        dest = repo_dir / path
+        published = self.models_dir / repo_id / path
+        alias = f"hf:{repo_id}/{path}"
+        try:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            if sha256:
+                if self.store.place(sha256, dest):
+                    self.store.add_alias(alias, sha256, dest.name)
+                    self.log(f"Reusing stored copy of {repo_id}/{path}", is_debug=True)
+                    return True
+                if dest.is_file() and self.verified.file_hash(dest) == sha256:
+                    self._store_download(dest, sha256, alias)
+                    return True
+                if published.is_file() and self.verified.file_hash(published) == sha256:
+                    return True  # organized into models/ by an earlier run
+            elif any(self._hf_file_current(p, sibling, commit) for p in (dest, published)):
+                return True
+            if sibling['size'] == 0:
+                # Empty files cannot be range-probed; there is nothing to fetch
+                dest.touch()
+                return True
+
+            digest = self._http_download(file_url(self.hf_endpoint, repo_id, commit, path), dest,
+                                         headers=headers)
+        except (requests.exceptions.RequestException, OSError) as e:
+            self.log(f"❌ ERROR: Failed to download {path} from {repo_id}: {e}")
+            return False
+
+        if not sha256:
+            if sibling.get('blob_id') and git_blob_id(dest) != sibling['blob_id']:
+                self.log(f"❌ ERROR: Git blob id mismatch for {repo_id}/{path}")
+                dest.unlink(missing_ok=True)
+                return False
+            if not self._verify_structure(dest):
+                dest.unlink(missing_ok=True)
+                return False
+            self.verified.record(dest, digest, self._hf_revision(sibling, commit))
+        else:
+            if digest != sha256:
+                self.log(f"❌ ERROR: Checksum mismatch for {repo_id}/{path}")
+                dest.unlink(missing_ok=True)
+                return False
+            self.verified.record(dest, digest)
+            if dest.stat().st_size >= self.store_min_size:
+                self._store_download(dest, sha256, alias)
+        return True
+
+    @staticmethod
+    def _hf_revision(sibling, commit):
+        """What identifies the listed version of a file without an LFS SHA256"""
+        return f"blob:{sibling['blob_id']}" if sibling.get('blob_id') else f"commit:{commit}"
+
+    def _hf_file_current(self, path, sibling, commit):
+        """True if path holds the listed version of an HF file that has no LFS SHA256.
+
+        Files fetched before are matched by the revision recorded with them;
+        any other copy of the right size is checked against the listed blob id.
+        """
+        try:
+            if path.stat().st_size != sibling['size']:
+                return False
+        except OSError:
+            return False
+        revision = self._hf_revision(sibling, commit)
+        if self.verified.revision(path) == revision:
+            return True
+        if sibling.get('blob_id') and git_blob_id(path) == sibling['blob_id']:
+            self.verified.record(path, hash_file(path), revision)
+            return True
+        return False
+
+    def _log_hf_hint(self, token):
+        if not token:
+            self.log("   HINT: This is likely a private/gated repository. Please provide a")
+            self.log("   HUGGINGFACE_TOKEN via RunPod Secrets ('huggingface.co').")
+        else:
+            self.log("   HINT: Please check if your token is valid and has access to this repository.")
+
+    def _download_hf_repo_cli(self, spec, token=None):
+        """Download a single HuggingFace repository using huggingface-cli"""
+        repo_id = spec['repo_id']
         # Create huggingface subdirectory
         hf_dir = self.download_tmp_dir / "huggingface"
         hf_dir.mkdir(exist_ok=True)
+
+        self.log(f"Starting HF download: {repo_id}")
         
-        for repo_id in repos:
-            self.log(f"Starting HF download: {repo_id}")
-            
-            # Build huggingface-cli command
-            cmd = [
-                'huggingface-cli', 'download',
-                repo_id,
-                '--local-dir', str(hf_dir / repo_id),
-                '--local-dir-use-symlinks', 'False',
-                '--resume-download'
-            ]
-            
-            if token:
-                cmd.extend(['--token', token])
-                self.log("Using provided HuggingFace token", is_debug=True)
+        # Build huggingface-cli command
+        cmd = [
+            'huggingface-cli', 'download',
+            repo_id,
+            '--revision', spec['revision'],
+            '--local-dir', str(hf_dir / repo_id),
+            '--local-dir-use-symlinks', 'False',
+            '--resume-download'
+        ]
+        if spec['include']:
+            cmd.extend(['--include', *spec['include']])
+        if spec['exclude']:
+            cmd.extend(['--exclude', *spec['exclude']])
+        
+        if token:
+            cmd.extend(['--token', token])
+            self.log("Using provided HuggingFace token", is_debug=True)
+        else:
+            self.log("No HuggingFace token provided", is_debug=True)
+        
+        try:
+            self.log(f"Executing command: {' '.join(cmd)}", is_debug=True)
+            if self.debug_mode:
+                result = subprocess.run(cmd, check=True)
             else:
-                self.log("No HuggingFace token provided", is_debug=True)
+                result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+            self.log(f"Subprocess finished with exit code {result.returncode}", is_debug=True)
+                
+            broken = [path for path in sorted((hf_dir / repo_id).rglob('*.safetensors'))
+                      if '.cache' not in path.parts and not self._verify_structure(path)]
+            if broken:
+                self.log(f"❌ ERROR: {len(broken)} broken safetensors files in '{repo_id}'.")
+                for path in broken:
+                    path.unlink(missing_ok=True)  # --resume-download fetches them again next time
+                return False
+
+            self.log(f"✅ Completed HF download: {repo_id}")
+            self._store_hf_tree(hf_dir / repo_id, repo_id)
             
-            try:
-                self.log(f"Executing command: {' '.join(cmd)}", is_debug=True)
-                if self.debug_mode:
-                    result = subprocess.run(cmd, check=True)
-                else:
-                    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-                self.log(f"Subprocess finished with exit code {result.returncode}", is_debug=True)
+            if self.debug_mode:
+                size = sum(f.stat().st_size for f in (hf_dir / repo_id).rglob('*') if f.is_file())
+                self.log(f"Downloaded size: {format_bytes(size)}", is_debug=True)
+            return True
                     
-                self.log(f"✅ Completed HF download: {repo_id}")
-                
-                if self.debug_mode:
-                    # Show download size
-                    try:
-                        size_result = subprocess.run(['du', '-sh', str(hf_dir / repo_id)],
-                                                   capture_output=True, text=True)
-                        if size_result.returncode == 0:
-                            size = size_result.stdout.split()[0]
-                            self.log(f"Downloaded size: {size}", is_debug=True)
-                    except subprocess.CalledProcessError as e:
-                        self.log(f"Failed to calculate download size for {repo_id}: subprocess error {e.returncode}", is_debug=True)
-                    except Exception as e:
-                        self.log(f"Failed to calculate download size for {repo_id}: {type(e).__name__}: {e}", is_debug=True)
-                        
-            except subprocess.CalledProcessError as e:
-                self.log(f"❌ ERROR: Failed to download '{repo_id}'.")
-                if not token:
-                    self.log("   HINT: This is likely a private/gated repository. Please provide a")
-                    self.log("   HUGGINGFACE_TOKEN via RunPod Secrets ('huggingface.co').")
-                else:
-                    self.log("   HINT: Please check if your token is valid and has access to this repository.")
-                self.log("   ⏭️ Continuing with remaining downloads...")
+        except subprocess.CalledProcessError as e:
+            self.log(f"❌ ERROR: Failed to download '{repo_id}'.")
+            self._log_hf_hint(token)
+            return False
+
+    def _store_hf_tree(self, repo_dir, repo_id):
+        """Move large files of a downloaded HF repo into the store, deduplicating them"""
+        stored = 0
+        deduplicated = 0
+        for path in sorted(repo_dir.rglob('*')):
+            if '.cache' in path.relative_to(repo_dir).parts:
                 continue
-                
+            try:
+                if path.is_symlink() or not path.is_file() or path.stat().st_size < self.store_min_size:
+                    continue
+                sha256 = self.verified.file_hash(path)
+                if self.store.has(sha256):
+                    deduplicated += 1
+                self.store.ingest(path, sha256, alias=f"hf:{repo_id}/{path.relative_to(repo_dir)}")
+                stored += 1
+            except OSError as e:
+                self.log(f"Could not add {path} to the model store: {e}", is_debug=True)
+        if stored:
+            self.log(f"Stored {stored} files from {repo_id} ({deduplicated} already present)", is_debug=True)
+
+    def _reload_shared_state(self):
+        """Re-read the store and manifest after waiting on another process's download"""
+        self.store.reload()
+        self.verified.reload()
+
+    def _place_stored_model(self, sha256, model_type, filename, alias=None, subfolder=None):
+        """Link a stored model into models/<type>/ so no download is needed"""
+        dest = self.models_dir / _category_dir(model_type, subfolder) / filename
+        try:
+            if not self.store.place(sha256, dest):
+                return False
+            if alias:
+                self.store.add_alias(alias, sha256, filename)
+        except OSError as e:
+            self.log(f"Could not place stored model {filename}: {e}", is_debug=True)
+            return False
+        self.log(f"ℹ️ Skipping download for '{filename}', reusing stored copy ({sha256[:12]}).")
         return True
 
-    def get_civitai_model_info(self, model_id, token=None):
-        """Get model info from CivitAI API using Hearmeman's approach"""
+    def _publish(self, path, dest):
+        """Progressive startup: rename a verified file into models/ right away.
+
+        Both trees live in the workspace, so the rename is atomic and ComfyUI
+        never sees a partial model. Anything that cannot be renamed is left
+        for file_organizer.sh.
+        """
+        if not self.publish_on_verify or not os.path.lexists(path):
+            return
+        known = self.verified.entry(path)
+        try:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            if dest.exists() and os.path.samefile(path, dest):
+                path.unlink()  # already published as a link to the same blob
+            else:
+                os.replace(path, dest)
+        except OSError as e:
+            self.log(f"Could not publish {path.name} yet, leaving it for the organizer: {e}", is_debug=True)
+            return
+        if known:
+            self.verified.record(dest, known['sha256'], known.get('revision'))
+        # Remove emptied HF repo directories so the organizer does not move them
+        hf_dir = self.download_tmp_dir / "huggingface"
+        parent = path.parent
+        while hf_dir in parent.parents:
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            parent = parent.parent
+        self.log(f"Published {dest.relative_to(self.models_dir)}", is_debug=True)
+
+    def _store_download(self, path, sha256, alias):
+        """Add a verified download to the store; failures only cost deduplication"""
+        try:
+            self.store.ingest(path, sha256, alias=alias)
+        except OSError as e:
+            self.log(f"Could not add {path.name} to the model store: {e}", is_debug=True)
+
+    def _civitai_target(self, item_id, category=None):
+        """(version ID, variant policy) of a CivitAI list entry"""
+        try:
+            version_id, policy = parse_civitai_spec(item_id)
+        except ValueError as e:
+            self.log(f"❌ ERROR: Ignoring the variant of {item_id}: {e}")
+            version_id, policy = item_id.partition('?')[0].strip(), None
+        return version_id, policy or self.civitai_variants.get((category or '').lower()) or self.civitai_variant
+
+    @staticmethod
+    def _civitai_alias(version_id, policy):
+        """Store alias of a CivitAI item; a variant policy can resolve to a different file"""
+        return f"civitai:{version_id}?variant={policy}" if policy else f"civitai:{version_id}"
+
+    def get_civitai_model_info(self, model_id, token=None, category=None):
+        """Get model info for a CivitAI model version, served from the metadata cache when possible"""
+        version_id, policy = self._civitai_target(model_id, category)
+        with self._civitai_info_lock:
+            if (version_id, policy) in self._civitai_info:
+                return self._civitai_info[(version_id, policy)]
+
+        entry = self.metadata_cache.get(version_id)
+        if entry is None or self.refresh or self.metadata_cache.needs_revalidation(entry):
+            entry = self._fetch_civitai_metadata(version_id, token, cached=entry)
+        else:
+            self.log(f"Using cached metadata for model {version_id}", is_debug=True)
+        if entry is None:
+            return None
+
+        model_info = self._select_civitai_file(version_id, entry, policy)
+        if model_info:
+            with self._civitai_info_lock:
+                self._civitai_info[(version_id, policy)] = model_info
+        return model_info
+
+    def _fetch_civitai_metadata(self, model_id, token=None, cached=None):
+        """Fetch model-version metadata, revalidating a cached entry conditionally"""
         headers = {}
         if token:
             headers["Authorization"] = f"Bearer {token}"
+        if cached:
+            if cached.get('etag'):
+                headers["If-None-Match"] = cached['etag']
+            if cached.get('last_modified'):
+                headers["If-Modified-Since"] = cached['last_modified']
             
         # Use model-versions endpoint like Hearmeman
-        api_url = f"https://civitai.com/api/v1/model-versions/{model_id}"
+        api_url = f"{self.civitai_api_base}/api/v1/model-versions/{model_id}"
         
         self.log(f"Fetching metadata from: {api_url}", is_debug=True)
         
+        started = time.monotonic()
+        response = None
         try:
-            response = self.session.get(api_url, headers=headers, timeout=30)
+            response = self.retry.call(host_of(api_url),
+                                       lambda: self.session.get(api_url, headers=headers, timeout=30))
+            self.metrics.emit('metadata', source='civitai', item=model_id, status=response.status_code,
+                              duration_seconds=time.monotonic() - started)
             response.raise_for_status()
 
+            if response.status_code == 304 and cached:
+                self.log(f"Cached metadata for model {model_id} is still valid", is_debug=True)
+                return self.metadata_cache.touch(model_id, cached)
+
             if response.status_code == 200:
                 data = response.json()
-                if 'files' in data and data['files']:
-                    file_info = data['files'][0]  # Get first file
-                    return {
-                        'filename': file_info.get('name'),
-                        'download_url': f"https://civitai.com/api/download/models/{model_id}?type=Model&format=SafeTensor",
-                        'hash': file_info.get('hashes', {}).get('SHA256', '').lower()
-                    }
+                return self.metadata_cache.put(
+                    model_id, data,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified')
+                )
             
             self.log(f"Invalid API response structure for model {model_id}", is_debug=True)
-            return None
+            return cached
             
-        except requests.RequestException as e:
+        except (requests.RequestException, ValueError) as e:
+            if response is None:
+                self.metrics.emit('metadata', source='civitai', item=model_id, status='error',
+                                  duration_seconds=time.monotonic() - started)
             self.log(f"API request failed for model {model_id}: {e}", is_debug=True)
+            if cached:
+                self.log(f"Falling back to cached metadata for model {model_id}", is_debug=True)
+            return cached
+        except HostUnavailable:
+            if cached:
+                self.log(f"Using cached metadata for model {model_id} while the API is paused", is_debug=True)
+                return cached
+            raise
+
+    def _select_civitai_file(self, model_id, entry, policy=None):
+        """Pick the file to download from a cached model-version entry"""
+        if not entry['files']:
+            self.log(f"Invalid API response structure for model {model_id}", is_debug=True)
             return None
+        if policy:
+            file_info = select_variant(entry['files'], policy.split(';'))
+            download_url = file_info.get('download_url') or variant_url(self.civitai_api_base, model_id, file_info)
+            self.log(f"Variant for model {model_id} ({policy}): {file_info.get('name')} "
+                     f"{file_info.get('metadata') or {}}", is_debug=True)
+        else:
+            file_info = entry['files'][0]  # Get first file
+            download_url = f"{self.civitai_api_base}/api/download/models/{model_id}?type=Model&format=SafeTensor"
+        return {
+            'filename': file_info.get('name'),
+            'download_url': download_url,
+            'hash': file_info.get('sha256', ''),
+            'size': file_info.get('size')
+        }
+
+    def prefetch_civitai_metadata(self, model_ids, token=None):
+        """Resolve metadata for all model IDs in parallel before any download starts.
+
+        Entries may be (model ID, category) pairs so category variant policies apply.
+        """
+        unique_ids = list(dict.fromkeys(model_ids))
+        if not unique_ids:
+            return {}
 
-    def download_civitai_model(self, model_id, model_type, token=None):
-        """Download single model from CivitAI using Hearmeman's method with aria2c"""
+        def lookup(item):
+            model_id, category = item if isinstance(item, tuple) else (item, None)
+            return self._lookup_civitai_info(model_id, token, category)
+
+        self.log(f"Prefetching metadata for {len(unique_ids)} Civitai models...")
+        with ThreadPoolExecutor(max_workers=max(1, self.metadata_workers),
+                                thread_name_prefix="nexis-meta") as executor:
+            infos = dict(zip(unique_ids, executor.map(lookup, unique_ids)))
+
+        missing = [item[0] if isinstance(item, tuple) else item for item, info in infos.items() if not info]
+        if missing:
+            self.log(f"Metadata unavailable for {len(missing)} models: {', '.join(missing)}", is_debug=True)
+        self.log(f"Metadata ready for {len(unique_ids) - len(missing)}/{len(unique_ids)} Civitai models", is_debug=True)
+        return infos
+
+    def prefetch_hf_listings(self, repo_specs, token=None):
+        """Resolve the file listings of all HF repos in parallel before any download starts"""
+        specs = [parse_hf_spec(repo_spec) for repo_spec in dict.fromkeys(repo_specs)]
+        if not specs or self._use_hf_cli():
+            return
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+
+        def resolve(spec):
+            try:
+                return self._get_hf_listing(spec, headers)
+            except HostUnavailable:
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, self.metadata_workers),
+                                thread_name_prefix="nexis-meta") as executor:
+            listings = list(executor.map(resolve, specs))
+        self.log(f"File listings ready for {len(specs) - listings.count(None)}/{len(specs)} HF repos",
+                 is_debug=True)
+
+    def _lookup_civitai_info(self, model_id, token=None, category=None):
+        """Model info for planning and prefetch, or None while the API host is paused"""
+        try:
+            return self.get_civitai_model_info(model_id, token, category)
+        except HostUnavailable:
+            return None  # the job retries the lookup once the API is healthy again
+
+    def download_civitai_model(self, model_id, model_type, token=None, subfolder=None):
+        """Download single model from CivitAI, verifying its SHA256 as bytes arrive"""
         if not model_id:
             return True
             
         self.log(f"Processing Civitai model ID: {model_id}", is_debug=True)
+        version_id, policy = self._civitai_target(model_id, model_type)
+        alias = self._civitai_alias(version_id, policy)
+
+        # Reuse a stored copy before making any network request
+        stored = self.store.lookup(alias)
+        if stored and self._place_stored_model(stored[0], model_type, stored[1], subfolder=subfolder):
+            return True
         
         # Get model info
-        model_info = self.get_civitai_model_info(model_id, token)
+        model_info = self.get_civitai_model_info(model_id, token, model_type)
         if not model_info or not model_info['filename']:
             self.log(f"❌ ERROR: Could not retrieve metadata for Civitai model ID {model_id}.")
             return False
             
+        remote_hash = model_info['hash']
+        
+        self.log(f"Filename: {model_info['filename']}", is_debug=True)
+        self.log(f"Download URL: {model_info['download_url'][:50]}...", is_debug=True)
+
+        # One process per file: others wait here and then find the result in the store
+        key = f"sha256-{remote_hash}" if remote_hash else alias
+        try:
+            with single_flight(self.locks_dir, key, log=self.log, timeout=self.lock_timeout) as waited:
+                if waited:
+                    self._reload_shared_state()
+                return self._fetch_civitai_model(version_id, model_type, model_info, alias, token, subfolder)
+        except LockTimeout as e:
+            self.log(f"❌ ERROR: {e}")
+            return False
+
+    def _fetch_civitai_model(self, model_id, model_type, model_info, alias, token=None, subfolder=None):
+        """Place, adopt or download one CivitAI file; runs while holding its download lock"""
         filename = model_info['filename']
+        category_dir = _category_dir(model_type, subfolder)
         download_url = model_info['download_url']
         remote_hash = model_info['hash']
-        
-        self.log(f"Filename: {filename}", is_debug=True)
-        self.log(f"Download URL: {download_url[:50]}...", is_debug=True)
-        
+        expected_size = model_info.get('size')
+
+        # Same file already stored under another ID or category
+        if remote_hash and self._place_stored_model(remote_hash, model_type, filename, alias=alias,
+                                                    subfolder=subfolder):
+            return True
+
+        # Adopt a model organized into models/ before the store existed
+        existing_model = self.models_dir / category_dir / filename
+        if remote_hash and existing_model.is_file() and not existing_model.is_symlink():
+            if self._verify_checksum(existing_model, remote_hash):
+                self._store_download(existing_model, remote_hash, alias)
+                self.log(f"ℹ️ Skipping download for '{filename}', file already exists in models.")
+                return True
+
         # Create model type subdirectory
-        model_dir = self.download_tmp_dir / model_type.lower()
-        model_dir.mkdir(exist_ok=True)
+        model_dir = self.download_tmp_dir / category_dir
+        model_dir.mkdir(parents=True, exist_ok=True)
         
-        # Check if file already exists in download directory
+        # Check if file already exists in download directory (a shorter file is a partial to resume)
         output_file = model_dir / filename
         if output_file.exists() and output_file.stat().st_size > 0:
-            self.log(f"ℹ️ Skipping download for '{filename}', file already exists in downloads.")
-            return True
+            existing_size = output_file.stat().st_size
+            if not expected_size or abs(existing_size - expected_size) < 1024:
+                if self._verify_checksum(output_file, remote_hash) if remote_hash else self._verify_structure(output_file):
+                    self.log(f"ℹ️ Skipping download for '{filename}', file already exists in downloads.")
+                    self._publish(output_file, self.models_dir / category_dir / filename)
+                    return True
+                output_file.unlink(missing_ok=True)
             
         self.log(f"Starting Civitai download: {filename} ({model_type})")
         
-        # Build aria2c command like Hearmeman, but add token to URL
+        # Add token to URL like Hearmeman
         if token and token.strip():
-            download_url += f"&token={token.strip()}"
+            download_url += f"{'&' if '?' in download_url else '?'}token={token.strip()}"
+
+        if self.download_backend == 'aria2c':
+            if not self._download_with_aria2c(model_id, filename, download_url, model_dir):
+                return False
+            actual_hash = None
+        else:
+            try:
+                actual_hash = self._http_download(download_url, output_file)
+            except (requests.RequestException, OSError) as e:
+                self.log(f"❌ DOWNLOAD ERROR: Failed to download {filename} from Civitai.")
+                self.log(f"   Error details: {type(e).__name__}: {e}")
+
+                # Keep the partial file: its journal lets the next attempt resume it
+                if self._journal_file(output_file).exists():
+                    self.log(f"   Keeping partial download of {filename} to resume on the next attempt")
+
+                status = getattr(getattr(e, 'response', None), 'status_code', None)
+                self._log_download_hint(model_id, str(status or ''), str(e))
+                return False
+
+        self.log(f"✅ Download completed for {filename}")
             
+        # Verify checksum if available
+        if remote_hash:
+            self.log(f"Verifying checksum for {filename}...", is_debug=True)
+            if self._verify_checksum(output_file, remote_hash, actual_hash=actual_hash):
+                self.log(f"✅ Checksum verification PASSED for {filename}.")
+            else:
+                self.log(f"❌ DOWNLOAD ERROR: Checksum verification FAILED for {filename}.")
+                self.log(f"   The downloaded file is corrupted or incomplete.")
+                self.log(f"   Removing corrupted file and marking download as failed.")
+                self.verified.forget(output_file)
+                output_file.unlink(missing_ok=True)
+                return False
+        else:
+            self.log(f"No checksum available for {filename}, checking its structure", is_debug=True)
+            if not self._verify_structure(output_file):
+                self.log(f"   Removing the broken file and marking download as failed.")
+                output_file.unlink(missing_ok=True)
+                return False
+
+        if actual_hash:
+            self.verified.record(output_file, actual_hash)
+        if actual_hash or remote_hash:
+            self._store_download(output_file, actual_hash or remote_hash, alias)
+        self._publish(output_file, self.models_dir / category_dir / filename)
+            
+        self.log(f"✅ Successfully completed Civitai download: {filename}")
+        return True
+
+    def _http_download(self, url, output_file, headers=None):
+        """Download url in-process over adaptive range connections and return its SHA256.
+
+        Bytes land in a preallocated <name>.part file that is hashed as its
+        contiguous prefix completes, and renamed into place once complete.
+        A <name>.part.journal file records finished ranges so an interrupted
+        download resumes where it stopped instead of starting over.
+        """
+        part_file = self._part_file(output_file)
+        journal_file = self._journal_file(output_file)
+        engine = SegmentedDownloader(
+            self.session, self.log,
+            max_connections=min(self.max_connections_per_host, self.host_connections),
+            piece_size=self.segment_size,
+            shaper=self.shaper,
+            retry=self.retry,
+            max_piece_attempts=self.retry.attempts
+        )
+        hasher = StreamingHasher(part_file)
+
+        # The engine retries the probe and each piece through self.retry, so a
+        # failure is counted once against the host and the attempts do not multiply
+        started = time.monotonic()
+        result = engine.download(url, part_file, hasher, journal_path=journal_file, headers=headers)
+        transferred = time.monotonic()
+        digest = hasher.hexdigest(result['size'])
+        self.metrics.emit('checksum', file=output_file.name, mode='streaming',
+                          duration_seconds=time.monotonic() - transferred)
+        self._emit_transfer(url, output_file, transferred - started, result)
+        os.replace(part_file, output_file)
+        journal_file.unlink(missing_ok=True)
+        self.log(f"Transferred {output_file.name}: {result['size']} bytes over "
+                 f"{result['connections']} connection(s), {result['resumed_bytes']} bytes reused "
+                 f"from a previous attempt", is_debug=True)
+        return digest
+
+    def _emit_transfer(self, url, output_file, duration, result):
+        """One 'transfer' event with the same fields for every backend"""
+        size = result['size']
+        resumed = result['resumed_bytes']
+        self.metrics.emit(
+            'transfer', host=urlparse(url).netloc, file=output_file.name, bytes=size,
+            resumed_bytes=resumed, duration_seconds=duration, ttfb_seconds=result['ttfb'],
+            throughput_bps=(size - resumed) / duration if duration > 0 else None,
+            retries=result['retries'], connections=result['connections']
+        )
+
+    @staticmethod
+    def _part_file(output_file):
+        return output_file.with_name(output_file.name + ".part")
+
+    @staticmethod
+    def _journal_file(output_file):
+        return output_file.with_name(output_file.name + ".part.journal")
+
+    def _download_with_aria2c(self, model_id, filename, download_url, model_dir):
+        """Download with aria2c like Hearmeman (optional backend, NEXIS_DOWNLOAD_BACKEND=aria2c)"""
+        # 8 connections like Hearmeman (proven reliable), within the per-host budget
+        connections = min(8, self.host_connections)
         cmd = [
             'aria2c',
-            '-x', '8',  # 8 connections like Hearmeman (proven reliable)
-            '-s', '8',
+            '-x', str(connections),
+            '-s', str(connections),
             '--continue=true',
+            '--max-tries=1',  # retries back off per host in self.retry
+            '--file-allocation=falloc',  # reserve the whole file up front, fail fast when full
             '--console-log-level=warn' if not self.debug_mode else '--console-log-level=info',
             '--summary-interval=0' if not self.debug_mode else '--summary-interval=10',
             f'--dir={model_dir}',
             f'--out={filename}',
             download_url
         ]
+        limit = self.shaper.effective_limit()
+        if limit:
+            # aria2c cannot follow runtime changes; split the limit at start between parallel downloads
+            share = max(1, int(limit / max(1, self.source_limits['civitai'])))
+            cmd.insert(-1, f'--max-download-limit={share}')
         
         try:
             self.log(f"Executing command: {' '.join(cmd)}", is_debug=True)
             if self.debug_mode:
                 self.log(f"Starting download with progress...", is_debug=True)
                 
-            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+            started = time.monotonic()
+            result, retries = self._run_aria2c(cmd, host_of(download_url), filename)
             self.log(f"Subprocess finished with exit code {result.returncode}", is_debug=True)
-            
-            self.log(f"✅ Download completed for {filename}")
-            
-            # Verify checksum if available
-            if remote_hash:
-                self.log(f"Verifying checksum for {filename}...", is_debug=True)
-                if self._verify_checksum(output_file, remote_hash):
-                    self.log(f"✅ Checksum verification PASSED for {filename}.")
-                else:
-                    self.log(f"❌ DOWNLOAD ERROR: Checksum verification FAILED for {filename}.")
-                    self.log(f"   The downloaded file is corrupted or incomplete.")
-                    self.log(f"   Removing corrupted file and marking download as failed.")
-                    output_file.unlink(missing_ok=True)
-                    return False
-            else:
-                self.log(f"No checksum available for {filename}, skipping validation", is_debug=True)
-                
-            self.log(f"✅ Successfully completed Civitai download: {filename}")
+            # aria2c reports neither its time to first byte nor how much of a resumed file it reused
+            self._emit_transfer(download_url, model_dir / filename, time.monotonic() - started, {
+                'size': (model_dir / filename).stat().st_size, 'resumed_bytes': 0, 'ttfb': None,
+                'retries': retries, 'connections': connections})
             return True
             
         except subprocess.CalledProcessError as e:
@@ -222,24 +925,51 @@ class NexisDownloader:
             if e.stderr and e.stderr.strip():
                 self.log(f"   Error details: {e.stderr.strip()}")
             
-            # Check if partial file exists and remove it
-            if output_file.exists():
-                self.log(f"   Removing partial download file: {filename}")
-                output_file.unlink(missing_ok=True)
-                
-            # Provide helpful hints based on common failure scenarios
-            if "403" in str(e.stderr) or "Forbidden" in str(e.stderr):
-                self.log(f"   HINT: This may be a private model requiring authentication.")
-                self.log(f"   Please ensure you have a valid CIVITAI_TOKEN if this is a private model.")
-            elif "404" in str(e.stderr) or "Not Found" in str(e.stderr):
-                self.log(f"   HINT: Model ID {model_id} may not exist or may have been removed.")
-            elif "timeout" in str(e.stderr).lower() or "connection" in str(e.stderr).lower():
-                self.log(f"   HINT: Network connectivity issue. The download may succeed on retry.")
+            # Keep the partial file: aria2c's control file lets --continue resume it
+            if (model_dir / f"{filename}.aria2").exists():
+                self.log(f"   Keeping partial download of {filename} to resume on the next attempt")
                 
+            self._log_download_hint(model_id, str(e.stderr), str(e.stderr))
             return False
 
-    def _verify_checksum(self, file_path, expected_hash):
-        """Verify SHA256 checksum with detailed error logging"""
+    def _run_aria2c(self, cmd, host, filename):
+        """Run aria2c, resuming with per-host backoff after transient failures; returns (result, retries)"""
+        attempt = 0
+        while True:
+            self.retry.check(host)
+            attempt += 1
+            try:
+                result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+            except subprocess.CalledProcessError as e:
+                if e.returncode not in ARIA2C_RETRY_EXIT_CODES:
+                    raise
+                delay = self.retry.backoff(host, f"aria2c exit {e.returncode}", attempt=attempt)
+                if delay is None:
+                    raise
+                self.log(f"aria2c failed for {filename} (exit code {e.returncode}), "
+                         f"resuming in {delay:.1f}s", is_debug=True)
+                time.sleep(delay)
+                continue
+            self.retry.record_success(host)
+            return result, attempt - 1
+
+    def _log_download_hint(self, model_id, status_text, error_text):
+        """Provide helpful hints based on common failure scenarios"""
+        if "403" in status_text or "Forbidden" in error_text:
+            self.log(f"   HINT: This may be a private model requiring authentication.")
+            self.log(f"   Please ensure you have a valid CIVITAI_TOKEN if this is a private model.")
+        elif "404" in status_text or "Not Found" in error_text:
+            self.log(f"   HINT: Model ID {model_id} may not exist or may have been removed.")
+        elif "timeout" in error_text.lower() or "connection" in error_text.lower():
+            self.log(f"   HINT: Network connectivity issue. The download may succeed on retry.")
+
+    def _verify_checksum(self, file_path, expected_hash, actual_hash=None):
+        """Verify SHA256 checksum with detailed error logging.
+
+        actual_hash is the digest computed while downloading; otherwise the
+        verified-file manifest is consulted and the file is only read back
+        (in-process, large buffer) when its stat fields have changed.
+        """
         try:
             if not file_path.exists():
                 self.log(f"❌ CHECKSUM ERROR: File does not exist: {file_path}")
@@ -249,9 +979,12 @@ class NexisDownloader:
                 self.log(f"❌ CHECKSUM ERROR: No expected hash provided for {file_path.name}")
                 return False
                 
-            result = subprocess.run(['sha256sum', str(file_path)],
-                                  capture_output=True, text=True, check=True)
-            actual_hash = result.stdout.split()[0].lower()
+            if actual_hash is None:
+                started = time.monotonic()
+                actual_hash = self.verified.file_hash(file_path)
+                self.metrics.emit('checksum', file=file_path.name, mode='file',
+                                  duration_seconds=time.monotonic() - started)
+            actual_hash = actual_hash.lower()
             expected_hash_clean = expected_hash.lower().strip()
             
             if actual_hash == expected_hash_clean:
@@ -263,22 +996,29 @@ class NexisDownloader:
                 self.log(f"   Actual:   {actual_hash}")
                 return False
                 
-        except subprocess.CalledProcessError as e:
-            self.log(f"❌ CHECKSUM ERROR: sha256sum command failed for {file_path.name}")
-            self.log(f"   Command error: {e}")
-            if e.stderr:
-                self.log(f"   stderr: {e.stderr.strip()}")
-            return False
-        except FileNotFoundError:
-            self.log(f"❌ CHECKSUM ERROR: sha256sum command not found. Please ensure coreutils is installed.")
-            return False
-        except IndexError:
-            self.log(f"❌ CHECKSUM ERROR: Invalid sha256sum output format for {file_path.name}")
+        except OSError as e:
+            self.log(f"❌ CHECKSUM ERROR: Could not read {file_path.name}: {e}")
             return False
         except Exception as e:
             self.log(f"❌ CHECKSUM ERROR: Unexpected error during checksum verification for {file_path.name}: {e}")
             return False
 
+    def _verify_structure(self, file_path):
+        """Cheap integrity check for files without a published hash (safetensors headers only)"""
+        if file_path.suffix.lower() != '.safetensors':
+            return True
+        started = time.monotonic()
+        try:
+            tensors = check_safetensors(file_path)
+        except (InvalidSafetensors, OSError) as e:
+            self.log(f"❌ STRUCTURE ERROR: {file_path.name} is not a valid safetensors file: {e}")
+            return False
+        finally:
+            self.metrics.emit('checksum', file=file_path.name, mode='structure',
+                              duration_seconds=time.monotonic() - started)
+        self.log(f"✅ Structure check passed for {file_path.name} ({tensors} tensors)", is_debug=True)
+        return True
+
     def process_civitai_downloads(self, download_list, model_type, token=None):
         """Process comma-separated list of CivitAI model IDs"""
         if not download_list:
@@ -288,20 +1028,409 @@ class NexisDownloader:
         self.log(f"Found Civitai {model_type}s to download...")
         self.log(f"Processing list: {download_list}", is_debug=True)
         
-        ids = [id.strip() for id in download_list.split(',') if id.strip()]
-        successful = 0
-        failed = 0
-        
-        for model_id in ids:
-            if self.download_civitai_model(model_id, model_type, token):
-                successful += 1
+        jobs = [
+            {'source': 'civitai', 'category': model_type, 'item_id': model_id}
+            for model_id in _parse_list(download_list)
+        ]
+        self.run_download_jobs(jobs, civitai_token=token)
+        return True
+
+    def run_download_jobs(self, jobs, hf_token=None, civitai_token=None):
+        """Run download jobs from all sources concurrently with bounded workers.
+
+        Jobs are dicts with 'source' ('hf' or 'civitai'), 'category' and
+        'item_id'. Jobs are dispatched in list order whenever both the global
+        limit and the job's per-source limit have a free slot. A job that hits
+        a paused host is requeued behind the others until the host's circuit
+        closes again. Returns a dict mapping each category to its
+        {'successful': n, 'failed': n} counts.
+        """
+        results = {}
+        for job in jobs:
+            results.setdefault(job['category'], {'successful': 0, 'failed': 0})
+        if not jobs:
+            return results
+        self.status.start(jobs)
+
+        pending = list(jobs)
+        running = {}
+        not_before = {}  # id(job) -> time.monotonic() after which a deferred job may run
+        deferrals = {}
+        active = {source: 0 for source in self.source_limits}
+        max_workers = max(1, self.max_concurrent_downloads)
+
+        self.log(f"Scheduling {len(jobs)} downloads (max {max_workers} concurrent, "
+                 f"per-source limits: {self.source_limits})", is_debug=True)
+
+        self.shaper.start()
+        try:
+            # Verified files are written to the manifest once, after the last job
+            with self.verified.batch(), ThreadPoolExecutor(max_workers=max_workers,
+                                                           thread_name_prefix="nexis-dl") as executor:
+                while pending or running:
+                    now = time.monotonic()
+                    for job in list(pending):
+                        if len(running) >= max_workers:
+                            break
+                        if not_before.get(id(job), 0) > now:
+                            continue
+                        source = job['source']
+                        if active.get(source, 0) >= max(1, self.source_limits.get(source, max_workers)):
+                            continue
+                        pending.remove(job)
+                        active[source] = active.get(source, 0) + 1
+                        future = executor.submit(self._run_download_job, job, hf_token, civitai_token)
+                        running[future] = job
+
+                    now = time.monotonic()
+                    waiting = [not_before[id(job)] for job in pending if not_before.get(id(job), 0) > now]
+                    wake = min(waiting) - now if waiting else None
+                    if not running:
+                        time.sleep(wake or 0)
+                        continue
+                    done, _ = wait(running, timeout=wake, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = running.pop(future)
+                        active[job['source']] -= 1
+                        try:
+                            ok = future.result()
+                        except HostUnavailable as e:
+                            deferrals[id(job)] = deferrals.get(id(job), 0) + 1
+                            if deferrals[id(job)] <= self.max_deferrals:
+                                self.log(f"⏳ Requeued {job['item_id']}: {e}")
+                                not_before[id(job)] = e.until
+                                pending.append(job)
+                                continue
+                            self.log(f"❌ ERROR: Giving up on {job['item_id']}: {e}")
+                            self.status.update(job, 'failed')
+                            ok = False
+                        except Exception as e:
+                            self.log(f"❌ ERROR: Unexpected failure downloading {job['item_id']}: {type(e).__name__}: {e}")
+                            ok = False
+                        if ok:
+                            results[job['category']]['successful'] += 1
+                        else:
+                            results[job['category']]['failed'] += 1
+                            self.log(f"⏭️ Continuing with remaining downloads...")
+        finally:
+            self.shaper.stop()
+
+        for category, counts in results.items():
+            label = "Hugging Face repos" if category == 'huggingface' else f"Civitai {category}s"
+            self.log(f"{label} complete: {counts['successful']} successful, {counts['failed']} failed")
+        return results
+
+    def _run_download_job(self, job, hf_token=None, civitai_token=None):
+        """Execute a single scheduled job with the downloader for its source"""
+        started = time.monotonic()
+        ok = False
+        deferred = False
+        self.status.update(job, 'running')
+        try:
+            if job['source'] == 'hf':
+                ok = self.download_hf_repo(job['item_id'], hf_token)
             else:
-                failed += 1
-                self.log(f"⏭️ Continuing with remaining {model_type}s...")
-                
-        self.log(f"Civitai {model_type}s complete: {successful} successful, {failed} failed")
+                # Only manifest items have a subfolder; keep the common call unchanged
+                options = {'subfolder': job['subfolder']} if job.get('subfolder') else {}
+                ok = self.download_civitai_model(job['item_id'], job['category'], civitai_token, **options)
+            return ok
+        except HostUnavailable:
+            deferred = True  # the scheduler requeues the job
+            raise
+        finally:
+            duration = time.monotonic() - started
+            result = 'deferred' if deferred else 'success' if ok else 'failed'
+            self.status.update(job, {'deferred': 'pending', 'success': 'complete'}.get(result, result), duration)
+            self.metrics.emit('download', source=job['source'], category=job['category'],
+                              item=job['item_id'], result=result, duration_seconds=duration)
+
+    def plan_jobs(self, jobs, hf_token=None, civitai_token=None):
+        """Check a run against free disk space before anything is downloaded"""
+        needs = [self._job_need(job, hf_token, civitai_token) for job in jobs]
+        if self.manifest_path:
+            jobs, needs = prioritize(jobs, needs)
+            self._log_queue(jobs, needs)
+        units = [unit for unit in (self._job_unit(job) for job in jobs) if unit]
+        self.model_access.touch(units)
+        if self.evictor:
+            self.evictor.make_room(sum(n for n in needs if n), protected=units)
+        available = available_bytes(self.download_tmp_dir, self.models_dir, self.disk_reserve)
+        plan = plan_downloads(jobs, needs, available, self.disk_policy)
+        self.metrics.emit('plan', jobs=len(jobs), skipped=len(plan.skipped), needed_bytes=plan.needed,
+                          available_bytes=available, unknown=len(plan.unknown), policy=self.disk_policy)
+        self.log(f"Disk plan: {format_bytes(plan.needed)} to download, {format_bytes(available)} available "
+                 f"(after a {format_bytes(self.disk_reserve)} reserve)", is_debug=True)
+        if plan.unknown:
+            self.log(f"Sizes unknown for {len(plan.unknown)} downloads; they are not included in the plan",
+                     is_debug=True)
+        if plan.skipped:
+            self.log(f"❌ ERROR: Not enough disk space for all downloads ({format_bytes(plan.needed)} needed, "
+                     f"{format_bytes(available)} available). Policy '{self.disk_policy}' skips "
+                     f"{len(plan.skipped)} of {len(jobs)}:")
+            for job in plan.skipped:
+                self.log(f"   ⏭️ {job['category']}: {job['item_id']}")
+        return plan
+
+    def _job_need(self, job, hf_token=None, civitai_token=None):
+        """Bytes a job still has to write to disk, or None when its size is unknown"""
+        if job['source'] == 'civitai':
+            if self.store.lookup(self._civitai_alias(*self._civitai_target(job['item_id'], job['category']))):
+                return 0
+            info = self._lookup_civitai_info(job['item_id'], civitai_token, job['category'])
+            if not info or not info.get('size'):
+                return None
+            if info['hash'] and self.store.has(info['hash']):
+                return 0
+            category_dir = _category_dir(job['category'], job.get('subfolder'))
+            for existing in (self.models_dir / category_dir / info['filename'],
+                             self.download_tmp_dir / category_dir / info['filename']):
+                if existing.is_file() and abs(existing.stat().st_size - info['size']) < 1024:
+                    return 0
+            part_file = self._part_file(self.download_tmp_dir / category_dir / info['filename'])
+            return max(0, info['size'] - allocated_bytes(part_file))
+
+        spec = parse_hf_spec(job['item_id'])
+        headers = {'Authorization': f'Bearer {hf_token}'} if hf_token else {}
+        try:
+            listing = self._get_hf_listing(spec, headers)
+        except HostUnavailable:
+            return None
+        if listing is None:
+            return None
+        repo_dir = self.download_tmp_dir / "huggingface" / spec['repo_id']
+        need = 0
+        for sibling in select_files(listing['siblings'], spec['include'], spec['exclude']):
+            dest = repo_dir / sibling['rfilename']
+            published = self.models_dir / spec['repo_id'] / sibling['rfilename']
+            size = sibling['size'] or 0
+            if sibling['sha256']:
+                if self.store.has(sibling['sha256']) or \
+                        any(p.is_file() and p.stat().st_size == size for p in (dest, published)):
+                    continue
+            elif any(self._hf_file_current(p, sibling, listing['sha']) for p in (dest, published)):
+                continue
+            need += max(0, size - allocated_bytes(self._part_file(dest)))
+        return need
+
+    def _log_queue(self, jobs, needs):
+        """Show the order the manifest puts the run in"""
+        self.log(f"Download queue ({sum(1 for job in jobs if job.get('required', True))} required, "
+                 f"{sum(1 for job in jobs if not job.get('required', True))} optional):")
+        for position, (job, need) in enumerate(zip(jobs, needs), 1):
+            size = format_bytes(need) if need is not None else "size unknown"
+            self.log(f"   {position}. {job['category']}: {job['item_id']} (priority {job.get('priority', 0)}, "
+                     f"{'required' if job.get('required', True) else 'optional'}, {size})", is_debug=True)
+
+    def _job_unit(self, job):
+        """The models/ entry a job places (see nexis_eviction), or None when not resolved yet"""
+        if job['source'] == 'hf':
+            return parse_hf_spec(job['item_id'])['repo_id']
+        version_id, policy = self._civitai_target(job['item_id'], job['category'])
+        with self._civitai_info_lock:
+            info = self._civitai_info.get((version_id, policy))
+        stored = self.store.lookup(self._civitai_alias(version_id, policy))
+        filename = info['filename'] if info else stored and stored[1]
+        return (_category_dir(job['category'], job.get('subfolder')) / filename).as_posix() if filename else None
+
+    def fast_path(self, jobs):
+        """True when the lock-file covers exactly these jobs and every locked file verifies.
+
+        Only the local manifest is consulted (a stat per file), never the network.
+        """
+        if self.refresh or not jobs:
+            return False
+        lock = self.lockfile.matching(jobs, self._lock_settings(jobs))
+        if lock is None:
+            return False
+        for job in jobs:
+            for locked in lock['items'][job_key(job)]['files']:
+                if self.verified.lookup(self.workspace_dir / locked['path']) != locked['sha256']:
+                    self.log(f"{locked['path']} changed since the lock-file was written", is_debug=True)
+                    return False
         return True
 
+    def write_lockfile(self, jobs):
+        """Record what the completed jobs resolved to, for the next run's fast path"""
+        items = {}
+        with self.verified.batch():
+            for job in jobs:
+                if self.status.items.get(job_key(job), {}).get('state') != 'complete':
+                    continue
+                try:
+                    item = self._locked_item(job)
+                except (OSError, ValueError) as e:
+                    self.log(f"Not locking {job['item_id']}: {e}", is_debug=True)
+                    continue
+                if item is not None:
+                    items[job_key(job)] = item
+        self.lockfile.write(jobs, items, self._lock_settings(jobs))
+        self.log(f"Lock-file records {len(items)}/{len(jobs)} requested items", is_debug=True)
+
+    def _lock_settings(self, jobs):
+        """Settings that change what the requested jobs resolve to, or where they are placed"""
+        settings = {}
+        variants = {category: policy for category, policy in self.civitai_variants.items() if policy}
+        if self.civitai_variant:
+            variants['*'] = self.civitai_variant
+        if variants:
+            settings['civitai_variant'] = variants
+        subfolders = {job_key(job): job['subfolder'] for job in jobs if job.get('subfolder')}
+        if subfolders:
+            settings['subfolder'] = subfolders
+        return settings
+
+    def _locked_item(self, job):
+        """Resolution and on-disk files of one completed job, from this run's metadata"""
+        if job['source'] == 'civitai':
+            version_id, policy = self._civitai_target(job['item_id'], job['category'])
+            with self._civitai_info_lock:
+                info = self._civitai_info.get((version_id, policy))
+            stored = self.store.lookup(self._civitai_alias(version_id, policy))
+            filename = info['filename'] if info else stored and stored[1]
+            if not filename:
+                return None
+            sha256 = (info and info['hash']) or (stored and stored[0])
+            path = self.models_dir / _category_dir(job['category'], job.get('subfolder')) / filename
+            return {
+                'source': 'civitai',
+                'version_id': version_id,
+                'variant': policy,
+                'filename': filename,
+                'sha256': sha256 and sha256.lower(),
+                'size': info and info.get('size'),
+                'files': [self._locked_file(path, sha256)],
+            }
+
+        spec = parse_hf_spec(job['item_id'])
+        repo_dir = self.models_dir / spec['repo_id']
+        with self._hf_listings_lock:
+            listing = self._hf_listings.get((spec['repo_id'], spec['revision']))
+        if listing is not None:
+            siblings = select_files(listing['siblings'], spec['include'], spec['exclude'])
+            files = [self._locked_file(repo_dir / sibling['rfilename'], sibling['sha256']) for sibling in siblings]
+        else:
+            # huggingface-cli downloads: no listing, lock whatever the repo directory holds
+            files = [self._locked_file(path, None) for path in sorted(repo_dir.rglob('*'))
+                     if path.is_file() and '.cache' not in path.relative_to(repo_dir).parts]
+        return {
+            'source': 'hf',
+            'repo_id': spec['repo_id'],
+            'revision': spec['revision'],
+            'commit': listing['sha'] if listing else None,
+            'files': files,
+        }
+
+    def _locked_file(self, path, sha256):
+        """A lock-file entry for a file verified during this run (hashed only when no hash is known)"""
+        recorded = self.verified.lookup(path)
+        if sha256 and recorded is None:
+            self.verified.record(path, sha256.lower())  # raises if the file is missing
+            recorded = sha256.lower()
+        elif recorded is None:
+            recorded = self.verified.file_hash(path)
+        elif sha256 and recorded != sha256.lower():
+            raise ValueError(f"{path.name} does not match its expected SHA256")
+        return {
+            'path': str(path.relative_to(self.workspace_dir)),
+            'sha256': recorded,
+            'size': path.stat().st_size,
+        }
+
+    def export_seed_pack(self, pack_path, patterns=None):
+        """Write the files under models/ (all, or those matching patterns) to a seed pack"""
+        started = time.monotonic()
+        files = []
+        for path in sorted(self.models_dir.rglob('*')):
+            relative = path.relative_to(self.models_dir)
+            if any(part.startswith('.') for part in relative.parts) or not path.is_file() \
+                    or not matches(relative.as_posix(), patterns):
+                continue
+            sha256 = self.verified.file_hash(path)
+            files.append({'path': relative.as_posix(), 'source': path, 'size': path.stat().st_size,
+                          'sha256': sha256, 'aliases': self.store.aliases(sha256)})
+        write_pack(pack_path, files)
+        total = sum(f['size'] for f in files)
+        duration = time.monotonic() - started
+        self.metrics.emit('seedpack', action='export', files=len(files), bytes=total, duration_seconds=duration)
+        self.log(f"✅ Exported {len(files)} files ({format_bytes(total)}) to {pack_path} in {duration:.1f}s")
+        return len(files)
+
+    def import_seed_pack(self, source, patterns=None):
+        """Restore models from a seed pack file or URL; returns the number of files that failed to verify"""
+        started = time.monotonic()
+        totals = {'imported': 0, 'present': 0, 'failed': 0, 'bytes': 0}
+
+        def restored(entry, path, error):
+            if error is not None:
+                totals['failed'] += 1
+                self.log(f"❌ ERROR: Not importing {entry['path']}: {error}")
+                return
+            self.verified.record(path, entry['sha256'])
+            if entry['size'] >= self.store_min_size:
+                self._store_download(path, entry['sha256'], None)
+            self._add_seed_aliases(entry, path)
+            totals['imported'] += 1
+            totals['bytes'] += entry['size']
+            self.log(f"✅ Imported {entry['path']}", is_debug=True)
+
+        with self.verified.batch(), SeedPack(source, session=self.session) as pack:
+            wanted = []
+            for entry in pack.entries:
+                if not matches(entry['path'], patterns):
+                    continue
+                dest = self.models_dir / entry['path']
+                if self.verified.lookup(dest) == entry['sha256'] or self.store.place(entry['sha256'], dest):
+                    self._add_seed_aliases(entry, dest)
+                    totals['present'] += 1
+                else:
+                    wanted.append(entry)
+            self.log(f"Importing {len(wanted)} files ({format_bytes(sum(e['size'] for e in wanted))}) "
+                     f"from seed pack {source}, {totals['present']} already present")
+            pack.extract(wanted, lambda entry: self.models_dir / entry['path'], restored)
+
+        duration = time.monotonic() - started
+        self.metrics.emit('seedpack', action='import', files=totals['imported'], present=totals['present'],
+                          failed=totals['failed'], bytes=totals['bytes'], duration_seconds=duration)
+        rate = totals['bytes'] / duration if duration else 0.0
+        self.log(f"Imported {totals['imported']} files ({format_bytes(totals['bytes'])}, {format_bytes(rate)}/s), "
+                 f"{totals['present']} already present, {totals['failed']} failed")
+        return totals['failed']
+
+    def _add_seed_aliases(self, entry, path):
+        """Let the downloader resolve an imported file by its source keys without any request"""
+        if not self.store.has(entry['sha256']):
+            return
+        for alias in entry.get('aliases', []):
+            self.store.add_alias(alias, entry['sha256'], path.name)
+
+    def organize_models(self):
+        """Move finished downloads into models/, renaming whenever possible"""
+        organizer = ModelOrganizer(self.workspace_dir, self.log, metrics=self.metrics,
+                                   copy_workers=self.copy_workers, verified=self.verified)
+        with self.verified.batch():
+            return organizer.organize()
+
+    def log_summary(self):
+        """Summarize this run from its metrics events"""
+        summary = self.metrics.summary()
+        results = summary['results']
+        self.log(f"Run summary: {results.get('success', 0)} successful, {results.get('failed', 0)} failed, "
+                 f"{format_bytes(summary['bytes_transferred'])} transferred at "
+                 f"{format_bytes(summary['throughput_bps'])}/s in {summary['elapsed_seconds']:.1f}s")
+        if not self.debug_mode:
+            return
+        self.log("=== DOWNLOAD SUMMARY ===", is_debug=True)
+        self.log(f"Metadata lookups: {summary['metadata_seconds']:.1f}s, checksums: "
+                 f"{summary['checksum_seconds']:.1f}s, organizing: {summary['organize_seconds']:.1f}s, "
+                 f"retried ranges: {summary['retries']}", is_debug=True)
+        for host, rate in sorted(summary['host_throughput_bps'].items()):
+            self.log(f"  {host}: {format_bytes(rate)}/s", is_debug=True)
+        for event in summary['slowest']:
+            self.log(f"  {event['source']} {event['item']}: {event['result']} in "
+                     f"{event['duration_seconds']:.1f}s", is_debug=True)
+        self.log(f"Events: {self.metrics.events_path}", is_debug=True)
+        self.log("=== END SUMMARY ===", is_debug=True)
+
     def create_directory_structure(self):
         """Create organized directory structure in downloads_tmp"""
         directories = [
@@ -317,8 +1446,40 @@ class NexisDownloader:
             self.log(f"Created directory: {dir_path}", is_debug=True)
 
 
-def main():
+def _env_int(name, default):
+    """Read a positive integer from the environment, falling back to default"""
+    value = os.getenv(name, '').strip()
+    try:
+        parsed = int(value)
+    except ValueError:
+        return default
+    return parsed if parsed > 0 else default
+
+
+def _category_dir(category, subfolder=None):
+    """Directory of a CivitAI category (plus a manifest subfolder), relative to models/"""
+    return Path(category.lower()) / subfolder if subfolder else Path(category.lower())
+
+
+def _parse_list(value):
+    """Split a comma-separated env value into stripped, non-empty items"""
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def main(argv=None):
     """Main download orchestration"""
+    parser = argparse.ArgumentParser(description="Nexis model download manager")
+    parser.add_argument('--refresh', action='store_true',
+                        help="Ignore the lock-file and revalidate all metadata and revisions")
+    commands = parser.add_subparsers(dest='command')
+    export_parser = commands.add_parser('export', help="Write downloaded models to a seed pack")
+    export_parser.add_argument('pack', help="Seed pack file to write")
+    export_parser.add_argument('patterns', nargs='*', help="Paths relative to models/ to include (default: all)")
+    import_parser = commands.add_parser('import', help="Restore models from a seed pack")
+    import_parser.add_argument('pack', help="Seed pack file or http(s) URL")
+    import_parser.add_argument('patterns', nargs='*', help="Entries to extract (default: all)")
+    args = parser.parse_args(argv)
+
     # Get environment variables
     debug_mode = os.getenv('DEBUG_MODE', 'false').lower() == 'true'
     hf_repos = os.getenv('HF_REPOS_TO_DOWNLOAD', '')
@@ -330,7 +1491,21 @@ def main():
     
     # Initialize downloader
     downloader = NexisDownloader(debug_mode=debug_mode)
+    downloader.refresh = downloader.refresh or args.refresh
     
+    if args.command:
+        try:
+            if args.command == 'export':
+                downloader.export_seed_pack(Path(args.pack), args.patterns)
+                return 0
+            failed = downloader.import_seed_pack(args.pack, args.patterns)
+            return 1 if failed else 0
+        except (SeedPackError, OSError, requests.RequestException) as e:
+            downloader.log(f"❌ ERROR: Seed pack {args.command} failed: {e}")
+            return 1
+        finally:
+            downloader.metrics.write_prometheus()
+
     downloader.log("Initializing Nexis Python download manager...")
     
     if debug_mode:
@@ -343,57 +1518,80 @@ def main():
     # Create directory structure
     downloader.create_directory_structure()
     
-    # Process downloads in parallel-friendly order
-    # HuggingFace repos first (they can run independently)
-    downloader.download_hf_repos(hf_repos, hf_token)
-    
-    # Then CivitAI downloads (using model IDs, not URLs)
-    downloader.process_civitai_downloads(civitai_checkpoints, "checkpoints", civitai_token)
-    downloader.process_civitai_downloads(civitai_loras, "loras", civitai_token)
-    downloader.process_civitai_downloads(civitai_vaes, "vae", civitai_token)
-    
+    # Build a single job list so HF repos and CivitAI items download concurrently.
+    # List order is dispatch order: HF repos, then checkpoints, loras and vae,
+    # unless a manifest sets priorities (see nexis_manifest).
+    jobs = [make_job('hf', 'huggingface', repo_id) for repo_id in _parse_list(hf_repos)]
+    if not jobs:
+        downloader.log("No Hugging Face repos specified to download.")
+    for model_type, download_list in (("checkpoints", civitai_checkpoints),
+                                      ("loras", civitai_loras),
+                                      ("vae", civitai_vaes)):
+        ids = _parse_list(download_list)
+        if not ids:
+            downloader.log(f"No Civitai {model_type}s specified to download.")
+        jobs.extend(make_job('civitai', model_type, model_id) for model_id in ids)
+    if downloader.manifest_path:
+        try:
+            listed = load_manifest(Path(downloader.manifest_path))
+        except ManifestError as e:
+            downloader.log(f"❌ ERROR: Invalid download manifest: {e}")
+            return 1
+        downloader.log(f"Manifest {downloader.manifest_path} lists {len(listed)} items")
+        jobs, duplicates = merge_jobs(jobs + listed)
+        if duplicates:
+            downloader.log(f"Merged {duplicates} items listed more than once", is_debug=True)
+
+    # Unchanged configuration and verified files: nothing to resolve or download
+    started = time.monotonic()
+    if downloader.fast_path(jobs):
+        downloader.status.start(jobs)
+        for job in jobs:
+            downloader.status.update(job, 'complete')
+        downloader.status.finish()
+        downloader.metrics.emit('fast_path', items=len(jobs), duration_seconds=time.monotonic() - started)
+        downloader.log(f"✅ All {len(jobs)} requested items match the lock-file and verify on disk, "
+                       f"skipping downloads ({(time.monotonic() - started) * 1000:.0f} ms)")
+        downloader.metrics.write_prometheus()
+        return 0
+    if downloader.refresh:
+        downloader.log("Refreshing: revalidating all metadata and revisions")
+
+    # Models a sibling pod exported: copied in bulk before anything is fetched. Only
+    # after the fast path, so a warm restart never touches a remote pack
+    seed_pack = os.getenv('NEXIS_SEED_PACK', '').strip()
+    if seed_pack:
+        try:
+            downloader.import_seed_pack(seed_pack)
+        except (SeedPackError, OSError, requests.RequestException) as e:
+            downloader.log(f"❌ ERROR: Could not import seed pack {seed_pack}, downloading instead: {e}")
+
+    # Resolve all metadata up front (cached on disk, fetched in parallel)
+    downloader.prefetch_civitai_metadata(
+        [(job['item_id'], job['category']) for job in jobs if job['source'] == 'civitai'], civitai_token)
+    downloader.prefetch_hf_listings([job['item_id'] for job in jobs if job['source'] == 'hf'], hf_token)
+
+    # Make sure the run fits on disk before the first byte is downloaded
+    downloader.status.start(jobs)
+    plan = downloader.plan_jobs(jobs, hf_token=hf_token, civitai_token=civitai_token)
+    for job in plan.skipped:
+        downloader.status.update(job, 'skipped')
+
+    downloader.run_download_jobs(plan.jobs, hf_token=hf_token, civitai_token=civitai_token)
+    failed = [job for job in jobs if downloader.status.items.get(job_key(job), {}).get('state') != 'complete']
+    required_failed = [job for job in failed if job.get('required', True)]
+    if len(failed) > len(required_failed):
+        downloader.log(f"ℹ️ {len(failed) - len(required_failed)} optional items did not complete: "
+                       + ', '.join(job['item_id'] for job in failed if not job.get('required', True)))
+
+    downloader.status.finish()
     downloader.log("All downloads complete.")
+    downloader.organize_models()
+    downloader.write_lockfile(jobs)
     
-    # Debug summary
-    if debug_mode:
-        downloader.log("=== DOWNLOAD SUMMARY ===", is_debug=True)
-        if downloader.download_tmp_dir.exists():
-            try:
-                files = list(downloader.download_tmp_dir.rglob('*'))
-                files = [f for f in files if f.is_file()]
-                if files:
-                    downloader.log("Downloaded files:", is_debug=True)
-                    for file in files[:10]:  # Show first 10 files
-                        try:
-                            size_result = subprocess.run(['ls', '-lh', str(file)],
-                                                       capture_output=True, text=True)
-                            if size_result.returncode == 0:
-                                downloader.log(f"  {size_result.stdout.strip()}", is_debug=True)
-                        except subprocess.CalledProcessError as e:
-                            downloader.log(f"Failed to get file size for {file.name}: subprocess error {e.returncode}", is_debug=True)
-                        except Exception as e:
-                            downloader.log(f"Failed to get file size for {file.name}: {type(e).__name__}: {e}", is_debug=True)
-                    
-                    if len(files) > 10:
-                        downloader.log(f"  ... and {len(files) - 10} more files", is_debug=True)
-                    
-                    # Total size
-                    try:
-                        size_result = subprocess.run(['du', '-sh', str(downloader.download_tmp_dir)],
-                                                   capture_output=True, text=True)
-                        if size_result.returncode == 0:
-                            total_size = size_result.stdout.split()[0]
-                            downloader.log(f"Total download size: {total_size}", is_debug=True)
-                    except subprocess.CalledProcessError as e:
-                        downloader.log(f"Failed to calculate total download size: subprocess error {e.returncode}", is_debug=True)
-                    except Exception as e:
-                        downloader.log(f"Failed to calculate total download size: {type(e).__name__}: {e}", is_debug=True)
-                else:
-                    downloader.log("No files downloaded", is_debug=True)
-            except Exception as e:
-                downloader.log(f"Error generating summary: {e}", is_debug=True)
-        downloader.log("=== END SUMMARY ===", is_debug=True)
-
+    downloader.log_summary()
+    downloader.metrics.write_prometheus()
+    return 1 if required_failed else 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Nexis eviction - make room on the models volume by removing least-recently-used models
+
+Downloads only ever add to models/. With NEXIS_EVICTION_HIGH_WATER_PERCENT
+set, the downloader checks the volume before a run starts: if the run would
+leave it fuller than the high-water mark, models are evicted, least recently
+used first, until the volume would be back under the low-water mark
+(NEXIS_EVICTION_LOW_WATER_PERCENT, ten points lower by default):
+
+    NEXIS_EVICTION_HIGH_WATER_PERCENT=90
+    NEXIS_EVICTION_PINS="checkpoints/sdxl*,black-forest-labs/*"    never evicted
+
+A unit of eviction is a model as the downloader placed it: one CivitAI file
+(models/<category>/[<subfolder>/]<file>) or one HuggingFace tree
+(models/<org>/<repo>).
+Only units holding files from the model store are considered, so models
+copied in by hand are never removed, and neither are pinned units or
+anything the current run requests. A unit was last used at the latest of
+its files' access times and the last run that requested it
+(<state dir>/model_access.json). Evicted files leave the store, the
+verified-files manifest and the lock-file, so requesting them again simply
+downloads them again.
+
+`python3 nexis_eviction.py` lists the candidates in eviction order without deleting anything.
+"""
+
+import fnmatch
+import os
+import shutil
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from nexis_locks import FileLock
+from nexis_metrics import format_bytes
+from nexis_organizer import CATEGORIES
+from nexis_state import atomic_write_json, read_json
+
+
+def parse_pins(value):
+    """Comma-separated patterns matched against unit keys (checkpoints/x.safetensors, org/repo) or names"""
+    return [item.strip().strip('/') for item in (value or '').split(',') if item.strip().strip('/')]
+
+
+def unit_key(models_dir, path):
+    """The eviction unit a path under models_dir belongs to"""
+    parts = Path(path).relative_to(models_dir).parts
+    return '/'.join(parts if parts[0] in CATEGORIES else parts[:2])
+
+
+def _covers(prefixes, key):
+    return any(key == prefix or key.startswith(prefix + '/') for prefix in prefixes)
+
+
+class AccessLog:
+    """When each unit was last requested by a download run"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        data = read_json(self.path, default={})
+        return data if isinstance(data, dict) else {}
+
+    @contextmanager
+    def _updating(self):
+        with FileLock(self.path.with_name(self.path.name + ".lock")):
+            data = self.load()
+            yield data
+            atomic_write_json(self.path, data)
+
+    def touch(self, keys, when=None):
+        if not keys:
+            return
+        when = round(when or time.time(), 3)
+        with self._updating() as data:
+            data.update({key: when for key in keys})
+
+    def forget(self, keys):
+        with self._updating() as data:
+            for key in keys:
+                data.pop(key, None)
+
+
+class Unit:
+    """One evictable model: its files and the store blobs they link to"""
+
+    def __init__(self, key, path):
+        self.key = key
+        self.path = path
+        self.files = []
+        self.blobs = set()
+        self.last_used = 0.0
+
+
+class Evictor:
+    """Removes unpinned least-recently-used models until the volume is under the low-water mark"""
+
+    def __init__(self, workspace_dir, store, verified, lockfile, access, log, high_water=0.9, low_water=None,
+                 pins=(), metrics=None, disk_usage=shutil.disk_usage):
+        self.workspace_dir = Path(workspace_dir)
+        self.models_dir = self.workspace_dir / "models"
+        self.store = store
+        self.verified = verified
+        self.lockfile = lockfile
+        self.access = access
+        self.log = log
+        self.high_water = high_water
+        self.low_water = min(high_water, max(0.0, high_water - 0.1) if low_water is None else low_water)
+        self.pins = list(pins)
+        self.metrics = metrics
+        self.disk_usage = disk_usage
+        self.lock_path = access.path.with_name("eviction.lock")
+
+    def pinned(self, key):
+        return any(fnmatch.fnmatch(key, pin) or fnmatch.fnmatch(key.rsplit('/', 1)[-1], pin)
+                   for pin in self.pins)
+
+    def _inventory(self):
+        """Every unit under models/ plus, per blob, the units linking to it and how"""
+        blobs = {}
+        for sha256 in self.store.blob_hashes():
+            try:
+                st = os.stat(self.store.blob_path(sha256))
+            except OSError:
+                continue
+            blobs[(st.st_dev, st.st_ino)] = sha256
+        units, refs = {}, defaultdict(list)
+        recent = self.access.load()
+        for root, dirs, files in os.walk(self.models_dir):
+            for name in files:
+                path = Path(root) / name
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                key = unit_key(self.models_dir, path)
+                unit = units.get(key)
+                if unit is None:
+                    unit = units[key] = Unit(key, self.models_dir / key)
+                    unit.last_used = recent.get(key, 0.0)
+                unit.files.append(path)
+                unit.last_used = max(unit.last_used, st.st_atime)
+                sha256 = blobs.get((st.st_dev, st.st_ino))
+                if sha256:
+                    unit.blobs.add(sha256)
+                    refs[sha256].append((key, not path.is_symlink()))
+        return units, refs
+
+    def candidates(self, protected=()):
+        """Store-backed, unpinned, unprotected units, least recently used first"""
+        units, refs = self._inventory()
+        evictable = [unit for unit in units.values()
+                     if unit.blobs and not self.pinned(unit.key) and not _covers(protected, unit.key)]
+        evictable.sort(key=lambda unit: (unit.last_used, unit.key))
+        return evictable, refs
+
+    def _freed(self, unit, refs, gone):
+        """Bytes evicting unit releases, given the units already evicted"""
+        freed, blob_inodes = 0, set()
+        for sha256 in unit.blobs:
+            try:
+                st = os.stat(self.store.blob_path(sha256))
+            except OSError:
+                continue
+            blob_inodes.add((st.st_dev, st.st_ino))
+            remaining = [key for key, _ in refs[sha256] if key not in gone and key != unit.key]
+            hardlinks = sum(1 for _, hardlink in refs[sha256] if hardlink)
+            if not remaining and st.st_nlink <= hardlinks + 1:
+                freed += st.st_blocks * 512
+        for path in unit.files:
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) not in blob_inodes and st.st_nlink == 1:
+                freed += st.st_blocks * 512
+        return freed
+
+    def make_room(self, need=0, protected=()):
+        """Evict until need more bytes fit under the low-water mark, if they would exceed the high-water mark"""
+        usage = self.disk_usage(self.models_dir)
+        projected = usage.total - usage.free + need
+        if projected <= self.high_water * usage.total:
+            return 0
+        target = projected - self.low_water * usage.total
+        started = time.monotonic()
+        freed, evicted = 0, []
+        with FileLock(self.lock_path), self.verified.batch():
+            self.store.reload()
+            self.verified.reload()
+            units, refs = self.candidates(protected)
+            gone = set()
+            for unit in units:
+                if freed >= target:
+                    break
+                size = self._freed(unit, refs, gone)
+                if not size:
+                    continue
+                self._evict(unit, refs, gone)
+                freed += size
+                evicted.append(unit.key)
+                idle = time.time() - unit.last_used
+                self.log(f"🗑️ Evicted {unit.key} ({format_bytes(size)}, unused for {idle / 86400:.1f} days)")
+                if self.metrics:
+                    self.metrics.emit('evict', unit=unit.key, bytes=size, idle_seconds=round(idle, 3))
+        if freed < target:
+            self.log(f"❌ ERROR: Eviction freed {format_bytes(freed)} of the {format_bytes(target)} needed to get "
+                     f"under {self.low_water:.0%}; everything else is pinned, requested or not in the store")
+        else:
+            self.log(f"Evicted {len(evicted)} models, freeing {format_bytes(freed)}")
+        if self.metrics:
+            self.metrics.emit('eviction', units=len(evicted), bytes=freed, target_bytes=round(target),
+                              duration_seconds=time.monotonic() - started)
+        return freed
+
+    def _evict(self, unit, refs, gone):
+        for path in unit.files:
+            self.verified.forget(path)
+        if unit.path.is_dir() and not unit.path.is_symlink():
+            shutil.rmtree(unit.path)
+            try:
+                unit.path.parent.rmdir()  # an HF org directory left empty
+            except OSError:
+                pass
+        else:
+            unit.path.unlink(missing_ok=True)
+        gone.add(unit.key)
+        for sha256 in unit.blobs:
+            if all(key in gone for key, _ in refs[sha256]):
+                self.store.remove(sha256)
+        self.lockfile.forget([str(path.relative_to(self.workspace_dir)) for path in unit.files])
+        self.access.forget([unit.key])
+
+
+def main():
+    from nexis_hashing import VerifiedManifest
+    from nexis_lockfile import LockFile
+    from nexis_store import ModelStore
+
+    workspace = Path(os.getenv('WORKSPACE', '/home/comfyuser/workspace'))
+    state_dir = Path(os.getenv('NEXIS_STATE_DIR', str(workspace / ".nexis")))
+    store = ModelStore(Path(os.getenv('NEXIS_MODEL_STORE_DIR', str(state_dir / "store"))))
+    evictor = Evictor(workspace, store, VerifiedManifest(state_dir / "verified_files.json"),
+                      LockFile(state_dir / "nexis.lock.json"), AccessLog(state_dir / "model_access.json"),
+                      log=lambda message: print(f"[EVICT] {message}"),
+                      pins=parse_pins(os.getenv('NEXIS_EVICTION_PINS', '')))
+    units, refs = evictor.candidates()
+    gone = set()
+    for unit in units:
+        size = evictor._freed(unit, refs, gone)
+        gone.add(unit.key)
+        last_used = time.strftime('%Y-%m-%d %H:%M', time.localtime(unit.last_used))
+        print(f"[EVICT] {last_used}  {format_bytes(size):>8}  {unit.key}")
+    print(f"[EVICT] {len(units)} evictable models")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Nexis hashing - in-process SHA256 for files on disk and for downloads in flight
+"""
+
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from nexis_locks import FileLock
+from nexis_state import read_json, atomic_write_json
+
+# Large reads keep syscall overhead negligible on multi-GB checkpoints
+HASH_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+def hash_file(path, buffer_size=HASH_BUFFER_SIZE):
+    """Return the SHA256 hex digest of a file without spawning a subprocess"""
+    hasher = hashlib.sha256()
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            hasher.update(view[:read])
+    return hasher.hexdigest()
+
+
+class StreamingHasher:
+    """SHA256 of a file that is being written, computed as bytes arrive.
+
+    Bytes handed to update() at the current hash position are hashed straight
+    from memory. Bytes that arrive out of order (segmented downloads) or that
+    were already on disk (resumed downloads) are recorded as completed ranges
+    and read back from disk only once the hashed prefix reaches them, so each
+    byte is hashed exactly once and only gap regions are re-read.
+    """
+
+    def __init__(self, path, buffer_size=HASH_BUFFER_SIZE):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.hashed_offset = 0
+        self._hasher = hashlib.sha256()
+        self._pending = []  # completed-but-unhashed (start, end) ranges
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Start over, e.g. when a transfer has to restart from byte zero"""
+        with self._lock:
+            self.hashed_offset = 0
+            self._hasher = hashlib.sha256()
+            self._pending = []
+
+    def update(self, offset, data):
+        """Account for data that has just been written to the file at offset"""
+        with self._lock:
+            if offset == self.hashed_offset:
+                self._hasher.update(data)
+                self.hashed_offset += len(data)
+                self._drain()
+            elif offset + len(data) > self.hashed_offset:
+                self._pending.append((offset, offset + len(data)))
+                self._drain()
+
+    def extend(self, offset, data):
+        """Hash data from memory if it continues the hashed prefix; False (recording nothing) otherwise"""
+        with self._lock:
+            if offset != self.hashed_offset:
+                return False
+            self._hasher.update(data)
+            self.hashed_offset += len(data)
+            return True
+
+    def trial(self):
+        """A copy of the running digest and its offset, for bytes that may still be rejected"""
+        with self._lock:
+            return self.hashed_offset, self._hasher.copy()
+
+    def commit(self, offset, hasher, end):
+        """Adopt a trial digest (see trial) that went on to hash [offset, end) once those bytes proved good"""
+        with self._lock:
+            if offset != self.hashed_offset:
+                return False
+            self._hasher = hasher
+            self.hashed_offset = end
+            self._drain()
+            return True
+
+    def mark_complete(self, start, end):
+        """Record a byte range that is already on disk (e.g. from a previous attempt)"""
+        with self._lock:
+            if end > self.hashed_offset:
+                self._pending.append((start, end))
+                self._drain()
+
+    def catch_up(self, end):
+        """Hash bytes already on disk up to end, e.g. the prefix of a resumed file"""
+        with self._lock:
+            if end > self.hashed_offset:
+                self._read_from_disk(end)
+            self._drain()
+
+    def hexdigest(self, size=None):
+        """Finish hashing and return the digest; reads any unhashed tail up to size"""
+        with self._lock:
+            if size is not None and size > self.hashed_offset:
+                self._read_from_disk(size)
+            return self._hasher.hexdigest()
+
+    def _drain(self):
+        """Fold completed ranges that touch the hashed prefix into the digest"""
+        if not self._pending:
+            return
+        self._pending.sort()
+        while self._pending and self._pending[0][0] <= self.hashed_offset:
+            _, end = self._pending.pop(0)
+            if end > self.hashed_offset:
+                self._read_from_disk(end)
+
+    def _read_from_disk(self, end):
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        with open(self.path, 'rb', buffering=0) as f:
+            f.seek(self.hashed_offset)
+            while self.hashed_offset < end:
+                read = f.readinto(view[:min(self.buffer_size, end - self.hashed_offset)])
+                if not read:
+                    raise OSError(f"Unexpected end of file while hashing {self.path}")
+                self._hasher.update(view[:read])
+                self.hashed_offset += read
+
+
+class VerifiedManifest:
+    """Persistent record of files whose SHA256 has already been computed.
+
+    Entries are keyed by device and inode, so they follow a file across
+    renames and hardlinks (organizer moves, the model store), and are trusted
+    only while size, mtime and inode are unchanged. Anything else is rehashed.
+    """
+
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        self._pending = {}  # key -> entry, or None for a forgotten file, while batching
+        self._batching = 0
+
+    def _load(self):
+        entries = read_json(self.manifest_path, default={})
+        return entries if isinstance(entries, dict) else {}
+
+    def reload(self):
+        """Pick up files verified by other processes"""
+        with self._lock:
+            self._entries = self._load()
+            self._apply(self._entries, self._pending)
+
+    @staticmethod
+    def _apply(entries, changes):
+        for key, entry in changes.items():
+            if entry is None:
+                entries.pop(key, None)
+            else:
+                entries[key] = entry
+
+    @classmethod
+    def _prune(cls, entries):
+        """Drop entries for files that were deleted or replaced by another inode"""
+        for key, entry in list(entries.items()):
+            try:
+                current = cls._key(os.stat(entry['path']))
+            except (OSError, KeyError, TypeError):
+                current = None
+            if current != key:
+                del entries[key]
+
+    @contextmanager
+    def _updating(self):
+        """Apply a change on top of the latest manifest on disk, excluding other processes"""
+        with self._lock, FileLock(self.manifest_path.with_name(self.manifest_path.name + ".lock")):
+            self._entries = self._load()
+            yield self._entries
+            self._prune(self._entries)
+            atomic_write_json(self.manifest_path, self._entries)
+
+    def _change(self, key, entry):
+        with self._lock:
+            if self._batching:
+                self._apply(self._entries, {key: entry})
+                self._pending[key] = entry
+                return
+        with self._updating() as entries:
+            self._apply(entries, {key: entry})
+
+    @contextmanager
+    def batch(self):
+        """Keep records and forgets in memory and write them once, when the outermost batch ends.
+
+        Other processes see the batched entries only then; until that they
+        simply hash the files themselves.
+        """
+        with self._lock:
+            self._batching += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batching -= 1
+                done = not self._batching
+            if done:
+                self.flush()
+
+    def flush(self):
+        """Write the changes batched so far"""
+        with self._lock:
+            if not self._pending:
+                return
+        with self._updating() as entries:
+            self._apply(entries, self._pending)
+            self._pending = {}
+
+    @staticmethod
+    def _key(st):
+        return f"{st.st_dev}:{st.st_ino}"
+
+    def entry(self, path):
+        """Return a copy of the recorded entry if the file is unchanged since it was verified"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(self._key(st))
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return dict(entry)
+        return None
+
+    def lookup(self, path):
+        """Return the recorded SHA256 if the file is unchanged since it was verified"""
+        entry = self.entry(path)
+        return entry['sha256'] if entry else None
+
+    def revision(self, path):
+        """Return the recorded remote revision (see record) if the file is unchanged since"""
+        entry = self.entry(path)
+        return entry.get('revision') if entry else None
+
+    def record(self, path, sha256, revision=None):
+        """Remember that path currently hashes to sha256.
+
+        revision identifies the remote version the file was fetched as, for
+        sources that publish no SHA256 (an HF git blob id).
+        """
+        st = os.stat(path)
+        entry = {
+            'path': str(path),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': sha256.lower(),
+            'verified_at': time.time(),
+        }
+        if revision:
+            entry['revision'] = revision
+        self._change(self._key(st), entry)
+
+    def forget(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._key(st) not in self._entries:
+                return
+        self._change(self._key(st), None)
+
+    def file_hash(self, path):
+        """SHA256 of path, reading the file only when the manifest cannot vouch for it"""
+        sha256 = self.lookup(path)
+        if sha256 is None:
+            sha256 = hash_file(path)
+            self.record(path, sha256)
+        return sha256
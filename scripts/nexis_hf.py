@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Nexis HuggingFace helpers - repo specs, file filters and a listing cache
+
+HF_REPOS_TO_DOWNLOAD entries may pin a revision and filter files:
+
+    org/repo
+    org/repo@<branch|tag|commit>
+    org/repo@<revision>?include=*.safetensors;*.json&exclude=*fp32*
+
+Patterns are fnmatch globs matched against the path inside the repo and are
+separated by ';'. Listings are cached per resolved commit, so a repo pinned
+to a commit is never listed twice, and the last commit seen for a branch or
+tag is remembered so an unreachable API does not block a cached repo.
+
+Files without an LFS SHA256 (small configs and tokenizers) are matched to a
+listing by their git blob id, which the Hub lists as blobId.
+"""
+
+import fnmatch
+import hashlib
+import os
+import re
+from urllib.parse import parse_qs, quote
+
+from nexis_state import read_json, atomic_write_json
+
+_COMMIT_SHA = re.compile(r'^[0-9a-f]{40}$')
+
+
+def parse_hf_spec(spec):
+    """Parse one HF_REPOS_TO_DOWNLOAD entry into repo_id, revision and filters"""
+    spec = spec.strip()
+    spec, _, query = spec.partition('?')
+    repo_id, _, revision = spec.partition('@')
+    params = parse_qs(query, keep_blank_values=False)
+
+    def patterns(name):
+        return [p.strip() for value in params.get(name, []) for p in value.split(';') if p.strip()]
+
+    return {
+        'repo_id': repo_id.strip(),
+        'revision': revision.strip() or 'main',
+        'include': patterns('include'),
+        'exclude': patterns('exclude'),
+    }
+
+
+def select_files(siblings, include, exclude):
+    """Filter a repo listing with include/exclude globs (no include means everything)"""
+    selected = []
+    for sibling in siblings:
+        path = sibling['rfilename']
+        if include and not any(fnmatch.fnmatch(path, p) for p in include):
+            continue
+        if any(fnmatch.fnmatch(path, p) for p in exclude):
+            continue
+        selected.append(sibling)
+    return selected
+
+
+def is_commit_sha(revision):
+    return bool(_COMMIT_SHA.match(revision or ''))
+
+
+def git_blob_id(path):
+    """Git blob SHA-1 of a file, as the Hub lists it in blobId"""
+    hasher = hashlib.sha1(f"blob {os.path.getsize(path)}\0".encode())
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def file_url(endpoint, repo_id, commit, path):
+    return f"{endpoint}/{repo_id}/resolve/{commit}/{quote(path)}"
+
+
+class HfListingCache:
+    """Repo listings stored per resolved commit; a commit's file list never changes"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _path(self, repo_id, commit):
+        return self.cache_dir / repo_id.replace('/', '--') / f"{commit}.json"
+
+    def _ref_path(self, repo_id, revision):
+        return self.cache_dir / repo_id.replace('/', '--') / "refs" / f"{quote(revision, safe='')}.json"
+
+    def get(self, repo_id, commit):
+        listing = read_json(self._path(repo_id, commit))
+        if isinstance(listing, dict) and isinstance(listing.get('siblings'), list):
+            return listing
+        return None
+
+    def resolve(self, repo_id, revision):
+        """Return the last cached listing for a branch or tag, if any"""
+        ref = read_json(self._ref_path(repo_id, revision))
+        if isinstance(ref, dict) and ref.get('sha'):
+            return self.get(repo_id, ref['sha'])
+        return None
+
+    def put(self, repo_id, data, revision=None):
+        """Store an /api/models/<repo>/revision/<rev>?blobs=true response and return the listing"""
+        listing = {
+            'repo_id': repo_id,
+            'sha': data['sha'],
+            'siblings': [
+                {
+                    'rfilename': s['rfilename'],
+                    'size': (s.get('lfs') or {}).get('size', s.get('size')),
+                    'sha256': ((s.get('lfs') or {}).get('sha256') or '').lower(),
+                    'blob_id': s.get('blobId'),
+                }
+                for s in data.get('siblings') or []
+            ],
+        }
+        atomic_write_json(self._path(repo_id, data['sha']), listing)
+        if revision and revision != data['sha']:
+            atomic_write_json(self._ref_path(repo_id, revision), {'sha': data['sha']})
+        return listing
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Nexis lock-file - what a download run resolved, so an unchanged restart needs no network
+
+<state dir>/nexis.lock.json records, for every requested item that completed:
+
+    civitai   the version's filename, SHA256 and size (from the metadata API)
+    hf        the revision as requested and the commit it resolved to
+    both      every file placed under models/, with its SHA256 and size
+
+together with a fingerprint of the requested job list. When the next run
+requests the same jobs and every recorded file is still vouched for by the
+verified-files manifest (same inode, size and mtime), nothing needs to be
+resolved or downloaded. Branch revisions stay pinned to the recorded commit
+until a refresh (`nexis_downloader.py --refresh` or NEXIS_REFRESH=true).
+"""
+
+import hashlib
+import json
+import time
+
+from nexis_state import atomic_write_json, read_json
+
+LOCKFILE_VERSION = 1
+
+
+def job_key(job):
+    return f"{job['source']}:{job['category']}:{job['item_id']}"
+
+
+def fingerprint(jobs, settings=None):
+    """Stable digest of the requested jobs (order does not matter) and settings that change results"""
+    payload = {
+        'jobs': sorted(job_key(job) for job in jobs),
+        'settings': settings or {},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class LockFile:
+    """Reads and writes nexis.lock.json"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        data = read_json(self.path)
+        if not isinstance(data, dict) or data.get('version') != LOCKFILE_VERSION:
+            return None
+        if not isinstance(data.get('items'), dict):
+            return None
+        return data
+
+    def matching(self, jobs, settings=None):
+        """The lock-file if it was written for exactly these jobs and covers all of them, else None"""
+        data = self.load()
+        if data is None or data.get('fingerprint') != fingerprint(jobs, settings):
+            return None
+        if any(job_key(job) not in data['items'] for job in jobs):
+            return None
+        return data
+
+    def write(self, jobs, items, settings=None):
+        """Record the resolved items (keyed by job_key) for the requested jobs"""
+        atomic_write_json(self.path, {
+            'version': LOCKFILE_VERSION,
+            'fingerprint': fingerprint(jobs, settings),
+            'written_at': time.time(),
+            'items': items,
+        })
+
+    def forget(self, paths):
+        """Drop the items that placed any of paths (relative to the workspace), e.g. after eviction"""
+        data = self.load()
+        if data is None:
+            return
+        paths = set(paths)
+        items = {key: item for key, item in data['items'].items()
+                 if not any(locked['path'] in paths for locked in item.get('files', []))}
+        if len(items) != len(data['items']):
+            atomic_write_json(self.path, {**data, 'items': items})
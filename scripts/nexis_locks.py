@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Nexis locks - cross-process coordination through flock(2)
+
+Several downloader processes (or pods on a shared volume) may work on the
+same workspace. Each model download runs under a lock in
+<state dir>/locks/<key>.lock keyed by its SHA256 (or source ID when the hash
+is unknown). A process that finds the lock held waits for the holder to
+finish and then reuses its result from the model store instead of
+downloading the same bytes again. Locks are released by the kernel when a
+process dies, so a crashed downloader never leaves a stale lock behind.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import socket
+import time
+from contextlib import contextmanager
+
+POLL_INTERVAL = 0.5
+
+
+class LockTimeout(Exception):
+    """Another process held a lock for longer than we were willing to wait"""
+
+
+class FileLock:
+    """Exclusive flock on a lock file; separate instances exclude each other, even in one process"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def acquire(self, blocking=True, timeout=None):
+        """Take the lock; returns False if non-blocking and busy, raises LockTimeout on timeout"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if not blocking:
+                        os.close(fd)
+                        return False
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise LockTimeout(f"Timed out waiting for {self.path.name} ({self.owner()})")
+                    time.sleep(POLL_INTERVAL)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        # Record the holder for anyone diagnosing a long wait
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, json.dumps({'pid': os.getpid(), 'host': socket.gethostname(),
+                                  'since': time.time()}).encode(), 0)
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def owner(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                owner = json.load(f)
+            return f"pid {owner['pid']} on {owner['host']}"
+        except (OSError, ValueError, KeyError, TypeError):
+            return "unknown holder"
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def lock_name(key):
+    """Filesystem-safe lock file name for a key such as 'civitai:123' or a hash.
+
+    Keys that had to be rewritten or shortened get a digest of the full key,
+    so two keys never end up sharing a lock.
+    """
+    safe = re.sub(r'[^A-Za-z0-9._-]+', '_', key)
+    if safe != key or len(safe) > 200:
+        safe = f"{safe[:180]}-{hashlib.sha256(key.encode()).hexdigest()[:16]}"
+    return safe + '.lock'
+
+
+@contextmanager
+def single_flight(locks_dir, key, log=None, timeout=None):
+    """Hold the lock for key; yields True if another process had it and we waited.
+
+    Callers that waited should first look for the other process's result
+    before doing the work themselves.
+    """
+    lock = FileLock(locks_dir / lock_name(key))
+    waited = False
+    if not lock.acquire(blocking=False):
+        waited = True
+        if log:
+            log(f"⏳ {key} is being downloaded by another process ({lock.owner()}), waiting...")
+        lock.acquire(timeout=timeout)
+    try:
+        yield waited
+    finally:
+        lock.release()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Nexis download manifest - a prioritized, declarative list of models to download
+
+NEXIS_DOWNLOAD_MANIFEST points at a JSON or YAML file (YAML needs PyYAML,
+which ComfyUI already installs):
+
+    items:
+      - id: "128713"             # CivitAI version ID (may carry ?variant=) or an HF repo spec
+        category: checkpoints    # checkpoints, loras or vae; omit for HF repos
+        priority: 100            # higher starts earlier (default 0)
+        required: true           # a failed required item fails the run (default true)
+        subfolder: sdxl          # placed in models/checkpoints/sdxl/ (CivitAI only)
+      - {source: hf, id: "madebyollin/sdxl-vae-fp16-fix", priority: 50}
+      - {id: "182404", category: loras, required: false}
+
+A top-level list of items is accepted too. The source is 'civitai' for the
+three CivitAI categories and 'hf' otherwise. Manifest items are merged with
+the *_TO_DOWNLOAD variables, whose items keep priority 0 and stay required.
+An item listed more than once runs once, with its highest priority, and is
+required if any listing requires it.
+
+With a manifest, jobs start required first, then by priority, then smallest
+download first (sizes from the disk planner, unknown sizes last), then in
+list order.
+"""
+
+import json
+from pathlib import PurePosixPath
+
+CIVITAI_CATEGORIES = ('checkpoints', 'loras', 'vae')
+ITEM_KEYS = {'source', 'id', 'category', 'priority', 'required', 'subfolder'}
+
+
+class ManifestError(ValueError):
+    """The manifest cannot be read or an item in it is invalid"""
+
+
+def make_job(source, category, item_id, priority=0, required=True, subfolder=None):
+    """A download job as the scheduler, planner and lock-file expect it"""
+    job = {'source': source, 'category': category, 'item_id': item_id, 'priority': priority,
+           'required': required}
+    if subfolder:
+        job['subfolder'] = subfolder
+    return job
+
+
+def load_manifest(path):
+    """Jobs listed in a JSON or YAML manifest, in file order"""
+    try:
+        text = path.read_text(encoding='utf-8')
+    except OSError as e:
+        raise ManifestError(f"cannot read {path}: {e}") from e
+    if path.suffix.lower() in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ManifestError(f"{path.name} is YAML but PyYAML is not installed; use JSON instead") from None
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ManifestError(f"invalid YAML in {path.name}: {e}") from e
+    else:
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise ManifestError(f"invalid JSON in {path.name}: {e}") from e
+
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ManifestError(f"{path.name} must be a list of items or have an 'items' list")
+    return [_parse_item(item, number) for number, item in enumerate(items, 1)]
+
+
+def _parse_item(item, number):
+    if not isinstance(item, dict):
+        raise ManifestError(f"item {number} must be a mapping")
+    unknown = set(item) - ITEM_KEYS
+    if unknown:
+        raise ManifestError(f"item {number} has unknown keys: {', '.join(sorted(unknown))}")
+    item_id = str(item.get('id') or '').strip()
+    if not item_id:
+        raise ManifestError(f"item {number} has no id")
+
+    category = str(item.get('category') or '').strip().lower()
+    source = str(item.get('source') or ('civitai' if category in CIVITAI_CATEGORIES else 'hf')).lower()
+    if source == 'hf':
+        if category not in ('', 'huggingface'):
+            raise ManifestError(f"item {number} ({item_id}): HF repos have no category")
+        category = 'huggingface'
+    elif source != 'civitai':
+        raise ManifestError(f"item {number} ({item_id}): unknown source '{source}'")
+    elif category not in CIVITAI_CATEGORIES:
+        raise ManifestError(f"item {number} ({item_id}): category must be one of {', '.join(CIVITAI_CATEGORIES)}")
+
+    priority = item.get('priority', 0)
+    if isinstance(priority, bool) or not isinstance(priority, (int, float)):
+        raise ManifestError(f"item {number} ({item_id}): priority must be a number")
+    required = item.get('required', True)
+    if not isinstance(required, bool):
+        raise ManifestError(f"item {number} ({item_id}): required must be true or false")
+
+    subfolder = str(item.get('subfolder') or '').strip().strip('/')
+    if subfolder:
+        parts = PurePosixPath(subfolder).parts
+        if source == 'hf':
+            raise ManifestError(f"item {number} ({item_id}): subfolder is only supported for CivitAI items")
+        if '..' in parts or '\\' in subfolder:
+            raise ManifestError(f"item {number} ({item_id}): subfolder must stay inside models/{category}")
+    return make_job(source, category, item_id, priority, required, subfolder or None)
+
+
+def merge_jobs(jobs):
+    """Collapse repeated items into the first listing; returns (jobs, number merged)"""
+    merged = {}
+    for job in jobs:
+        key = (job['source'], job['category'], job['item_id'])
+        first = merged.get(key)
+        if first is None:
+            merged[key] = dict(job)
+            continue
+        first['priority'] = max(first.get('priority', 0), job.get('priority', 0))
+        first['required'] = first.get('required', True) or job.get('required', True)
+        if job.get('subfolder') and not first.get('subfolder'):
+            first['subfolder'] = job['subfolder']
+    return list(merged.values()), len(jobs) - len(merged)
+
+
+def prioritize(jobs, needs):
+    """Reorder jobs (and their byte needs) by required, priority, size and list order"""
+    order = sorted(range(len(jobs)), key=lambda i: (
+        not jobs[i].get('required', True),
+        -jobs[i].get('priority', 0),
+        needs[i] is None,
+        needs[i] or 0,
+        i,
+    ))
+    return [jobs[i] for i in order], [needs[i] for i in order]
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Nexis CivitAI metadata cache - persists model-version API responses on disk
+
+A model-version's files and hashes do not change once published, so entries are
+reused across container boots and only revalidated (conditionally, via ETag /
+Last-Modified) once they are older than the configured maximum age. A file
+published without a SHA256 is cached as such; it will not gain one later.
+"""
+
+import time
+
+from nexis_state import read_json, atomic_write_json
+
+
+class CivitaiMetadataCache:
+    def __init__(self, cache_dir, max_age_hours=168):
+        self.cache_dir = cache_dir
+        self.max_age_seconds = max_age_hours * 3600
+
+    def _entry_path(self, version_id):
+        return self.cache_dir / f"{version_id}.json"
+
+    def get(self, version_id):
+        """Return the cached entry for a model version, or None"""
+        entry = read_json(self._entry_path(version_id))
+        if not isinstance(entry, dict) or not isinstance(entry.get('files'), list):
+            return None
+        return entry
+
+    def needs_revalidation(self, entry):
+        """An entry is revalidated once it is older than the maximum age"""
+        if self.max_age_seconds <= 0:
+            return False
+        return time.time() - entry.get('fetched_at', 0) > self.max_age_seconds
+
+    def put(self, version_id, data, etag=None, last_modified=None):
+        """Store a model-version API response and return the cache entry"""
+        entry = {
+            'version_id': str(version_id),
+            'model_id': data.get('modelId'),
+            'base_model': data.get('baseModel'),
+            'files': [self._compact_file(f) for f in data.get('files') or []],
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': time.time(),
+        }
+        atomic_write_json(self._entry_path(version_id), entry)
+        return entry
+
+    def touch(self, version_id, entry):
+        """Mark an entry as fresh after a 304 Not Modified revalidation"""
+        entry['fetched_at'] = time.time()
+        atomic_write_json(self._entry_path(version_id), entry)
+        return entry
+
+    @staticmethod
+    def _compact_file(file_info):
+        """Keep only the per-file fields the downloader uses"""
+        size_kb = file_info.get('sizeKB')
+        return {
+            'name': file_info.get('name'),
+            'size': int(round(size_kb * 1024)) if isinstance(size_kb, (int, float)) else None,
+            'sha256': (file_info.get('hashes') or {}).get('SHA256', '').lower(),
+            'download_url': file_info.get('downloadUrl'),
+            'type': file_info.get('type'),
+            'primary': bool(file_info.get('primary')),
+            'metadata': file_info.get('metadata') or {},
+        }
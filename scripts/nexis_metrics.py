@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Nexis metrics - structured download events and a Prometheus textfile
+
+Every phase of a download (metadata lookup, transfer, checksum, final result)
+is appended as one JSON object per line to events.jsonl. At the end of a run
+the events of that run are aggregated into the summary printed by the
+downloader and into nexis_downloader.prom, which node_exporter's textfile
+collector can pick up when NEXIS_METRICS_DIR points at its directory.
+
+The organizer and prewarmer write the same metric families to their own
+textfiles; every sample carries a component label (downloader, organizer,
+prewarm) so the files never expose the same series twice.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+# events.jsonl is rotated to events.jsonl.1 once it grows past this size
+MAX_EVENTS_BYTES = 16 * 1024 * 1024
+
+
+class MetricsRecorder:
+    """Append-only event log for one downloader run"""
+
+    def __init__(self, metrics_dir, run_id=None, name="nexis_downloader"):
+        self.metrics_dir = metrics_dir
+        self.events_path = metrics_dir / "events.jsonl"
+        self.prometheus_path = metrics_dir / f"{name}.prom"
+        self.component = name[len("nexis_"):] if name.startswith("nexis_") else name
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.events = []
+        self._lock = threading.Lock()
+        self._rotated = False
+
+    def emit(self, event, **fields):
+        """Record one event; metrics must never break a download, so I/O errors are ignored"""
+        record = {'ts': round(time.time(), 3), 'run': self.run_id, 'event': event, **fields}
+        with self._lock:
+            self.events.append(record)
+            try:
+                self.metrics_dir.mkdir(parents=True, exist_ok=True)
+                self._rotate()
+                with open(self.events_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, sort_keys=True) + '\n')
+            except OSError:
+                pass
+        return record
+
+    def _rotate(self):
+        if self._rotated:
+            return
+        self._rotated = True
+        try:
+            if self.events_path.stat().st_size > MAX_EVENTS_BYTES:
+                os.replace(self.events_path, self.events_path.with_name(self.events_path.name + '.1'))
+        except FileNotFoundError:
+            pass
+
+    def _of(self, event):
+        with self._lock:
+            return [e for e in self.events if e['event'] == event]
+
+    def summary(self):
+        """Aggregate this run's events into the numbers shown at the end of a run"""
+        downloads = self._of('download')
+        transfers = self._of('transfer')
+        results = defaultdict(int)
+        for e in downloads:
+            results[e['result']] += 1
+        transferred = sum(e['bytes'] - e.get('resumed_bytes', 0) for e in transfers)
+        transfer_seconds = sum(e['duration_seconds'] for e in transfers)
+        hosts = defaultdict(lambda: [0, 0.0])
+        for e in transfers:
+            hosts[e['host']][0] += e['bytes'] - e.get('resumed_bytes', 0)
+            hosts[e['host']][1] += e['duration_seconds']
+        return {
+            'elapsed_seconds': time.time() - self.started,
+            'results': dict(results),
+            'bytes_transferred': transferred,
+            'throughput_bps': transferred / transfer_seconds if transfer_seconds else 0.0,
+            'retries': sum(e.get('retries', 0) for e in transfers),
+            'metadata_seconds': sum(e['duration_seconds'] for e in self._of('metadata')),
+            'checksum_seconds': sum(e['duration_seconds'] for e in self._of('checksum')),
+            'organize_seconds': sum(e['duration_seconds'] for e in self._of('organize')),
+            'host_throughput_bps': {
+                host: (b / s if s else 0.0) for host, (b, s) in hosts.items()
+            },
+            'slowest': sorted(downloads, key=lambda e: e['duration_seconds'], reverse=True)[:5],
+        }
+
+    def write_prometheus(self):
+        """Write this run's counters in the Prometheus text exposition format"""
+        lines = []
+
+        def metric(name, kind, help_text, samples, counts=None):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(samples.items()):
+                pairs = sorted(labels + (('component', self.component),))
+                label_text = '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+                if counts is None:
+                    lines.append(f"{name}{label_text} {value}")
+                else:
+                    lines.append(f"{name}_sum{label_text} {round(value, 6)}")
+                    lines.append(f"{name}_count{label_text} {counts[labels]}")
+
+        downloads = defaultdict(int)
+        download_seconds = defaultdict(float)
+        for e in self._of('download'):
+            key = (('category', e['category']), ('result', e['result']), ('source', e['source']))
+            downloads[key] += 1
+            download_seconds[key] += e['duration_seconds']
+        transfer_bytes = defaultdict(int)
+        transfer_seconds = defaultdict(float)
+        ttfb = defaultdict(float)
+        ttfb_counts = defaultdict(int)
+        transfers = defaultdict(int)
+        retries = defaultdict(int)
+        for e in self._of('transfer'):
+            key = (('host', e['host']),)
+            transfer_bytes[key] += e['bytes'] - e.get('resumed_bytes', 0)
+            transfer_seconds[key] += e['duration_seconds']
+            if e.get('ttfb_seconds') is not None:  # unknown for aria2c transfers
+                ttfb[key] += e['ttfb_seconds']
+                ttfb_counts[key] += 1
+            transfers[key] += 1
+            retries[key] += e.get('retries', 0)
+        phase_seconds = defaultdict(float)
+        phases = defaultdict(int)
+        for phase in ('metadata', 'checksum', 'organize', 'prewarm'):
+            for e in self._of(phase):
+                phase_seconds[(('phase', phase),)] += e['duration_seconds']
+                phases[(('phase', phase),)] += 1
+
+        metric('nexis_download_duration_seconds', 'summary',
+               'Download jobs by source, category and result.', download_seconds, downloads)
+        metric('nexis_transfer_bytes_total', 'counter', 'Bytes transferred over the network per host.',
+               transfer_bytes)
+        metric('nexis_transfer_duration_seconds', 'summary', 'Time spent transferring per host.',
+               transfer_seconds, transfers)
+        metric('nexis_transfer_ttfb_seconds', 'summary', 'Time to first byte per host.', ttfb, ttfb_counts)
+        metric('nexis_transfer_retries_total', 'counter', 'Retried range requests per host.', retries)
+        metric('nexis_phase_duration_seconds', 'summary', 'Time spent in metadata lookups, checksums, moves and prewarming.',
+               phase_seconds, phases)
+        evicted = defaultdict(int)
+        evicted_bytes = defaultdict(int)
+        for e in self._of('evict'):
+            evicted[()] += 1
+            evicted_bytes[()] += e['bytes']
+        metric('nexis_evicted_models_total', 'counter', 'Models removed by LRU eviction.', evicted)
+        metric('nexis_evicted_bytes_total', 'counter', 'Bytes freed by LRU eviction.', evicted_bytes)
+        metric('nexis_run_timestamp_seconds', 'gauge', 'Unix time the run finished.',
+               {(): round(time.time(), 3)})
+
+        write_textfile(self.prometheus_path, lines)
+
+
+class Histogram:
+    """Cumulative Prometheus histogram with one series per label set"""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def count(self, **labels):
+        with self._lock:
+            series = self._series.get(tuple(sorted(labels.items())))
+            return series['count'] if series else 0
+
+    def lines(self, name, help_text):
+        """The histogram in the Prometheus text exposition format"""
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                pairs = [f'{k}="{_escape(v)}"' for k, v in labels]
+                for bound, count in zip(self.buckets + [None], series['counts'] + [series['count']]):
+                    le = 'le="+Inf"' if bound is None else f'le="{bound:g}"'
+                    lines.append(f"{name}_bucket{{{','.join(pairs + [le])}}} {count}")
+                label_text = '{' + ','.join(pairs) + '}' if pairs else ''
+                lines.append(f"{name}_sum{label_text} {round(series['sum'], 6)}")
+                lines.append(f"{name}_count{label_text} {series['count']}")
+        return lines
+
+
+def write_textfile(path, lines):
+    """Atomically replace a Prometheus textfile; I/O errors are ignored like other metrics"""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_bytes(size):
+    """Human readable size, as du -h would print it"""
+    for unit in ('B', 'K', 'M', 'G', 'T'):
+        if size < 1024 or unit == 'T':
+            return f"{size:.1f}{unit}" if unit != 'B' else f"{int(size)}B"
+        size /= 1024
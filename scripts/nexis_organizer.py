@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Nexis organizer - move finished downloads from downloads_tmp into models/
+
+    downloads_tmp/<checkpoints|loras|vae>/<path>     ->  models/<category>/<path>
+    downloads_tmp/huggingface/<org>/<repo>/<path>    ->  models/<org>/<repo>/<path>
+
+Files are renamed when source and destination share a filesystem. Across
+filesystems the data is reflinked when the filesystem supports it, otherwise
+copied in parallel with copy_file_range into a temporary file that is
+renamed into place, so models/ never contains a partial file. HuggingFace
+trees are merged file by file into an existing destination. In-progress
+downloads (.part, .part.journal and aria2 files) are left alone so they can
+resume. Files that cannot be moved are preserved under debug/failed_downloads.
+"""
+
+import errno
+import fcntl
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from nexis_hashing import VerifiedManifest
+from nexis_metrics import MetricsRecorder
+from nexis_transfer import preallocate
+
+CATEGORIES = ("checkpoints", "loras", "vae")
+PARTIAL_SUFFIXES = ('.part', '.part.journal', '.aria2')
+FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+COPY_CHUNK_SIZE = 64 * 1024 * 1024
+PROGRESS_INTERVAL = 10.0
+
+
+class ModelOrganizer:
+    """Moves finished downloads into the models tree with atomic renames"""
+
+    def __init__(self, workspace_dir, log, metrics=None, copy_workers=4, verified=None):
+        self.workspace_dir = Path(workspace_dir)
+        self.download_tmp_dir = self.workspace_dir / "downloads_tmp"
+        self.models_dir = self.workspace_dir / "models"
+        self.debug_dir = self.workspace_dir / "debug" / "failed_downloads"
+        self.log = log
+        self.metrics = metrics
+        self.copy_workers = max(1, copy_workers)
+        self.verified = verified  # VerifiedManifest whose entries follow the moved files
+
+    def organize(self):
+        """Move every finished download; returns counts per method plus bytes and seconds"""
+        started = time.monotonic()
+        totals = {'rename': 0, 'reflink': 0, 'copy': 0, 'failed': 0, 'bytes': 0}
+        if not self.download_tmp_dir.is_dir():
+            self.log(f"No downloads directory found at {self.download_tmp_dir}. Nothing to organize.")
+            return {**totals, 'seconds': 0.0}
+
+        for category in CATEGORIES:
+            source_dir = self.download_tmp_dir / category
+            moves = [(path, self.models_dir / category / path.relative_to(source_dir))
+                     for path in self._finished_files(source_dir)]
+            self._move_all(category, moves, totals)
+
+        hf_dir = self.download_tmp_dir / "huggingface"
+        moves = [(path, self.models_dir / path.relative_to(hf_dir)) for path in self._finished_files(hf_dir)]
+        self._move_all("huggingface", moves, totals)
+
+        self._remove_empty_dirs(self.download_tmp_dir)
+        totals['seconds'] = time.monotonic() - started
+        moved = totals['rename'] + totals['reflink'] + totals['copy']
+        self.log(f"Organized {moved} files ({totals['rename']} renamed, {totals['reflink']} reflinked, "
+                 f"{totals['copy']} copied, {totals['failed']} preserved in debug) in {totals['seconds']:.1f}s")
+        return totals
+
+    @staticmethod
+    def _finished_files(source_dir):
+        if not source_dir.is_dir():
+            return []
+        files = []
+        for path in sorted(source_dir.rglob('*')):
+            if path.name.endswith(PARTIAL_SUFFIXES) or '.cache' in path.relative_to(source_dir).parts:
+                continue
+            if path.with_name(path.name + '.aria2').exists():
+                continue  # aria2c is still working on this file
+            if path.is_file() or path.is_symlink():
+                files.append(path)
+        return files
+
+    def _move_all(self, category, moves, totals):
+        if not moves:
+            self.log(f"Skipping {category}: no files found", is_debug=True)
+            return
+        self.log(f"Processing {len(moves)} {category} files...", is_debug=True)
+        for source, dest in moves:
+            started = time.monotonic()
+            known = self.verified.entry(source) if self.verified is not None else None
+            try:
+                size = source.lstat().st_size
+                method = self.move_file(source, dest)
+            except OSError as e:
+                self.log(f"Failed to move {source.name} ({e}), preserving in debug folder")
+                totals['failed'] += 1
+                self._preserve(category, source)
+                self._record(category, source.name, 'failed', None, 0, started)
+                continue
+            if known:
+                # A copy is a new inode and a rename a new path: record either under dest
+                self.verified.record(dest, known['sha256'], known.get('revision'))
+            totals[method] += 1
+            totals['bytes'] += size
+            self._record(category, source.name, 'moved', method, size, started)
+            self.log(f"Moved {dest.relative_to(self.models_dir)} ({method})", is_debug=True)
+
+    def _record(self, category, name, result, method, size, started):
+        if self.metrics is not None:
+            self.metrics.emit('organize', category=category, file=name, result=result, method=method,
+                              bytes=size, duration_seconds=time.monotonic() - started)
+
+    def _preserve(self, category, source):
+        try:
+            self.move_file(source, self.debug_dir / category / source.name)
+        except OSError as e:
+            self.log(f"ERROR: Could not preserve {source.name} in debug folder: {e}")
+
+    def move_file(self, source, dest):
+        """Move source to dest atomically; returns 'rename', 'reflink' or 'copy'"""
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if dest.exists() and os.path.samefile(source, dest):
+            source.unlink()  # dest is already a link to the same data
+            return 'rename'
+        try:
+            os.replace(source, dest)
+            return 'rename'
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+        # Different filesystems: build a complete temporary file next to dest, then rename it
+        if source.is_symlink():
+            tmp_path = dest.with_name(f".{dest.name}.nexis-tmp")
+            tmp_path.unlink(missing_ok=True)
+            os.symlink(os.readlink(source), tmp_path)
+            os.replace(tmp_path, dest)
+            source.unlink()
+            return 'rename'
+
+        tmp_path = dest.with_name(f".{dest.name}.{os.getpid()}.nexis-tmp")
+        try:
+            method = self._copy(source, tmp_path)
+            shutil.copystat(source, tmp_path)
+            os.replace(tmp_path, dest)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        source.unlink()
+        return method
+
+    def _copy(self, source, tmp_path):
+        """Copy into tmp_path with a reflink when possible, else parallel copy_file_range"""
+        size = source.stat().st_size
+        with open(source, 'rb') as src, open(tmp_path, 'wb') as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return 'reflink'
+            except OSError:
+                pass
+            preallocate(dst.fileno(), size)
+            self._parallel_copy(src.fileno(), dst.fileno(), size, source.name)
+            os.fsync(dst.fileno())
+        return 'copy'
+
+    def _parallel_copy(self, src_fd, dst_fd, size, name):
+        copied = [0]
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def copy_range(offset):
+            end = min(offset + COPY_CHUNK_SIZE, size)
+            position = offset
+            while position < end:
+                written = _copy_range(src_fd, dst_fd, position, end - position)
+                if written == 0:
+                    raise OSError(errno.EIO, f"Unexpected end of file while copying {name}")
+                position += written
+                with lock:
+                    copied[0] += written
+
+        def report_progress():
+            started = time.monotonic()
+            while not done.wait(PROGRESS_INTERVAL):
+                with lock:
+                    progress = copied[0]
+                elapsed = time.monotonic() - started
+                self.log(f"Copying {name} across filesystems: {progress / 1048576:.0f} of "
+                         f"{size / 1048576:.0f} MiB ({progress / 1048576 / elapsed:.0f} MiB/s)")
+
+        reporter = threading.Thread(target=report_progress, daemon=True)
+        reporter.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.copy_workers, thread_name_prefix="nexis-copy") as executor:
+                for future in [executor.submit(copy_range, offset) for offset in range(0, size, COPY_CHUNK_SIZE)]:
+                    future.result()
+        finally:
+            done.set()
+
+    def _remove_empty_dirs(self, root):
+        for path in sorted((p for p in root.rglob('*') if p.is_dir()), key=lambda p: len(p.parts), reverse=True):
+            try:
+                path.rmdir()
+            except OSError:
+                pass
+
+
+def _copy_range(src_fd, dst_fd, offset, count):
+    """Copy up to count bytes at offset in-kernel, with a pread/pwrite fallback"""
+    try:
+        return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+    except (AttributeError, OSError) as e:
+        if isinstance(e, OSError) and e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.EINVAL):
+            raise
+    data = os.pread(src_fd, min(count, 8 * 1024 * 1024), offset)
+    return os.pwrite(dst_fd, data, offset) if data else 0
+
+
+def main():
+    debug_mode = os.getenv('DEBUG_MODE', 'false').lower() == 'true'
+
+    def log(message, is_debug=False):
+        if is_debug and not debug_mode:
+            return
+        print(f"[ORGANIZER] {message}")
+
+    workspace = Path(os.getenv('WORKSPACE', '/home/comfyuser/workspace'))
+    state_dir = Path(os.getenv('NEXIS_STATE_DIR', str(workspace / ".nexis")))
+    metrics = MetricsRecorder(Path(os.getenv('NEXIS_METRICS_DIR', str(state_dir / "metrics"))),
+                              name="nexis_organizer")
+    verified = VerifiedManifest(state_dir / "verified_files.json")
+    log("Starting file organization...")
+    with verified.batch():
+        ModelOrganizer(workspace, log, metrics=metrics, verified=verified).organize()
+    metrics.write_prometheus()
+    log("File organization completed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
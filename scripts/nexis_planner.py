@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Nexis disk planner - check that a download run fits before it starts
+
+Sizes come from the cached CivitAI metadata and HF listings; bytes already
+on disk (stored blobs, verified files, preallocated partial downloads) are
+not counted again. The plan is compared with the free space of
+downloads_tmp and models/ minus a reserve, and NEXIS_DISK_POLICY decides
+what happens when it does not fit:
+
+    trim     keep list order, skip the jobs that no longer fit (default)
+    reorder  run the smallest jobs first so the most models fit, skip the rest
+    refuse   download nothing
+"""
+
+import os
+
+POLICIES = ('trim', 'reorder', 'refuse')
+
+
+def free_bytes(path):
+    """Free space available to this user on the filesystem holding path"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    stats = os.statvfs(path)
+    return stats.f_bavail * stats.f_frsize
+
+
+def allocated_bytes(path):
+    """Bytes a (possibly preallocated, possibly sparse) file already occupies"""
+    try:
+        return os.stat(path).st_blocks * 512
+    except (FileNotFoundError, NotADirectoryError):
+        return 0
+
+
+def available_bytes(download_tmp_dir, models_dir, reserve):
+    """Space a run may use: everything downloads into downloads_tmp, then moves to models/.
+
+    On one filesystem a move is a rename and the bytes are only needed once;
+    on two, both sides must hold the full run at some point.
+    """
+    tmp_free = free_bytes(download_tmp_dir)
+    models_free = free_bytes(models_dir)
+    if _device(download_tmp_dir) == _device(models_dir):
+        return max(0, tmp_free - reserve)
+    return max(0, min(tmp_free, models_free) - reserve)
+
+
+def _device(path):
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    return os.stat(path).st_dev
+
+
+class DiskPlan:
+    """Outcome of planning: the jobs to run, those skipped, and the numbers behind it"""
+
+    def __init__(self, jobs, skipped, needed, available, unknown):
+        self.jobs = jobs
+        self.skipped = skipped
+        self.needed = needed
+        self.available = available
+        self.unknown = unknown
+
+    @property
+    def fits(self):
+        return not self.skipped
+
+
+def plan_downloads(jobs, needs, available, policy='trim'):
+    """Choose which jobs to run given the bytes each still needs.
+
+    needs maps job index to bytes, or None when the size is unknown; unknown
+    sizes are never skipped because the planner cannot tell whether they fit.
+    """
+    if policy not in POLICIES:
+        policy = 'trim'
+    needed = sum(n for n in needs if n)
+    unknown = [job for job, n in zip(jobs, needs) if n is None]
+    if needed <= available:
+        return DiskPlan(list(jobs), [], needed, available, unknown)
+    if policy == 'refuse':
+        return DiskPlan([], list(jobs), needed, available, unknown)
+
+    order = list(range(len(jobs)))
+    if policy == 'reorder':
+        order.sort(key=lambda i: needs[i] or 0)
+    kept, skipped, remaining = [], [], available
+    for i in order:
+        need = needs[i] or 0
+        if need <= remaining:
+            kept.append(jobs[i])
+            remaining -= need
+        else:
+            skipped.append(jobs[i])
+    return DiskPlan(kept, skipped, needed, available, unknown)
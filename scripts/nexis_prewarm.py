@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Nexis prewarm - stream selected models into the page cache before their first use
+
+Models sit cold on the (often network) volume after a download or a pod
+restart, so the first workflow pays the full read latency of a multi-GB
+checkpoint. This stage reads them once in the background:
+
+    NEXIS_PREWARM="checkpoints/sdxl*,loras/*"   patterns relative to models/, highest priority first
+                                                 ('all' or '*' for every model file)
+
+Each file gets a POSIX_FADV_WILLNEED hint and is then read in parallel
+chunks, which also works on network filesystems that ignore the hint. The
+total stays within NEXIS_PREWARM_MEMORY_PERCENT of the memory that is
+actually available (MemAvailable, and the container's cgroup limit), and
+availability is checked again before every file, so prewarming backs off
+when ComfyUI starts loading models itself.
+"""
+
+import fnmatch
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from nexis_metrics import MetricsRecorder, format_bytes
+
+MODEL_SUFFIXES = ('.safetensors', '.ckpt', '.pt', '.pth', '.bin', '.gguf', '.sft', '.onnx')
+CHUNK_SIZE = 8 * 1024 * 1024
+CGROUP_FILES = (
+    ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory.current'),                         # cgroup v2
+    ('/sys/fs/cgroup/memory/memory.limit_in_bytes', '/sys/fs/cgroup/memory/memory.usage_in_bytes'),  # v1
+)
+
+
+def parse_patterns(value):
+    """Comma-separated priority patterns; 'all' selects every model file"""
+    patterns = [item.strip() for item in (value or '').split(',') if item.strip()]
+    return ['*' if pattern.lower() == 'all' else pattern for pattern in patterns]
+
+
+def select_files(models_dir, patterns):
+    """Model files under models_dir in priority order: by pattern, then newest first"""
+    models_dir = Path(models_dir)
+    if not patterns or not models_dir.is_dir():
+        return []
+    candidates = [path for path in models_dir.rglob('*')
+                  if path.suffix.lower() in MODEL_SUFFIXES and path.is_file() and not path.name.startswith('.')]
+    selected, seen = [], set()
+    for pattern in patterns:
+        matches = [path for path in candidates if path not in seen and (
+            fnmatch.fnmatch(path.relative_to(models_dir).as_posix(), pattern) or fnmatch.fnmatch(path.name, pattern))]
+        matches.sort(key=lambda path: path.stat().st_mtime, reverse=True)
+        selected.extend(matches)
+        seen.update(matches)
+    return selected
+
+
+def mem_available(meminfo='/proc/meminfo', cgroup_files=CGROUP_FILES):
+    """Bytes that can be filled with page cache without pressure: MemAvailable, capped by the cgroup"""
+    available = None
+    try:
+        with open(meminfo, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    available = int(line.split()[1]) * 1024
+                    break
+    except (OSError, ValueError, IndexError):
+        pass
+    for limit_path, usage_path in cgroup_files:
+        try:
+            limit = Path(limit_path).read_text().strip()
+            usage = int(Path(usage_path).read_text().strip())
+        except (OSError, ValueError):
+            continue
+        if limit.isdigit():
+            free = max(0, int(limit) - usage)
+            available = free if available is None else min(available, free)
+        break
+    return available or 0
+
+
+class Prewarmer:
+    """Reads files into the page cache in priority order within a memory budget"""
+
+    def __init__(self, log, memory_fraction=0.5, workers=4, metrics=None, available=mem_available):
+        self.log = log
+        self.memory_fraction = memory_fraction
+        self.workers = max(1, workers)
+        self.metrics = metrics
+        self.available = available
+        self._buffers = threading.local()
+
+    def prewarm(self, files):
+        """Warm files in order; returns {'files': n, 'bytes': n, 'skipped': n, 'seconds': s}"""
+        started = time.monotonic()
+        budget = int(self.available() * self.memory_fraction)
+        totals = {'files': 0, 'bytes': 0, 'skipped': 0}
+        self.log(f"Prewarming up to {format_bytes(budget)} from {len(files)} model files...")
+        for path in files:
+            try:
+                size = path.stat().st_size
+            except OSError:
+                continue
+            # Re-check before each file: ComfyUI may be loading models at the same time
+            room = min(budget, int(self.available() * self.memory_fraction))
+            if size > room:
+                self.log(f"Skipping {path.name} ({format_bytes(size)}): only {format_bytes(room)} "
+                         f"of the prewarm budget left", is_debug=True)
+                totals['skipped'] += 1
+                continue
+            file_started = time.monotonic()
+            try:
+                self.warm(path, size)
+            except OSError as e:
+                self.log(f"Could not prewarm {path.name}: {e}")
+                totals['skipped'] += 1
+                continue
+            duration = time.monotonic() - file_started
+            budget -= size
+            totals['files'] += 1
+            totals['bytes'] += size
+            if self.metrics is not None:
+                self.metrics.emit('prewarm', file=path.name, bytes=size, duration_seconds=duration,
+                                  throughput_bps=size / duration if duration > 0 else None)
+            self.log(f"Prewarmed {path.name} ({format_bytes(size)} in {duration:.1f}s)", is_debug=True)
+        totals['seconds'] = time.monotonic() - started
+        self.log(f"Prewarmed {totals['files']} files ({format_bytes(totals['bytes'])}) in "
+                 f"{totals['seconds']:.1f}s, {totals['skipped']} skipped")
+        return totals
+
+    def warm(self, path, size):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            try:
+                os.posix_fadvise(fd, 0, size, os.POSIX_FADV_WILLNEED)
+            except (AttributeError, OSError):
+                pass  # the reads below populate the cache anyway
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="nexis-prewarm") as executor:
+                for future in [executor.submit(self._read_range, fd, offset, min(CHUNK_SIZE, size - offset))
+                               for offset in range(0, size, CHUNK_SIZE)]:
+                    future.result()
+        finally:
+            os.close(fd)
+
+    def _read_range(self, fd, offset, length):
+        buffer = getattr(self._buffers, 'buffer', None)
+        if buffer is None:
+            buffer = self._buffers.buffer = bytearray(CHUNK_SIZE)
+        view = memoryview(buffer)
+        while length > 0:
+            read = os.preadv(fd, [view[:length]], offset)
+            if not read:
+                return
+            offset += read
+            length -= read
+
+
+def main():
+    patterns = parse_patterns(os.getenv('NEXIS_PREWARM', ''))
+    if not patterns:
+        return 0
+    debug_mode = os.getenv('DEBUG_MODE', 'false').lower() == 'true'
+
+    def log(message, is_debug=False):
+        if is_debug and not debug_mode:
+            return
+        print(f"[PREWARM] {message}")
+
+    def env_int(name, default):
+        value = os.getenv(name, '').strip()
+        return int(value) if value.isdigit() and int(value) > 0 else default
+
+    workspace = Path(os.getenv('WORKSPACE', '/home/comfyuser/workspace'))
+    state_dir = Path(os.getenv('NEXIS_STATE_DIR', str(workspace / ".nexis")))
+    metrics = MetricsRecorder(Path(os.getenv('NEXIS_METRICS_DIR', str(state_dir / "metrics"))),
+                              name="nexis_prewarm")
+    prewarmer = Prewarmer(log, memory_fraction=min(100, env_int('NEXIS_PREWARM_MEMORY_PERCENT', 50)) / 100,
+                          workers=env_int('NEXIS_PREWARM_WORKERS', 4), metrics=metrics)
+    prewarmer.prewarm(select_files(workspace / "models", patterns))
+    metrics.write_prometheus()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
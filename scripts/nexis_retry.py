@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Nexis retry - host-aware retries with Retry-After, adaptive backoff and circuit breakers
+
+Metadata calls, CivitAI downloads (native and aria2c) and HF file fetches go
+through one HostRetry, which keeps per-host health:
+
+    Retry-After         honoured when a 429/503 carries it; a wait longer than
+                        the backoff cap opens the host's circuit instead of
+                        blocking a worker
+    backoff             exponential with jitter, stretched by the share of
+                        recent requests to the host that were 429/5xx
+    circuit breaker     after consecutive failures the host is paused for a
+                        cooldown (doubling while it keeps failing); calls to a
+                        paused host raise HostUnavailable so the scheduler can
+                        requeue the job and let other hosts run at full speed
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+HEALTH_WINDOW = 60.0
+
+
+class HostUnavailable(Exception):
+    """A host's circuit is open; retry the work after `until` (time.monotonic())"""
+
+    def __init__(self, host, until):
+        super().__init__(f"{host} is paused for {max(0.0, until - time.monotonic()):.0f}s after repeated failures")
+        self.host = host
+        self.until = until
+
+
+def host_of(url):
+    return urlparse(url).netloc
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), else None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def failure_of(outcome):
+    """(status, retry_after) if outcome is a retryable failure, else None.
+
+    outcome is a Response or an exception raised while making the request.
+    """
+    if isinstance(outcome, requests.Response):
+        response = outcome
+    elif isinstance(outcome, requests.HTTPError):
+        response = outcome.response
+    elif isinstance(outcome, (requests.ConnectionError, requests.Timeout,
+                              requests.exceptions.ChunkedEncodingError)):
+        return 'error', None
+    else:
+        return None
+    if response is None or response.status_code not in RETRY_STATUSES:
+        return None
+    return response.status_code, parse_retry_after(response.headers.get('Retry-After'))
+
+
+class _Circuit:
+    def __init__(self):
+        self.outcomes = deque()  # (time, failed) within HEALTH_WINDOW
+        self.consecutive = 0
+        self.open_until = 0.0
+        self.cooldown = 0.0
+
+
+class HostRetry:
+    """Per-host retry policy and circuit breaker shared by all download paths"""
+
+    def __init__(self, attempts=5, base_delay=1.0, max_delay=60.0, failure_threshold=5,
+                 cooldown=30.0, max_cooldown=600.0, emit=None, log=None):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.emit = emit or (lambda *args, **kwargs: None)
+        self.log = log or (lambda *args, **kwargs: None)
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, host):
+        circuit = self._hosts.get(host)
+        if circuit is None:
+            circuit = self._hosts[host] = _Circuit()
+        return circuit
+
+    def failure_rate(self, host):
+        """Share of requests to host in the last minute that failed"""
+        with self._lock:
+            circuit = self._circuit(host)
+            self._trim(circuit)
+            if not circuit.outcomes:
+                return 0.0
+            return sum(failed for _, failed in circuit.outcomes) / len(circuit.outcomes)
+
+    @staticmethod
+    def _trim(circuit):
+        horizon = time.monotonic() - HEALTH_WINDOW
+        while circuit.outcomes and circuit.outcomes[0][0] < horizon:
+            circuit.outcomes.popleft()
+
+    def check(self, host):
+        """Raise HostUnavailable while host's circuit is open"""
+        with self._lock:
+            until = self._circuit(host).open_until
+        if until > time.monotonic():
+            raise HostUnavailable(host, until)
+
+    def is_open(self, host):
+        with self._lock:
+            return self._circuit(host).open_until > time.monotonic()
+
+    def record_success(self, host):
+        with self._lock:
+            circuit = self._circuit(host)
+            circuit.outcomes.append((time.monotonic(), False))
+            self._trim(circuit)
+            if circuit.cooldown:
+                self.log(f"{host} recovered, closing its circuit")
+                self.emit('circuit', host=host, state='closed')
+            circuit.consecutive = 0
+            circuit.cooldown = 0.0
+
+    def record_failure(self, host, status, retry_after=None):
+        """Count a failure; opens the circuit on a streak or a long Retry-After"""
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._circuit(host)
+            circuit.outcomes.append((now, True))
+            self._trim(circuit)
+            circuit.consecutive += 1
+            pause = None
+            if retry_after is not None and retry_after > self.max_delay:
+                pause = retry_after  # the server asked for a long pause; do not hold a worker for it
+            elif circuit.consecutive >= self.failure_threshold and circuit.open_until <= now:
+                circuit.cooldown = min(self.max_cooldown, circuit.cooldown * 2 or self.cooldown)
+                pause = circuit.cooldown
+            if pause is not None:
+                circuit.open_until = max(circuit.open_until, now + pause)
+                circuit.consecutive = 0
+        if pause is not None:
+            self.log(f"⏳ Pausing {host} for {pause:.0f}s (last status: {status})")
+            self.emit('circuit', host=host, state='open', status=status, pause_seconds=pause)
+
+    def delay(self, host, attempt, retry_after=None):
+        """Seconds to wait before retry number attempt (1-based)"""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        backoff = self.base_delay * 2 ** (attempt - 1) * (1 + 3 * self.failure_rate(host))
+        backoff = min(backoff, self.max_delay)
+        return random.uniform(backoff / 2, backoff)
+
+    def failed(self, host, outcome, attempt):
+        """Record a failed attempt; returns the delay before retrying, or None to give up"""
+        failure = failure_of(outcome)
+        if failure is None:
+            return None
+        return self.backoff(host, *failure, attempt=attempt)
+
+    def backoff(self, host, status, retry_after=None, attempt=1):
+        """Record a retryable failure of any kind (e.g. a subprocess exit code) and return its delay.
+
+        Returns None once attempts are exhausted; raises HostUnavailable if
+        the failure opened the host's circuit.
+        """
+        self.record_failure(host, status, retry_after)
+        if attempt >= self.attempts:
+            return None
+        self.check(host)
+        delay = self.delay(host, attempt, retry_after)
+        self.emit('retry', host=host, status=status, attempt=attempt, delay_seconds=delay)
+        return delay
+
+    def call(self, host, fn):
+        """Run fn() with retries; fn returns a Response or raises a requests exception.
+
+        A retryable Response is returned as-is after the last attempt so the
+        caller's raise_for_status reports it. Raises HostUnavailable when the
+        host's circuit is, or becomes, open.
+        """
+        attempt = 0
+        while True:
+            self.check(host)
+            attempt += 1
+            try:
+                result = fn()
+            except requests.RequestException as e:
+                delay = self.failed(host, e, attempt)
+                if delay is None:
+                    raise
+            else:
+                if failure_of(result) is None:
+                    self.record_success(host)
+                    return result
+                delay = self.failed(host, result, attempt)
+                if delay is None:
+                    return result
+                result.close()
+            time.sleep(delay)
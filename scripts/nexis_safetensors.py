@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Nexis safetensors check - structural integrity without hashing
+
+A .safetensors file is an 8-byte little-endian header length, a JSON header
+mapping tensor names to dtype, shape and [begin, end) data offsets, and the
+tensor data. Only the header is read: every tensor's byte length must match
+its dtype and shape, the tensors must tile the data section without gaps or
+overlaps, and the data section must end exactly at the end of the file. That
+catches truncated, padded and garbled files in well under a millisecond per
+file, where a SHA256 would read every byte.
+
+Used by the downloader when no SHA256 is published, and at boot over the
+models tree (NEXIS_VERIFY_MODELS):
+
+    python3 nexis_safetensors.py [--quarantine] [paths ...]
+"""
+
+import argparse
+import json
+import math
+import os
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+MAX_HEADER_SIZE = 100 * 1024 * 1024
+DTYPE_SIZES = {
+    'BOOL': 1, 'U8': 1, 'I8': 1, 'F8_E5M2': 1, 'F8_E4M3': 1, 'F8_E8M0': 1,
+    'I16': 2, 'U16': 2, 'F16': 2, 'BF16': 2,
+    'I32': 4, 'U32': 4, 'F32': 4,
+    'I64': 8, 'U64': 8, 'F64': 8, 'C64': 8,
+}
+
+
+class InvalidSafetensors(Exception):
+    """The file is not a structurally valid safetensors file"""
+
+
+def check(path):
+    """Validate the structure of a safetensors file; raises InvalidSafetensors, returns the tensor count"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        prefix = f.read(8)
+        if len(prefix) < 8:
+            raise InvalidSafetensors(f"file is {size} bytes, too short for a header")
+        header_size = struct.unpack('<Q', prefix)[0]
+        if header_size > min(MAX_HEADER_SIZE, size - 8):
+            raise InvalidSafetensors(f"header length {header_size} does not fit a {size}-byte file")
+        raw = f.read(header_size)
+    try:
+        header = json.loads(raw.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise InvalidSafetensors(f"header is not valid JSON: {e}")
+    if not isinstance(header, dict):
+        raise InvalidSafetensors("header is not a JSON object")
+
+    spans = []
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+        try:
+            dtype, shape, (begin, end) = info['dtype'], info['shape'], info['data_offsets']
+        except (TypeError, KeyError, ValueError):
+            raise InvalidSafetensors(f"tensor {name!r} has a malformed entry")
+        if not isinstance(dtype, str) or not isinstance(shape, list) or \
+                not all(isinstance(n, int) and n >= 0 for n in (begin, end, *shape)) or end < begin:
+            raise InvalidSafetensors(f"tensor {name!r} has invalid shape or offsets")
+        if dtype in DTYPE_SIZES and end - begin != math.prod(shape) * DTYPE_SIZES[dtype]:
+            raise InvalidSafetensors(f"tensor {name!r} ({dtype} {shape}) spans {end - begin} bytes, "
+                                     f"expected {math.prod(shape) * DTYPE_SIZES[dtype]}")
+        spans.append((begin, end, name))
+
+    position = 0
+    for begin, end, name in sorted(spans):
+        if begin != position:
+            kind = "overlaps the previous tensor" if begin < position else "leaves a gap"
+            raise InvalidSafetensors(f"tensor {name!r} {kind} at byte {position}")
+        position = end
+    data_size = size - 8 - header_size
+    if position != data_size:
+        state = "truncated" if position > data_size else "has trailing bytes"
+        raise InvalidSafetensors(f"{state}: tensors need {position} data bytes, file holds {data_size}")
+    return len(spans)
+
+
+def check_all(paths, workers=8):
+    """Check files in parallel; returns {path: error message} for the broken ones"""
+    def run(path):
+        try:
+            check(path)
+            return None
+        except (InvalidSafetensors, OSError) as e:
+            return str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="nexis-verify") as executor:
+        results = executor.map(run, paths)
+    return {path: error for path, error in zip(paths, results) if error is not None}
+
+
+def find_files(roots):
+    files = []
+    for root in roots:
+        root = Path(root)
+        if root.is_file():
+            files.append(root)
+        elif root.is_dir():
+            files.extend(path for path in sorted(root.rglob('*.safetensors'))
+                         if path.is_file() and not path.name.startswith('.'))
+    return files
+
+
+def quarantine(path, models_dir, quarantine_dir, store_dir=None):
+    """Move a broken model out of models/, dropping a store blob that shares its data"""
+    st = os.stat(path)
+    if store_dir is not None and (st.st_nlink > 1 or path.is_symlink()):
+        for blob in Path(store_dir, "sha256").glob('*/*'):
+            try:
+                if os.path.samefile(blob, path):
+                    blob.unlink()
+                    break
+            except OSError:
+                continue
+    try:
+        relative = path.relative_to(models_dir)
+    except ValueError:
+        relative = Path(path.name)
+    dest = Path(quarantine_dir) / relative
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(path, dest)
+    return dest
+
+
+def main(argv=None):
+    workspace = Path(os.getenv('WORKSPACE', '/home/comfyuser/workspace'))
+    state_dir = Path(os.getenv('NEXIS_STATE_DIR', str(workspace / ".nexis")))
+    parser = argparse.ArgumentParser(description="Structural check of .safetensors files")
+    parser.add_argument('paths', nargs='*', help="Files or directories (default: the models tree)")
+    parser.add_argument('--quarantine', action='store_true',
+                        help="Move broken files to debug/corrupted_models so the downloader fetches them again")
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    models_dir = workspace / "models"
+    files = find_files(args.paths or [models_dir])
+    broken = check_all(files, args.workers)
+    for path, error in sorted(broken.items()):
+        print(f"[VERIFY] ❌ {path}: {error}")
+        if args.quarantine:
+            store_dir = Path(os.getenv('NEXIS_MODEL_STORE_DIR', str(state_dir / "store")))
+            try:
+                dest = quarantine(path, models_dir, workspace / "debug" / "corrupted_models", store_dir)
+                print(f"[VERIFY]    moved to {dest}")
+            except OSError as e:
+                print(f"[VERIFY]    could not move it: {e}")
+    print(f"[VERIFY] Checked {len(files)} safetensors files, {len(broken)} broken")
+    return 1 if broken else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Nexis seed packs - provision a pod's models from one indexed archive
+
+A seed pack holds a set of downloaded models in one seekable file, so a new
+pod can copy them from a sibling's volume or a local HTTP server instead of
+re-fetching every file from CivitAI and HuggingFace:
+
+    nexis_downloader.py export /workspace/seed.nxpk [checkpoints/sdxl* loras ...]
+    nexis_downloader.py import /workspace/seed.nxpk [PATTERN ...]
+    nexis_downloader.py import http://10.0.0.5:8000/seed.nxpk loras
+    NEXIS_SEED_PACK=/path/or/url     import before every download run
+
+Layout: an 8-byte magic, the index length as a big-endian u64, the JSON
+index, then file data starting at the next 4 KiB boundary. The index lists
+each file's path relative to models/, size, SHA256, offset from the start of
+the data and the model store aliases (civitai:<version>, hf:<repo>/<path>)
+that resolve to it, so the downloader recognizes imported models without
+a metadata request.
+
+Import reads the selected entries in pack order, one sequential stream per
+contiguous run of entries (an HTTP Range request when the pack is remote),
+hashes each file as it is written next to its destination, and only renames
+it into place when the SHA256 matches. Files already present, or already in
+the model store, are not read from the pack at all.
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import struct
+import time
+from pathlib import Path
+
+from nexis_transfer import preallocate
+
+MAGIC = b"NEXISPK1"
+HEADER = struct.Struct('>8sQ')
+ALIGN = 4096
+CHUNK_SIZE = 8 * 1024 * 1024
+INDEX_VERSION = 1
+
+
+class SeedPackError(Exception):
+    """The pack is unreadable, or a file in it does not match its index"""
+
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def is_url(source):
+    return str(source).startswith(('http://', 'https://'))
+
+
+def matches(path, patterns):
+    """True when a models/-relative path is selected by any pattern (none selects everything)"""
+    if not patterns:
+        return True
+    return any(fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(path, pattern.rstrip('/') + '/*')
+               or fnmatch.fnmatch(path.rsplit('/', 1)[-1], pattern) for pattern in patterns)
+
+
+def write_pack(pack_path, files):
+    """Write files ({'path', 'source', 'size', 'sha256', 'aliases'}) to pack_path; returns the index"""
+    entries, offset = [], 0
+    for item in files:
+        offset = _aligned(offset)
+        entries.append({'path': item['path'], 'size': item['size'], 'sha256': item['sha256'],
+                        'offset': offset, 'aliases': sorted(item.get('aliases') or [])})
+        offset += item['size']
+    index = {'version': INDEX_VERSION, 'created_at': time.time(), 'entries': entries}
+    encoded = json.dumps(index, sort_keys=True).encode()
+    data_offset = _aligned(HEADER.size + len(encoded))
+
+    pack_path = Path(pack_path)
+    tmp_path = pack_path.with_name(f".{pack_path.name}.{os.getpid()}.tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        preallocate(fd, data_offset + offset)
+        os.pwrite(fd, HEADER.pack(MAGIC, len(encoded)) + encoded, 0)
+        for item, entry in zip(files, entries):
+            with open(item['source'], 'rb', buffering=0) as source:
+                if os.fstat(source.fileno()).st_size != entry['size']:
+                    raise SeedPackError(f"{entry['path']} changed while the pack was written")
+                _copy_range(source.fileno(), fd, data_offset + entry['offset'], entry['size'])
+        os.fsync(fd)
+    except BaseException:
+        os.close(fd)
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.close(fd)
+    os.replace(tmp_path, pack_path)
+    return index
+
+
+def _copy_range(source_fd, dest_fd, dest_offset, size):
+    """Copy a whole file into the pack at dest_offset, in the kernel when possible"""
+    copied = 0
+    while copied < size:
+        try:
+            n = os.copy_file_range(source_fd, dest_fd, size - copied, copied, dest_offset + copied)
+        except (AttributeError, OSError):
+            n = os.pwrite(dest_fd, os.pread(source_fd, min(CHUNK_SIZE, size - copied), copied),
+                          dest_offset + copied)
+        if not n:
+            raise SeedPackError("unexpected end of file while writing the pack")
+        copied += n
+
+
+class _LocalReader:
+    def __init__(self, path):
+        self.f = open(path, 'rb', buffering=0)
+        try:
+            os.posix_fadvise(self.f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except (AttributeError, OSError):
+            pass
+
+    def stream(self, start, length):
+        self.f.seek(start)
+        return self.f
+
+    def close(self):
+        self.f.close()
+
+
+class _HttpReader:
+    def __init__(self, session, url, timeout=60):
+        self.session = session
+        self.url = url
+        self.timeout = timeout
+        self._response = None
+
+    def stream(self, start, length):
+        """The bytes from start onwards; a server ignoring Range is read from 0 and skipped forward"""
+        self.close()
+        response = self.session.get(self.url, stream=True, timeout=self.timeout,
+                                    headers={'Range': f"bytes={start}-{start + length - 1}",
+                                             'Accept-Encoding': 'identity'})
+        if response.status_code not in (200, 206):
+            response.close()
+            raise SeedPackError(f"HTTP {response.status_code} for {self.url}")
+        self._response = response
+        if response.status_code == 200:
+            _read_exactly(response.raw, start, discard=True)
+        return response.raw
+
+    def close(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+
+def _read_exactly(stream, size, discard=False):
+    """Read exactly size bytes from stream, returning them unless discard is set"""
+    chunks = []
+    buffer = bytearray(min(CHUNK_SIZE, max(size, 1)))
+    view = memoryview(buffer)
+    while size > 0:
+        read = stream.readinto(view[:min(len(buffer), size)])
+        if not read:
+            raise SeedPackError("the pack ended early")
+        size -= read
+        if not discard:
+            chunks.append(bytes(view[:read]))
+    return b''.join(chunks)
+
+
+class SeedPack:
+    """An opened seed pack (local path or http(s) URL) and its index"""
+
+    def __init__(self, source, session=None):
+        self.source = str(source)
+        if is_url(source):
+            if session is None:
+                raise ValueError("an HTTP session is needed for a remote seed pack")
+            self.reader = _HttpReader(session, self.source)
+        else:
+            self.reader = _LocalReader(source)
+        try:
+            self.index, self.data_offset = self._read_index()
+        except BaseException:
+            self.reader.close()
+            raise
+
+    def _read_index(self):
+        magic, length = HEADER.unpack(_read_exactly(self.reader.stream(0, HEADER.size), HEADER.size))
+        if magic != MAGIC:
+            raise SeedPackError(f"{self.source} is not a seed pack")
+        try:
+            index = json.loads(_read_exactly(self.reader.stream(HEADER.size, length), length))
+        except ValueError as e:
+            raise SeedPackError(f"unreadable index in {self.source}: {e}") from e
+        if index.get('version') != INDEX_VERSION:
+            raise SeedPackError(f"unsupported seed pack version {index.get('version')}")
+        for entry in index['entries']:
+            path = Path(entry['path'])
+            if path.is_absolute() or '..' in path.parts or not path.parts:
+                raise SeedPackError(f"unsafe path {entry['path']!r} in {self.source}")
+        return index, _aligned(HEADER.size + length)
+
+    @property
+    def entries(self):
+        return self.index['entries']
+
+    def runs(self, entries):
+        """Group entries into runs that are contiguous in the pack (alignment padding aside)"""
+        runs = []
+        for entry in sorted(entries, key=lambda e: e['offset']):
+            if runs and _aligned(runs[-1][-1]['offset'] + runs[-1][-1]['size']) >= entry['offset']:
+                runs[-1].append(entry)
+            else:
+                runs.append([entry])
+        return runs
+
+    def extract(self, entries, dest_for, on_file):
+        """Stream entries to dest_for(entry), verifying each; on_file(entry, path or None, error)"""
+        buffer = bytearray(CHUNK_SIZE)
+        view = memoryview(buffer)
+        for run in self.runs(entries):
+            start = run[0]['offset']
+            end = run[-1]['offset'] + run[-1]['size']
+            stream = self.reader.stream(self.data_offset + start, end - start)
+            position = start
+            for entry in run:
+                _read_exactly(stream, entry['offset'] - position, discard=True)
+                position = entry['offset'] + entry['size']
+                dest = dest_for(entry)
+                tmp = dest.with_name(f".{dest.name}.seedpack")
+                try:
+                    self._write(stream, entry, tmp, buffer, view)
+                    os.replace(tmp, dest)
+                except SeedPackError as e:
+                    tmp.unlink(missing_ok=True)
+                    on_file(entry, None, e)
+                    continue
+                except BaseException:
+                    tmp.unlink(missing_ok=True)
+                    raise
+                on_file(entry, dest, None)
+
+    @staticmethod
+    def _write(stream, entry, tmp, buffer, view):
+        tmp.parent.mkdir(parents=True, exist_ok=True)
+        hasher = hashlib.sha256()
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            preallocate(fd, entry['size'])
+            remaining = entry['size']
+            while remaining:
+                read = stream.readinto(view[:min(len(buffer), remaining)])
+                if not read:
+                    raise SeedPackError(f"the pack ended inside {entry['path']}")
+                hasher.update(view[:read])
+                written = 0
+                while written < read:
+                    written += os.write(fd, view[written:read])
+                remaining -= read
+        finally:
+            os.close(fd)
+        if hasher.hexdigest() != entry['sha256']:
+            raise SeedPackError(f"{entry['path']} does not match its SHA256 in the index")
+
+    def close(self):
+        self.reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
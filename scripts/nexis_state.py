@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Nexis state helpers - small utilities shared by the downloader's on-disk caches
+"""
+
+import json
+import os
+import threading
+
+
+def read_json(path, default=None):
+    """Read a JSON state file, returning default when missing or unreadable"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError, UnicodeDecodeError):
+        return default
+
+
+def atomic_write_json(path, data):
+    """Write JSON to path via a temp file and rename so readers never see partial state"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Nexis download status - which models are still pending, for progressive startup
+
+The downloader rewrites <state dir>/status.json whenever a job changes state,
+so users (through FileBrowser or `cat`) and scripts can see what ComfyUI is
+still waiting for while it already runs:
+
+    {"state": "downloading", "pending": 3, "complete": 5, "failed": 0,
+     "items": [{"source": "civitai", "category": "loras", "item": "182404",
+                "required": true, "state": "complete", "duration_seconds": 12.3}, ...]}
+"""
+
+import threading
+import time
+
+from nexis_lockfile import job_key
+from nexis_state import atomic_write_json
+
+ITEM_STATES = ('pending', 'running', 'complete', 'failed', 'skipped')
+
+
+class DownloadStatus:
+    """Per-job state of one downloader run, mirrored to a JSON file"""
+
+    def __init__(self, path, mode='sequential'):
+        self.path = path
+        self.mode = mode
+        self.started_at = time.time()
+        self.state = 'idle'
+        self.items = {}
+        self._lock = threading.Lock()
+
+    def start(self, jobs):
+        with self._lock:
+            self.state = 'downloading'
+            for job in jobs:
+                self.items.setdefault(job_key(job), {
+                    'source': job['source'],
+                    'category': job['category'],
+                    'item': job['item_id'],
+                    'required': job.get('required', True),
+                    'state': 'pending',
+                })
+            self._write()
+
+    def update(self, job, state, duration=None):
+        with self._lock:
+            item = self.items.setdefault(job_key(job), {
+                'source': job['source'], 'category': job['category'], 'item': job['item_id']})
+            item['state'] = state
+            if duration is not None:
+                item['duration_seconds'] = round(duration, 3)
+            self._write()
+
+    def finish(self):
+        with self._lock:
+            self.state = 'complete'
+            self._write()
+
+    def counts(self):
+        counts = {state: 0 for state in ITEM_STATES}
+        for item in self.items.values():
+            counts[item['state']] += 1
+        return counts
+
+    def _write(self):
+        counts = self.counts()
+        try:
+            atomic_write_json(self.path, {
+                'mode': self.mode,
+                'state': self.state,
+                'started_at': self.started_at,
+                'updated_at': time.time(),
+                'pending': counts['pending'] + counts['running'],
+                'complete': counts['complete'],
+                'failed': counts['failed'],
+                'skipped': counts['skipped'],
+                'items': list(self.items.values()),
+            })
+        except OSError:
+            pass  # Status reporting must never fail a download
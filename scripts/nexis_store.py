@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Nexis model store - content-addressed storage for downloaded models
+
+Every verified model is kept once under sha256/<ab>/<hash> and exposed in the
+models tree through hardlinks (symlinks when the store is on another
+filesystem). A small JSON index maps source keys such as "civitai:<version>"
+to hashes, so the downloader can place a known model without any network
+request and the same file listed twice never takes disk space twice.
+"""
+
+import errno
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+from nexis_locks import FileLock
+from nexis_state import read_json, atomic_write_json
+
+
+class ModelStore:
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.index_path = store_dir / "index.json"
+        self._lock = threading.RLock()
+        self._index = self._load_index()
+
+    def _load_index(self):
+        index = read_json(self.index_path, default={})
+        if not isinstance(index, dict):
+            index = {}
+        index.setdefault('blobs', {})
+        index.setdefault('aliases', {})
+        return index
+
+    def reload(self):
+        """Pick up blobs and aliases added by other processes"""
+        with self._lock:
+            self._index = self._load_index()
+
+    @contextmanager
+    def _updating_index(self):
+        """Apply a change on top of the latest index on disk, excluding other processes"""
+        with self._lock, FileLock(self.store_dir / "index.lock"):
+            self._index = self._load_index()
+            yield self._index
+            atomic_write_json(self.index_path, self._index)
+
+    def blob_path(self, sha256):
+        sha256 = sha256.lower()
+        return self.store_dir / "sha256" / sha256[:2] / sha256
+
+    def has(self, sha256):
+        """True when a blob with this hash is present with its recorded size"""
+        if not sha256:
+            return False
+        with self._lock:
+            entry = self._index['blobs'].get(sha256.lower())
+        blob = self.blob_path(sha256)
+        try:
+            return entry is not None and blob.stat().st_size == entry['size']
+        except OSError:
+            return False
+
+    def lookup(self, alias):
+        """Return (sha256, filename) for a source key whose blob is present, else None"""
+        with self._lock:
+            record = self._index['aliases'].get(alias)
+        if record and self.has(record['sha256']):
+            return record['sha256'], record['filename']
+        return None
+
+    def blob_hashes(self):
+        """Hashes of every blob recorded in the index"""
+        with self._lock:
+            return list(self._index['blobs'])
+
+    def aliases(self, sha256):
+        """Source keys that resolve to a hash"""
+        with self._lock:
+            return [alias for alias, record in self._index['aliases'].items() if record['sha256'] == sha256.lower()]
+
+    def add_alias(self, alias, sha256, filename):
+        record = {'sha256': sha256.lower(), 'filename': filename}
+        with self._lock:
+            if self._index['aliases'].get(alias) == record:
+                return
+        with self._updating_index() as index:
+            index['aliases'][alias] = record
+
+    def ingest(self, path, sha256, alias=None):
+        """Add a verified file to the store, leaving path as a link to the stored blob.
+
+        If the blob already exists the file at path is a duplicate and is
+        replaced by a link, which frees its space.
+        """
+        sha256 = sha256.lower()
+        blob = self.blob_path(sha256)
+        with self._updating_index() as index:
+            if self.has(sha256):
+                if not _same_file(path, blob):
+                    self._link(blob, path)
+            else:
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                blob.unlink(missing_ok=True)
+                try:
+                    os.link(path, blob)
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                        raise
+                    shutil.move(str(path), str(blob))
+                    os.symlink(blob, path)
+            entry = index['blobs'].setdefault(sha256, {'size': blob.stat().st_size, 'names': []})
+            if path.name not in entry['names']:
+                entry['names'].append(path.name)
+            if alias:
+                index['aliases'][alias] = {'sha256': sha256, 'filename': path.name}
+        return blob
+
+    def place(self, sha256, dest):
+        """Expose a stored blob at dest; returns False if the blob is missing"""
+        if not self.has(sha256):
+            return False
+        blob = self.blob_path(sha256)
+        if dest.exists() and _same_file(dest, blob):
+            return True
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        self._link(blob, dest)
+        return True
+
+    def remove(self, sha256):
+        """Delete a blob and every alias pointing at it; links elsewhere keep their data"""
+        sha256 = sha256.lower()
+        with self._updating_index() as index:
+            self.blob_path(sha256).unlink(missing_ok=True)
+            index['blobs'].pop(sha256, None)
+            for alias in [a for a, record in index['aliases'].items() if record['sha256'] == sha256]:
+                del index['aliases'][alias]
+
+    @staticmethod
+    def _link(blob, dest):
+        """Atomically point dest at blob, preferring a hardlink over a symlink"""
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.link")
+        tmp.unlink(missing_ok=True)
+        try:
+            os.link(blob, tmp)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+            os.symlink(blob.resolve(), tmp)
+        os.replace(tmp, dest)
+
+
+def _same_file(a, b):
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Nexis supervisor - runs ComfyUI and FileBrowser and restarts them in place
+
+Each child is waited on by its own thread, so a crash is handled as soon as
+the process exits rather than at the next poll, and only the crashed service
+is restarted (with exponential backoff) instead of the whole container, which
+would repeat the downloads. Services are probed in-process over HTTP, never
+by forking curl:
+
+    readiness   after every (re)start, every NEXIS_PROBE_INTERVAL_MS until the
+                service answers or HEALTH_RETRIES_START seconds have passed
+    liveness    every HEALTH_CHECK_INTERVAL seconds once ready; after
+                NEXIS_LIVENESS_FAILURES consecutive failures the service is
+                restarted (unset: failures are only logged)
+
+Probe latency, time to ready, recovery time after a crash and restart counts
+are written to <metrics dir>/nexis_supervisor.prom. A required service that
+needs more than NEXIS_RESTART_LIMIT restarts within
+NEXIS_RESTART_WINDOW_MINUTES makes the supervisor exit non-zero, so the
+container is recycled as before.
+"""
+
+import http.client
+import os
+import queue
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from nexis_metrics import Histogram, MetricsRecorder, write_textfile
+
+PROBE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+READY_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+
+def probe(url, timeout):
+    """(ok, seconds) for one HTTP GET; any 2xx or 3xx answer counts as up"""
+    started = time.monotonic()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            ok = 200 <= response.status < 400
+    except (OSError, ValueError, http.client.HTTPException):
+        ok = False
+    return ok, time.monotonic() - started
+
+
+class Service:
+    """One supervised process and its restart state"""
+
+    def __init__(self, name, cmd, probe_url, cwd=None, required=True):
+        self.name = name
+        self.cmd = cmd
+        self.probe_url = probe_url
+        self.cwd = cwd
+        self.required = required
+        self.process = None
+        self.generation = 0         # bumped on every spawn; stale exits and probes are ignored
+        self.state = 'stopped'      # starting, ready, stopping, backoff, stopped or failed
+        self.started_at = None      # time.monotonic() of the last spawn
+        self.ready_at = None
+        self.down_since = None      # when the service last went down, for recovery time
+        self.next_probe = 0.0
+        self.next_start = 0.0
+        self.probing = False
+        self.probe_failures = 0
+        self.kill_reason = None     # why the supervisor killed it, reported when it exits
+        self.backoff = 0.0
+        self.restart_times = deque()
+
+
+class Supervisor:
+    """Event loop over child exits, probe results and timers"""
+
+    def __init__(self, services, log, metrics_dir=None, probe_timeout=5.0, probe_interval=0.25,
+                 startup_timeout=60.0, check_interval=30.0, liveness_failures=0, restart_limit=5,
+                 restart_window=600.0, backoff_base=1.0, backoff_max=60.0, stable_seconds=60.0,
+                 stop_grace=10.0):
+        self.services = services
+        self.log = log
+        self.probe_timeout = probe_timeout
+        self.probe_interval = probe_interval
+        self.startup_timeout = startup_timeout
+        self.check_interval = check_interval
+        self.liveness_failures = liveness_failures
+        self.restart_limit = restart_limit
+        self.restart_window = restart_window
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stable_seconds = stable_seconds
+        self.stop_grace = stop_grace
+        self.metrics = MetricsRecorder(metrics_dir, name="nexis_supervisor") if metrics_dir else None
+        self.probe_latency = Histogram(PROBE_BUCKETS)
+        self.ready_latency = Histogram(READY_BUCKETS)
+        self.recovery_latency = Histogram(READY_BUCKETS)
+        self.restarts = defaultdict(int)
+        self.exit_code = 0
+        self._events = queue.SimpleQueue()  # put() is safe from signal handlers
+        self._stopping = False
+        self._probes = ThreadPoolExecutor(max_workers=max(1, len(services)), thread_name_prefix="nexis-probe")
+
+    def stop(self):
+        """Ask the loop to stop all services and return; safe to call from a signal handler"""
+        self._stopping = True
+        self._events.put(('stop',))
+
+    def run(self):
+        """Supervise until stop() or a required service exhausts its restarts; returns the exit code"""
+        for service in self.services:
+            self._spawn(service)
+        while not self._stopping:
+            timeout = max(0.0, min(self._next_deadline() - time.monotonic(), 1.0))
+            try:
+                event = self._events.get(timeout=timeout)
+            except queue.Empty:
+                event = None
+            if event is not None:
+                self._handle(event)
+            self._tick()
+        self._shutdown()
+        return self.exit_code
+
+    def _spawn(self, service):
+        service.generation += 1
+        service.state = 'starting'
+        service.started_at = time.monotonic()
+        service.next_probe = service.started_at
+        service.probe_failures = 0
+        service.probing = False
+        service.kill_reason = None
+        self.log(f"Starting {service.name}: {shlex.join(service.cmd)}")
+        try:
+            service.process = subprocess.Popen(service.cmd, cwd=service.cwd, start_new_session=True)
+        except OSError as e:
+            self.log(f"❌ Could not start {service.name}: {e}")
+            service.process = None
+            self._restart(service, 'spawn_error')
+            return
+        threading.Thread(target=self._wait, args=(service, service.process, service.generation),
+                         name=f"nexis-wait-{service.name}", daemon=True).start()
+
+    def _wait(self, service, process, generation):
+        self._events.put(('exit', service, generation, process.wait()))
+
+    def _probe(self, service, generation, phase):
+        ok, seconds = probe(service.probe_url, self.probe_timeout)
+        self._events.put(('probe', service, generation, phase, ok, seconds))
+
+    def _next_deadline(self):
+        deadlines = []
+        for service in self.services:
+            if service.state == 'backoff':
+                deadlines.append(service.next_start)
+            elif service.state in ('starting', 'ready') and not service.probing:
+                deadlines.append(service.next_probe)
+            if service.state == 'starting':
+                deadlines.append(service.started_at + self.startup_timeout)
+        return min(deadlines, default=time.monotonic() + 1.0)
+
+    def _handle(self, event):
+        kind, *args = event
+        if kind == 'exit':
+            service, generation, code = args
+            if generation != service.generation or self._stopping:
+                return
+            now = time.monotonic()
+            service.process = None
+            service.down_since = service.down_since or now
+            reason = service.kill_reason or 'exit'
+            self.log(f"💥 {service.name} exited with code {code} after {now - service.started_at:.1f}s"
+                     + (f" ({reason})" if service.kill_reason else ""))
+            self._restart(service, reason)
+        elif kind == 'probe':
+            service, generation, phase, ok, seconds = args
+            if generation != service.generation:
+                return
+            service.probing = False
+            self.probe_latency.observe(seconds, service=service.name, phase=phase,
+                                       result='ok' if ok else 'fail')
+            if service.state == 'starting' and ok:
+                self._ready(service)
+            elif service.state == 'ready':
+                self._liveness(service, ok, seconds)
+
+    def _ready(self, service):
+        now = time.monotonic()
+        service.state = 'ready'
+        service.ready_at = now
+        service.next_probe = now + self.check_interval
+        self.ready_latency.observe(now - service.started_at, service=service.name)
+        message = f"✅ {service.name} is ready after {now - service.started_at:.1f}s"
+        if service.down_since is not None:
+            recovery = now - service.down_since
+            self.recovery_latency.observe(recovery, service=service.name)
+            message += f" (recovered {recovery:.1f}s after going down)"
+            service.down_since = None
+        self.log(message)
+        self._emit('ready', service=service.name, seconds=now - service.started_at)
+        self._write_metrics()
+
+    def _liveness(self, service, ok, seconds):
+        service.next_probe = time.monotonic() + self.check_interval
+        if ok:
+            service.probe_failures = 0
+            return
+        service.probe_failures += 1
+        self.log(f"{service.name} health check failed ({service.probe_failures} in a row, {seconds:.1f}s) "
+                 f"but the process is running")
+        if self.liveness_failures and service.probe_failures >= self.liveness_failures:
+            self._kill(service, 'liveness')
+        self._write_metrics()
+
+    def _tick(self):
+        now = time.monotonic()
+        for service in self.services:
+            if self._stopping:
+                return
+            if service.state == 'backoff' and now >= service.next_start:
+                self._spawn(service)
+            elif service.state == 'starting' and now - service.started_at > self.startup_timeout:
+                self.log(f"{service.name} did not become ready at {service.probe_url} in {self.startup_timeout:.0f}s")
+                self._kill(service, 'startup_timeout')
+            elif service.state in ('starting', 'ready') and not service.probing and now >= service.next_probe:
+                service.probing = True
+                if service.state == 'starting':
+                    service.next_probe = now + self.probe_interval
+                self._probes.submit(self._probe, service, service.generation,
+                                    'readiness' if service.state == 'starting' else 'liveness')
+
+    def _kill(self, service, reason):
+        """Kill a running service; its exit event then schedules the restart"""
+        service.kill_reason = reason
+        service.state = 'stopping'
+        service.down_since = service.down_since or time.monotonic()
+        if service.process is not None:
+            try:
+                os.killpg(service.process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def _restart(self, service, reason):
+        now = time.monotonic()
+        self.restarts[(service.name, reason)] += 1
+        self._emit('restart', service=service.name, reason=reason)
+        service.restart_times.append(now)
+        while service.restart_times and service.restart_times[0] < now - self.restart_window:
+            service.restart_times.popleft()
+        if len(service.restart_times) > self.restart_limit:
+            service.state = 'failed'
+            window = f"{self.restart_window / 60:.0f} min"
+            if service.required:
+                self.log(f"❌ {service.name} needed {len(service.restart_times)} restarts within {window}; "
+                         f"giving up so the container is restarted")
+                self.exit_code = 1
+                self._stopping = True
+            else:
+                self.log(f"❌ {service.name} needed {len(service.restart_times)} restarts within {window}; "
+                         f"continuing without it")
+            self._write_metrics()
+            return
+        if service.ready_at is not None and now - service.ready_at >= self.stable_seconds:
+            service.backoff = 0.0  # it ran fine for a while: this is a fresh failure, not a crash loop
+        service.backoff = min(self.backoff_max, service.backoff * 2 or self.backoff_base)
+        service.state = 'backoff'
+        service.probing = False
+        service.next_start = now + service.backoff
+        self.log(f"⏳ Restarting {service.name} in {service.backoff:.1f}s")
+        self._write_metrics()
+
+    def _shutdown(self):
+        running = [s for s in self.services if s.process is not None and s.process.poll() is None]
+        for service in running:
+            self.log(f"Stopping {service.name} (pid={service.process.pid})...")
+            try:
+                os.killpg(service.process.pid, signal.SIGTERM)
+            except OSError:
+                pass
+        deadline = time.monotonic() + self.stop_grace
+        for service in running:
+            try:
+                service.process.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                self.log(f"{service.name} did not stop within {self.stop_grace:.0f}s, killing it")
+                try:
+                    os.killpg(service.process.pid, signal.SIGKILL)
+                except OSError:
+                    pass
+                service.process.wait()
+            service.state = 'stopped'
+        self._probes.shutdown(wait=False, cancel_futures=True)
+        self._write_metrics()
+
+    def _emit(self, event, **fields):
+        if self.metrics is not None:
+            self.metrics.emit(event, **fields)
+
+    def prometheus_lines(self):
+        lines = self.probe_latency.lines('nexis_supervisor_probe_duration_seconds',
+                                         'HTTP probe latency by service, phase and result.')
+        lines += self.ready_latency.lines('nexis_supervisor_ready_seconds',
+                                          'Time from process start to the first successful probe.')
+        lines += self.recovery_latency.lines('nexis_supervisor_recovery_seconds',
+                                             'Time from a service going down to it being ready again.')
+        lines += ['# HELP nexis_supervisor_restarts_total Restarts by service and reason.',
+                  '# TYPE nexis_supervisor_restarts_total counter']
+        lines += [f'nexis_supervisor_restarts_total{{service="{name}",reason="{reason}"}} {count}'
+                  for (name, reason), count in sorted(self.restarts.items())]
+        return lines
+
+    def _write_metrics(self):
+        if self.metrics is not None:
+            write_textfile(self.metrics.prometheus_path, self.prometheus_lines())
+
+
+def _env_int(name, default):
+    """Read a positive integer from the environment, falling back to default"""
+    value = os.getenv(name, '').strip()
+    try:
+        parsed = int(value)
+    except ValueError:
+        return default
+    return parsed if parsed > 0 else default
+
+
+def _comfyui_importable(python, comfyui_dir):
+    """Fail fast on a broken install instead of restarting it in a loop"""
+    check = ("import sys\nsys.path.insert(0, '.')\n"
+             "try:\n    import execution, server\n    print('ComfyUI imports successful')\n"
+             "except ImportError as e:\n    print(f'ComfyUI import failed: {e}')\n    sys.exit(1)\n")
+    return subprocess.run([python, '-c', check], cwd=comfyui_dir).returncode == 0
+
+
+def _invalidate_boot_stamp():
+    """Make the next boot run the entrypoint's pre-flight checks again"""
+    stamp = os.getenv('NEXIS_BOOT_STAMP')
+    if stamp:
+        Path(stamp).unlink(missing_ok=True)
+
+
+def main():
+    def log(message):
+        print(f"[{time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}] [SUPERVISOR] {message}", flush=True)
+
+    python = os.getenv('PYTHON', '/opt/venv/bin/python')
+    comfyui_dir = Path(os.getenv('COMFYUI_DIR', '/home/comfyuser/workspace/ComfyUI'))
+    comfyui_port = os.getenv('COMFYUI_PORT', '8188')
+    filebrowser_bin = Path(os.getenv('FILEBROWSER_BIN', '/home/comfyuser/filebrowser'))
+    filebrowser_port = os.getenv('FILEBROWSER_PORT', '8080')
+    workspace = Path(os.getenv('WORKSPACE', '/home/comfyuser/workspace'))
+    state_dir = Path(os.getenv('NEXIS_STATE_DIR', str(workspace / ".nexis")))
+
+    if not (comfyui_dir / "main.py").is_file():
+        log(f"ComfyUI main.py not found at: {comfyui_dir / 'main.py'}")
+        return 1
+    if os.getenv('NEXIS_SKIP_IMPORT_CHECK') == '1':
+        log("ComfyUI is unchanged since the last clean boot, skipping the import test")
+    else:
+        log("Testing ComfyUI import...")
+        if not _comfyui_importable(python, comfyui_dir):
+            log("ComfyUI import test failed - cannot start service")
+            _invalidate_boot_stamp()
+            return 1
+
+    comfy_cmd = [python, str(comfyui_dir / "main.py"), '--listen', os.getenv('COMFYUI_HOST', '0.0.0.0'),
+                 '--port', comfyui_port]
+    comfy_cmd += shlex.split(os.getenv('COMFYUI_FLAGS', '--disable-auto-launch --disable-metadata-preview'))
+    services = [Service("ComfyUI", comfy_cmd,
+                        f"http://127.0.0.1:{comfyui_port}{os.getenv('NEXIS_COMFYUI_PROBE_PATH', '/system_stats')}",
+                        cwd=comfyui_dir)]
+    if os.access(filebrowser_bin, os.X_OK):
+        fb_cmd = [str(filebrowser_bin), '-r', os.getenv('FILEBROWSER_ROOT', str(workspace)),
+                  '-a', os.getenv('FILEBROWSER_HOST', '0.0.0.0'), '-p', filebrowser_port]
+        if os.getenv('FB_USERNAME') and os.getenv('FB_PASSWORD'):
+            fb_cmd += ['--username', os.environ['FB_USERNAME'], '--password', os.environ['FB_PASSWORD']]
+        services.append(Service("FileBrowser", fb_cmd, f"http://127.0.0.1:{filebrowser_port}", required=False))
+    else:
+        log(f"FileBrowser binary not found at {filebrowser_bin}, skipping...")
+
+    supervisor = Supervisor(
+        services, log,
+        metrics_dir=Path(os.getenv('NEXIS_METRICS_DIR', str(state_dir / "metrics"))),
+        probe_timeout=_env_int('NEXIS_PROBE_TIMEOUT_SECONDS', 5),
+        probe_interval=_env_int('NEXIS_PROBE_INTERVAL_MS', 250) / 1000,
+        startup_timeout=_env_int('HEALTH_RETRIES_START', 60),
+        check_interval=_env_int('HEALTH_CHECK_INTERVAL', 30),
+        liveness_failures=_env_int('NEXIS_LIVENESS_FAILURES', 0),
+        restart_limit=_env_int('NEXIS_RESTART_LIMIT', 5),
+        restart_window=_env_int('NEXIS_RESTART_WINDOW_MINUTES', 10) * 60,
+        backoff_max=_env_int('NEXIS_RESTART_BACKOFF_MAX_SECONDS', 60),
+    )
+
+    def handle_signal(signum, frame):
+        supervisor.stop()  # the loop logs and stops the services; printing here could re-enter stdout
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    code = supervisor.run()
+    if code:
+        _invalidate_boot_stamp()
+    log("Supervisor shutting down" + (" after repeated failures" if code else " normally"))
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
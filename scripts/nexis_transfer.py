@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+"""
+Nexis transfer engine - in-process, multi-connection HTTP range downloads
+
+Files are split into fixed-size pieces that a pool of connections pulls from
+a shared queue and writes into a preallocated file with positional writes.
+The number of connections adapts to measured throughput: it climbs while more
+connections keep adding bandwidth and backs off when they stop helping, and
+the best count per host is remembered for the next file. Servers that do not
+honour Range requests get a single sequential stream instead. With a
+BandwidthShaper, every connection takes a slot from the per-host budget
+and every chunk draws from the shared token bucket. With a HostRetry, piece
+retries follow the host's backoff and a host whose circuit opens aborts the
+transfer with HostUnavailable, keeping the journal for a later resume.
+
+Segmented downloads keep a journal next to the partial file recording which
+byte ranges are durably on disk, a CRC32 of each range and the remote
+object's ETag/Last-Modified, so an interrupted transfer resumes exactly where
+it stopped and refuses to resume if the remote object has changed.
+"""
+
+import errno
+import os
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from urllib.parse import urlparse
+
+import requests
+
+from nexis_retry import HostUnavailable
+from nexis_state import read_json, atomic_write_json
+
+_CONTENT_RANGE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
+
+class RangeNotSupported(Exception):
+    """The server ignored a Range request part way through a segmented download"""
+
+
+class SegmentedDownloader:
+    # Best connection count seen per host, used as the starting point next time
+    _host_connections = {}
+    _host_lock = threading.Lock()
+
+    def __init__(self, session, log, max_connections=16, piece_size=32 * 1024 * 1024,
+                 chunk_size=1024 * 1024, adjust_interval=2.0, max_piece_attempts=5,
+                 timeout=(30, 300), shaper=None, retry=None):
+        self.session = session
+        self.log = log
+        self.max_connections = max(1, max_connections)
+        self.piece_size = piece_size
+        self.chunk_size = chunk_size
+        self.adjust_interval = adjust_interval
+        self.max_piece_attempts = max_piece_attempts
+        self.timeout = timeout
+        self.shaper = shaper
+        self.retry = retry
+
+    def download(self, url, output_file, hasher=None, journal_path=None, headers=None):
+        """Download url into output_file, feeding hasher (a StreamingHasher) as the prefix completes.
+
+        With journal_path, progress is journaled and a matching journal from
+        an earlier attempt is resumed. headers (e.g. Authorization) are sent
+        with every request. Returns a dict with the final 'size',
+        'etag', 'last_modified', the 'resumed_bytes' reused from disk and the
+        number of 'connections' used at the end of the transfer, plus the
+        'ttfb' of the first response and the number of piece 'retries'.
+        """
+        headers = dict(headers or {})
+        started = time.monotonic()
+        host = urlparse(url).netloc
+        if self.shaper is not None:
+            self.shaper.hosts.acquire(host)
+        def get_probe():
+            return self.session.get(url, headers={**headers, 'Range': 'bytes=0-0'}, stream=True,
+                                    timeout=self.timeout)
+
+        try:
+            # The probe is the only request retried here; pieces retry in their workers
+            probe = get_probe() if self.retry is None else self.retry.call(host, get_probe)
+        except BaseException:
+            self.release_host(host)
+            raise
+        try:
+            probe.raise_for_status()
+            info = {
+                'etag': probe.headers.get('ETag'),
+                'last_modified': probe.headers.get('Last-Modified'),
+                'resumed_bytes': 0,
+                'ttfb': time.monotonic() - started,
+                'retries': 0,
+            }
+            match = _CONTENT_RANGE.match(probe.headers.get('Content-Range', ''))
+            if probe.status_code != 206 or not match or match.group(3) == '*':
+                # No usable range support: this response already carries the whole body
+                self.log(f"Server does not support ranges for {output_file.name}, using one stream", is_debug=True)
+                if journal_path:
+                    DownloadJournal.discard(journal_path)
+                info['size'] = self._single_stream(probe, output_file, hasher)
+                info['connections'] = 1
+                return info
+            final_url = probe.url or url
+            total = int(match.group(3))
+        finally:
+            probe.close()
+            self.release_host(host)
+
+        if urlparse(final_url).netloc != host:
+            # Redirect targets are pre-signed URLs; credentials must not follow them
+            headers = {k: v for k, v in headers.items() if k.lower() != 'authorization'}
+
+        journal = None
+        if journal_path:
+            journal = DownloadJournal.open(journal_path, output_file, total, info['etag'], info['last_modified'])
+            if journal.ranges:
+                self.log(f"Resuming {output_file.name}: {journal.bytes_recorded()} of {total} bytes "
+                         f"journaled")
+            elif journal.refused:
+                self.log(f"Remote file for {output_file.name} changed since the partial download, "
+                         f"starting over")
+
+        transfer = _Transfer(self, final_url, output_file, total, hasher, journal, headers)
+        try:
+            info['connections'] = transfer.run()
+            info['resumed_bytes'] = transfer.resumed_bytes
+        except RangeNotSupported:
+            self.log(f"Range requests rejected mid-transfer for {output_file.name}, restarting as one stream", is_debug=True)
+            if hasher is not None:
+                hasher.reset()
+            if journal_path:
+                DownloadJournal.discard(journal_path)
+            final_host = urlparse(final_url).netloc
+            if self.shaper is not None:
+                self.shaper.hosts.acquire(final_host)
+            try:
+                with self.session.get(final_url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    total = self._single_stream(response, output_file, hasher)
+            finally:
+                self.release_host(final_host)
+            info['connections'] = 1
+        info['retries'] = transfer.retries
+        info['size'] = total
+        return info
+
+    def release_host(self, host):
+        if self.shaper is not None:
+            self.shaper.hosts.release(host)
+
+    def throttle(self, amount):
+        if self.shaper is not None:
+            self.shaper.consume(amount)
+
+    def _single_stream(self, response, output_file, hasher):
+        """Write a full-body response sequentially, hashing from memory"""
+        length = response.headers.get('Content-Length')
+        fd = os.open(output_file, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if length and length.isdigit():
+                preallocate(fd, int(length))
+            offset = 0
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                self.throttle(len(chunk))
+                os.pwrite(fd, chunk, offset)
+                if hasher is not None:
+                    hasher.update(offset, chunk)
+                offset += len(chunk)
+            os.ftruncate(fd, offset)
+        finally:
+            os.close(fd)
+        return offset
+
+    @classmethod
+    def initial_connections(cls, host, max_connections):
+        with cls._host_lock:
+            return min(max_connections, cls._host_connections.get(host, min(4, max_connections)))
+
+    @classmethod
+    def remember_connections(cls, host, connections):
+        with cls._host_lock:
+            cls._host_connections[host] = connections
+
+
+class _Transfer:
+    """State for one segmented download: piece queue, workers, throughput controller"""
+
+    def __init__(self, engine, url, output_file, total, hasher, journal=None, headers=None):
+        self.engine = engine
+        self.url = url
+        self.output_file = output_file
+        self.total = total
+        self.hasher = hasher
+        self.journal = journal
+        self.headers = headers or {}
+        self.host = urlparse(url).netloc
+        self.resumed_bytes = 0
+
+        self.lock = threading.Lock()
+        self.progress = threading.Condition(self.lock)
+        self.pieces = deque(
+            (start, min(start + engine.piece_size, total))
+            for start in range(0, total, engine.piece_size)
+        )
+        self.attempts = {}
+        self.retries = 0
+        self.completed = []  # merged (start, end) ranges written to disk
+        self.bytes_done = 0
+        self.active = 0
+        self.target = 1
+        self.error = None
+
+    def run(self):
+        resume = self.journal is not None and bool(self.journal.ranges)
+        flags = os.O_RDWR | os.O_CREAT | (0 if resume else os.O_TRUNC)
+        self.fd = os.open(self.output_file, flags, 0o644)
+        try:
+            if resume:
+                self._resume_from_journal()
+            else:
+                preallocate(self.fd, self.total)
+            hash_thread = threading.Thread(target=self._hash_prefix, name="nexis-hash", daemon=True)
+            hash_thread.start()
+            connections = self._control()
+            with self.lock:
+                self.progress.notify_all()
+            hash_thread.join()
+            if self.journal is not None:
+                self.journal.flush(self.fd, force=True)
+            if self.error:
+                raise self.error
+            return connections
+        finally:
+            os.close(self.fd)
+
+    def _resume_from_journal(self):
+        """Re-check journaled ranges against their CRC32 and queue only the gaps.
+
+        Ranges at the start of the file are hashed into a trial digest in the
+        same read, so resuming reads the existing data exactly once. The
+        hasher adopts that digest only once the range's CRC32 matches; hashing
+        stops at the first range that fails, so the bytes fetched to replace
+        it are hashed in order.
+        """
+        verified = []
+        hashing = self.hasher is not None
+        for start, end, crc in sorted(self.journal.ranges):
+            trial = None
+            if hashing:
+                hashed_offset, digest = self.hasher.trial()
+                if hashed_offset == start:
+                    trial = digest
+            actual = 0
+            offset = start
+            while offset < end:
+                data = os.pread(self.fd, min(8 * 1024 * 1024, end - offset), offset)
+                if not data:
+                    break
+                actual = zlib.crc32(data, actual)
+                if trial is not None:
+                    trial.update(data)
+                offset += len(data)
+            if offset == end and actual == crc:
+                verified.append((start, end, crc))
+                if trial is not None:
+                    self.hasher.commit(start, trial, end)
+            else:
+                hashing = False
+                self.engine.log(f"Journaled range {start}-{end} of {self.output_file.name} "
+                                f"failed verification, fetching it again", is_debug=True)
+        self.journal.ranges = verified
+
+        for start, end, _ in verified:
+            self._mark_written(start, end)
+        self.resumed_bytes = self.bytes_done
+
+        gaps = []
+        position = 0
+        for start, end in self.completed + [(self.total, self.total)]:
+            if start > position:
+                gaps.append((position, start))
+            position = max(position, end)
+        self.pieces = deque(
+            (start, min(start + self.engine.piece_size, end))
+            for gap_start, end in gaps
+            for start in range(gap_start, end, self.engine.piece_size)
+        )
+
+    def _finished(self):
+        return self.error is not None or self.bytes_done >= self.total
+
+    def _control(self):
+        """Start workers and adapt their number to the measured throughput"""
+        max_connections = min(self.engine.max_connections, len(self.pieces)) or 1
+        with self.lock:
+            self.target = SegmentedDownloader.initial_connections(self.host, max_connections)
+        self._spawn_workers()
+
+        prev_rate = prev_target = None
+        last_bytes, last_time = 0, time.monotonic()
+        while True:
+            with self.lock:
+                self.progress.wait_for(self._finished, timeout=self.engine.adjust_interval)
+                if self._finished():
+                    break
+                now = time.monotonic()
+                rate = (self.bytes_done - last_bytes) / max(now - last_time, 1e-6)
+                last_bytes, last_time = self.bytes_done, now
+                target = self.target
+                if prev_rate is None or (rate > prev_rate * 1.1 and target > prev_target):
+                    new_target = target + 2  # more connections helped (or first sample): keep climbing
+                elif rate < prev_rate * 0.9 and target > prev_target:
+                    new_target = prev_target  # the last increase hurt: go back
+                elif rate < prev_rate * 0.9:
+                    new_target = target - 1  # throughput degrading: shed a connection
+                else:
+                    new_target = target  # plateau
+                self.target = max(1, min(max_connections, new_target))
+                prev_rate, prev_target = rate, target
+                if self.target != target:
+                    self.engine.log(f"{self.output_file.name}: {rate / 1048576:.1f} MiB/s with {target} "
+                                    f"connections, now using {self.target}", is_debug=True)
+            self._spawn_workers()
+
+        with self.lock:
+            while self.active:
+                self.progress.wait()
+        if not self.error:
+            SegmentedDownloader.remember_connections(self.host, self.target)
+        return self.target
+
+    def _spawn_workers(self):
+        with self.lock:
+            missing = min(self.target, len(self.pieces)) - self.active
+            self.active += max(0, missing)
+        for _ in range(max(0, missing)):
+            threading.Thread(target=self._worker, name="nexis-range", daemon=True).start()
+
+    def _worker(self):
+        try:
+            while True:
+                if not self._take_slot():
+                    return
+                with self.lock:
+                    if self.error or not self.pieces or self.active > self.target:
+                        self.engine.release_host(self.host)
+                        return
+                    start, end = self.pieces.popleft()
+                try:
+                    try:
+                        self._fetch_piece(start, end)
+                    finally:
+                        self.engine.release_host(self.host)
+                    if self.engine.retry is not None:
+                        self.engine.retry.record_success(self.host)
+                except RangeNotSupported as e:
+                    with self.lock:
+                        self.error = e
+                        self.progress.notify_all()
+                    return
+                except (requests.RequestException, OSError) as e:
+                    with self.lock:
+                        attempts = self.attempts.get(start, 0) + 1
+                        self.attempts[start] = attempts
+                        self.retries += 1
+                    if self.engine.retry is None:
+                        delay = min(2 ** attempts, 30)
+                    else:
+                        # None means the host's policy gives up: not retryable, or out of attempts
+                        try:
+                            delay = self.engine.retry.failed(self.host, e, attempts)
+                        except HostUnavailable as paused:
+                            e, delay = paused, None
+                    if delay is None or attempts >= self.engine.max_piece_attempts:
+                        with self.lock:
+                            self.error = e
+                            self.progress.notify_all()
+                        return
+                    self.engine.log(f"Range {start}-{end} of {self.output_file.name} failed "
+                                    f"(attempt {attempts}): {e}", is_debug=True)
+                    time.sleep(delay)
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.progress.notify_all()
+
+    def _take_slot(self):
+        """Wait for a connection slot on this host; False once there is nothing left to do"""
+        shaper = self.engine.shaper
+        if shaper is None:
+            return True
+        while not shaper.hosts.acquire(self.host, timeout=0.5):
+            with self.lock:
+                if self.error or not self.pieces or self.active > self.target:
+                    return False
+        return True
+
+    def _fetch_piece(self, start, end):
+        """Fetch [start, end); on failure the unfinished remainder is requeued"""
+        offset = start
+        crc = 0
+        try:
+            headers = {**self.headers, 'Range': f'bytes={start}-{end - 1}'}
+            if self.journal is not None and self.journal.etag and not self.journal.etag.startswith('W/'):
+                # A changed object answers 200 instead of 206 and the resume is abandoned
+                headers['If-Range'] = self.journal.etag
+            with self.engine.session.get(self.url, headers=headers, stream=True,
+                                         timeout=self.engine.timeout) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise RangeNotSupported(f"HTTP {response.status_code} for a range request")
+                for chunk in response.iter_content(chunk_size=self.engine.chunk_size):
+                    chunk = chunk[:end - offset]
+                    self.engine.throttle(len(chunk))
+                    os.pwrite(self.fd, chunk, offset)
+                    crc = zlib.crc32(chunk, crc)
+                    if self.hasher is not None:
+                        # In-order bytes are hashed here; the rest is read back by _hash_prefix
+                        self.hasher.extend(offset, chunk)
+                    self._mark_written(offset, offset + len(chunk))
+                    offset += len(chunk)
+                    if offset >= end:
+                        break
+            if offset < end:
+                raise requests.exceptions.ChunkedEncodingError(
+                    f"Connection closed after {offset - start} of {end - start} bytes")
+        except BaseException:
+            if offset < end:
+                with self.lock:
+                    self.pieces.appendleft((offset, end))
+            raise
+        finally:
+            if self.journal is not None and offset > start:
+                self.journal.record(start, offset, crc)
+                self.journal.flush(self.fd)
+
+    def _mark_written(self, start, end):
+        with self.lock:
+            self.bytes_done += end - start
+            merged = []
+            for s, e in self.completed:
+                if e < start or s > end:
+                    merged.append((s, e))
+                else:
+                    start, end = min(s, start), max(e, end)
+            merged.append((start, end))
+            merged.sort()
+            self.completed = merged
+            self.progress.notify_all()
+
+    def _contiguous_prefix(self):
+        if self.completed and self.completed[0][0] == 0:
+            return self.completed[0][1]
+        return 0
+
+    def _hash_prefix(self):
+        """Hash the parts of the growing contiguous prefix that pieces could not hash in memory.
+
+        Those are the pieces that landed ahead of the prefix, read back from
+        the page cache once the prefix reaches them.
+        """
+        if self.hasher is None:
+            return
+        hashed = 0
+        while True:
+            with self.lock:
+                self.progress.wait_for(
+                    lambda: self.error is not None or self._contiguous_prefix() > hashed
+                    or (self.active == 0 and self._finished()))
+                prefix = self._contiguous_prefix()
+                if self.error is not None or (prefix <= hashed and self.active == 0):
+                    return
+            self.hasher.catch_up(prefix)
+            hashed = prefix
+            if hashed >= self.total:
+                return
+
+
+def preallocate(fd, size):
+    """Reserve size bytes for fd, failing fast when the disk cannot hold the file"""
+    if size <= 0:
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError as e:
+        if e.errno in (errno.EOPNOTSUPP, errno.EINVAL):  # filesystem without fallocate support
+            os.ftruncate(fd, size)
+        else:
+            raise
+    except AttributeError:
+        os.ftruncate(fd, size)
+
+
+class DownloadJournal:
+    """Crash-safe record of the byte ranges of a partial file that are on disk.
+
+    A range is only journaled after the file data has been fdatasync'ed, and
+    the journal itself is replaced atomically, so after a crash every
+    journaled range is really on disk. Ranges carry a CRC32 that is checked
+    again before they are trusted on resume.
+    """
+
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, path, size, etag, last_modified, ranges=None, refused=False):
+        self.path = path
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.ranges = ranges or []
+        self.refused = refused
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = 0.0
+
+    @classmethod
+    def open(cls, path, part_file, size, etag, last_modified):
+        """Load the journal for part_file if it still describes the remote object, else start fresh"""
+        data = read_json(path)
+        if isinstance(data, dict) and data.get('ranges'):
+            # Without a validator there is no way to tell the object is unchanged
+            same_object = data.get('size') == size and bool(
+                (etag and data.get('etag') == etag) or
+                (not etag and last_modified and data.get('last_modified') == last_modified)
+            )
+            try:
+                part_ok = part_file.stat().st_size == data.get('size')
+            except OSError:
+                part_ok = False
+            if same_object and part_ok:
+                ranges = [tuple(r) for r in data['ranges']]
+                return cls(path, size, etag, last_modified, ranges=ranges)
+            cls.discard(path)
+            return cls(path, size, etag, last_modified, refused=part_ok and not same_object)
+        return cls(path, size, etag, last_modified)
+
+    @staticmethod
+    def discard(path):
+        path.unlink(missing_ok=True)
+
+    def bytes_recorded(self):
+        return sum(end - start for start, end, _ in self.ranges)
+
+    def record(self, start, end, crc):
+        with self._lock:
+            self.ranges.append((start, end, crc))
+            self._dirty = True
+
+    def flush(self, fd, force=False):
+        """Sync file data, then persist the journal (at most once per FLUSH_INTERVAL)"""
+        with self._lock:
+            if not self._dirty or (not force and time.monotonic() - self._last_flush < self.FLUSH_INTERVAL):
+                return
+            os.fdatasync(fd)
+            atomic_write_json(self.path, {
+                'size': self.size,
+                'etag': self.etag,
+                'last_modified': self.last_modified,
+                'ranges': sorted(self.ranges),
+            })
+            self._dirty = False
+            self._last_flush = time.monotonic()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Nexis CivitAI variants - choose which file of a model version to download
+
+A CivitAI model version often publishes several files: fp16 and fp32,
+pruned and full, SafeTensor and PickleTensor. A variant policy is a list of
+preferences in priority order, for example:
+
+    NEXIS_CIVITAI_VARIANT="fp16,pruned,safetensors,smallest"    every CivitAI item
+    NEXIS_CIVITAI_VARIANT_CHECKPOINTS="fp16,pruned"             one category
+    CIVITAI_LORAS_TO_DOWNLOAD="12345?variant=fp32;full"         one item (';'-separated)
+
+Preferences are soft: the file matching the most important preference wins,
+later preferences break ties, and a version without a matching file still
+downloads its best remaining file. Recognised preferences are precisions
+(fp16, bf16, fp32, fp8), pruned or full, formats (safetensors, pickletensor,
+gguf, ...), primary, and smallest or largest. Without a policy the
+version's first file is downloaded, as before.
+"""
+
+import re
+from urllib.parse import parse_qs, urlencode
+
+PRECISIONS = {'fp8', 'fp16', 'bf16', 'fp32'}
+SIZES = {'pruned', 'full'}
+ORDERS = {'smallest', 'largest', 'primary'}
+FORMATS = {
+    'safetensors': 'SafeTensor', 'safetensor': 'SafeTensor',
+    'pickletensor': 'PickleTensor', 'ckpt': 'PickleTensor',
+    'gguf': 'GGUF', 'diffusers': 'Diffusers', 'onnx': 'ONNX',
+}
+MODEL_TYPES = {'Model', 'Pruned Model'}
+
+
+def parse_policy(value):
+    """Preferences from a policy string (',' or ';' separated); raises ValueError on unknown ones"""
+    preferences = []
+    for token in re.split(r'[,;]', value or ''):
+        token = token.strip().lower()
+        if not token:
+            continue
+        if token not in PRECISIONS | SIZES | ORDERS | set(FORMATS):
+            raise ValueError(f"unknown CivitAI variant preference '{token}'")
+        if token not in preferences:
+            preferences.append(token)
+    return preferences
+
+
+def parse_civitai_spec(item_id):
+    """Split a CIVITAI_*_TO_DOWNLOAD entry into its version ID and per-item policy (or None)"""
+    version_id, _, query = item_id.strip().partition('?')
+    values = parse_qs(query).get('variant')
+    return version_id.strip(), (';'.join(parse_policy(';'.join(values))) or None) if values else None
+
+
+def _matches(file_info, preference):
+    metadata = file_info.get('metadata') or {}
+    if preference in PRECISIONS:
+        return (metadata.get('fp') or '').lower() == preference
+    if preference == 'pruned':
+        return (metadata.get('size') or '').lower() == 'pruned' or file_info.get('type') == 'Pruned Model'
+    if preference == 'full':
+        return (metadata.get('size') or '').lower() == 'full'
+    if preference == 'primary':
+        return bool(file_info.get('primary'))
+    return metadata.get('format') == FORMATS[preference]
+
+
+def select_variant(files, preferences):
+    """The file that best satisfies the preferences, or None if there are no files"""
+    candidates = [f for f in files if f.get('type') in MODEL_TYPES] or list(files)
+    if not candidates:
+        return None
+
+    def rank(indexed):
+        index, file_info = indexed
+        size = file_info.get('size') or 0
+        key = []
+        for preference in preferences:
+            if preference == 'smallest':
+                key.append(size if size else float('inf'))
+            elif preference == 'largest':
+                key.append(-size)
+            else:
+                key.append(0 if _matches(file_info, preference) else 1)
+        return key + [0 if file_info.get('primary') else 1, index]
+
+    return min(enumerate(candidates), key=rank)[1]
+
+
+def variant_url(api_base, version_id, file_info):
+    """CivitAI download URL for one file of a version, when the metadata did not include one"""
+    metadata = file_info.get('metadata') or {}
+    params = {'type': 'Model', 'format': metadata.get('format') or 'SafeTensor'}
+    if metadata.get('size'):
+        params['size'] = metadata['size']
+    if metadata.get('fp'):
+        params['fp'] = metadata['fp']
+    return f"{api_base}/api/download/models/{version_id}?{urlencode(params)}"
@@ -46,11 +46,16 @@ ln -sfn /home/comfyuser/workspace/output $COMFYUI_PATH/output
 ln -sfn /home/comfyuser/workspace/input $COMFYUI_PATH/input
 
 # --- Dependency Validation ---
-echo "Running dependency validation..."
-/home/comfyuser/scripts/validate_dependencies.sh
-if [ $? -ne 0 ]; then
-    echo "ERROR: Dependency validation failed"
-    exit 1
+# Skipped when the entrypoint already validated this boot (or its boot cache is fresh)
+if [ "${NEXIS_DEPENDENCIES_VALIDATED:-0}" = "1" ]; then
+    echo "Dependencies already validated, skipping."
+else
+    echo "Running dependency validation..."
+    /home/comfyuser/scripts/validate_dependencies.sh
+    if [ $? -ne 0 ]; then
+        echo "ERROR: Dependency validation failed"
+        exit 1
+    fi
 fi
 
 echo "System setup complete."
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for shared bandwidth shaping and per-host connection budgets
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add the scripts and benchmarks directories to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from nexis_bandwidth import MB, BandwidthShaper, HostBudget, TokenBucket, comfyui_busy
+from nexis_downloader import NexisDownloader
+from standin_server import StandinServer
+
+
+def test_token_bucket_rate():
+    """Consuming 2 MiB at 4 MiB/s takes about half a second"""
+    bucket = TokenBucket(4 * MB)
+    started = time.monotonic()
+    for _ in range(8):
+        bucket.consume(256 * 1024)
+    elapsed = time.monotonic() - started
+    assert 0.35 < elapsed < 1.0, elapsed
+
+    bucket.set_rate(None)
+    started = time.monotonic()
+    bucket.consume(100 * MB)
+    assert time.monotonic() - started < 0.05, "An unlimited bucket must not wait"
+
+
+def test_host_budget_limits_connections():
+    """No more than the budget holds a slot for one host at a time"""
+    budget = HostBudget(2)
+    peak = [0]
+    lock = threading.Lock()
+
+    def worker():
+        with budget.slot("cdn.example"):
+            with lock:
+                peak[0] = max(peak[0], budget.active("cdn.example"))
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+    assert budget.active("cdn.example") == 0
+    assert budget.acquire("other.example", timeout=0)
+
+
+def test_runtime_limit_changes():
+    """A busy ComfyUI queue and the control file both retune the bucket"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        control = Path(temp_dir) / "bandwidth.json"
+        shaper = BandwidthShaper(limit_bps=100 * MB, busy_limit_bps=10 * MB, control_file=control)
+        assert shaper.bucket.rate == 100 * MB
+
+        shaper.apply(busy=True)
+        assert shaper.bucket.rate == 10 * MB
+        shaper.apply(busy=False)
+        assert shaper.bucket.rate == 100 * MB
+
+        control.write_text(json.dumps({'limit_mbps': 0}))
+        shaper.poll()
+        assert shaper.bucket.rate is None, "limit_mbps 0 lifts the limit"
+        control.write_text(json.dumps({'limit_mbps': 5}))
+        shaper.poll()
+        assert shaper.bucket.rate == 5 * MB
+        control.unlink()
+        shaper.poll()
+        assert shaper.bucket.rate == 100 * MB
+
+    assert comfyui_busy("http://127.0.0.1:9/queue", timeout=0.5) is False
+
+
+def test_downloader_respects_limits():
+    """Downloads share the bandwidth limit and never exceed the host connection budget"""
+    size = 3 * MB
+    with StandinServer() as server, tempfile.TemporaryDirectory() as workspace:
+        for version_id in (11, 12):
+            server.add_civitai_model(version_id, f"shaped_{version_id}.safetensors", os.urandom(size))
+        downloader = NexisDownloader(workspace_dir=workspace)
+        downloader.civitai_api_base = server.url
+        downloader.segment_size = 256 * 1024
+        downloader.shaper.hosts.set_limit(3)
+        downloader.shaper.limit_bps = 6 * MB
+        downloader.shaper.apply()
+        downloader.create_directory_structure()
+
+        jobs = [{'source': 'civitai', 'category': 'loras', 'item_id': str(v)} for v in (11, 12)]
+        started = time.monotonic()
+        results = downloader.run_download_jobs(jobs)
+        elapsed = time.monotonic() - started
+
+        assert results['loras'] == {'successful': 2, 'failed': 0}
+        assert server.stats['peak_streams'] <= 3, server.stats
+        assert elapsed > 2 * size / (6 * MB) * 0.7, f"{elapsed:.2f}s is faster than the limit allows"
+
+
+def test_hf_cli_is_not_used_under_a_limit():
+    """huggingface-cli cannot be shaped, so a bandwidth limit keeps HF repos on the native backend"""
+    with StandinServer() as server, tempfile.TemporaryDirectory() as workspace:
+        server.add_hf_repo("org/shaped", {"config.json": b'{"a": 1}'})
+        environ = dict(os.environ)
+        os.environ.update({'NEXIS_HF_BACKEND': 'cli', 'NEXIS_BANDWIDTH_LIMIT_MBPS': '50'})
+        try:
+            downloader = NexisDownloader(workspace_dir=workspace)
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
+        downloader.hf_endpoint = server.url
+        assert downloader.download_hf_repo("org/shaped")
+        assert server.stats['requests'] > 0, "The repo is fetched in-process, not by huggingface-cli"
+
+        downloader.shaper.limit_bps = None
+        assert downloader._use_hf_cli(), "Without a limit the configured backend is kept"
+
+
+if __name__ == "__main__":
+    print("Running bandwidth shaping tests")
+    test_token_bucket_rate()
+    test_host_budget_limits_connections()
+    test_runtime_limit_changes()
+    test_downloader_respects_limits()
+    test_hf_cli_is_not_used_under_a_limit()
+    print("🎉 All bandwidth shaping tests passed!")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Smoke tests for the offline benchmark harness in benchmarks/
+"""
+
+import sys
+import os
+
+# Add the scripts and benchmarks directories to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import requests
+
+from run_benchmarks import regressions, run
+from standin_server import StandinServer
+
+
+def test_standin_server_serves_ranges_and_faults():
+    """The stand-in honours Range requests, answers 429 first and redirects downloads"""
+    with StandinServer(rate_limited_requests=1) as server:
+        server.add_civitai_model(7, "model.safetensors", b"0123456789")
+        url = f"{server.url}/api/download/models/7"
+        assert requests.get(url).status_code == 429
+        response = requests.get(url, allow_redirects=False)
+        assert response.headers['Location'] == "/files/7/model.safetensors"
+        assert requests.get(server.url + response.headers['Location']).status_code == 429
+        response = requests.get(url, headers={'Range': 'bytes=2-5'})
+        assert response.status_code == 206
+        assert response.content == b"2345"
+
+
+def test_benchmarks_run_offline():
+    """Every scenario completes against the stand-in server and reports numbers"""
+    results = run(['throughput', 'resume', 'checksum', 'scaling', 'faults', 'hf'],
+                  size=1024 * 1024, counts=[2])
+    assert results['throughput_mbps'] > 0
+    assert 0 < results['resume_reused_fraction'] < 1
+    assert results['faults_rate_limited'] >= 1
+    assert results['hf_fetched_fraction'] < 0.5, "Filtered HF fetch should skip most bytes"
+    assert 'scaling_2_seconds' in results
+
+
+def test_regressions_respect_direction_and_tolerance():
+    """Slower seconds and lower MB/s beyond the tolerance are reported"""
+    baseline = {'a_seconds': 1.0, 'b_mbps': 100.0, 'c_seconds': 1.0}
+    current = {'a_seconds': 1.5, 'b_mbps': 70.0, 'c_seconds': 1.1}
+    assert [key for key, _, _ in regressions(current, baseline, 0.25)] == ['a_seconds', 'b_mbps']
+
+
+if __name__ == "__main__":
+    print("Running benchmark harness tests")
+    test_standin_server_serves_ranges_and_faults()
+    test_benchmarks_run_offline()
+    test_regressions_respect_direction_and_tolerance()
+    print("🎉 All benchmark harness tests passed!")
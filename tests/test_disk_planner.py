@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the pre-flight disk-space planner used by nexis_downloader.py
+"""
+
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Add the scripts and benchmarks directories to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import nexis_downloader
+from nexis_planner import plan_downloads
+from standin_server import StandinServer
+
+JOBS = [{'source': 'civitai', 'category': 'checkpoints', 'item_id': str(i)} for i in range(4)]
+NEEDS = [60, 10, 30, None]
+
+
+def test_plan_policies():
+    """trim keeps order, reorder fits the most models, refuse runs nothing; unknown sizes always run"""
+    assert plan_downloads(JOBS, NEEDS, 100).fits
+
+    trim = plan_downloads(JOBS, NEEDS, 75, 'trim')
+    assert [j['item_id'] for j in trim.jobs] == ['0', '1', '3']
+    assert [j['item_id'] for j in trim.skipped] == ['2']
+
+    reorder = plan_downloads(JOBS, NEEDS, 45, 'reorder')
+    assert [j['item_id'] for j in reorder.jobs] == ['3', '1', '2']
+
+    refuse = plan_downloads(JOBS, NEEDS, 75, 'refuse')
+    assert refuse.jobs == [] and len(refuse.skipped) == 4
+
+
+def test_main_exits_non_zero_when_plan_does_not_fit():
+    """A run that cannot fit downloads nothing and reports failure through the exit code"""
+    with StandinServer() as server, tempfile.TemporaryDirectory() as workspace:
+        server.add_civitai_model(42, "huge.safetensors", b"x" * 4096)
+        environ = dict(os.environ)
+        os.environ.update({
+            'WORKSPACE': workspace,
+            'CIVITAI_API_BASE': server.url,
+            'CIVITAI_CHECKPOINTS_TO_DOWNLOAD': '42',
+            'NEXIS_DISK_RESERVE_MB': str(1024 ** 3),  # no real disk has this much room
+            'NEXIS_DISK_POLICY': 'refuse',
+        })
+        try:
+            assert nexis_downloader.main([]) == 1
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
+        assert not (Path(workspace) / "models" / "checkpoints" / "huge.safetensors").exists()
+        assert server.stats['range_requests'] == 0, "Nothing may be downloaded when the plan is refused"
+
+
+if __name__ == "__main__":
+    print("Running disk planner tests for nexis_downloader.py")
+    test_plan_policies()
+    test_main_exits_non_zero_when_plan_does_not_fit()
+    print("🎉 All disk planner tests passed!")
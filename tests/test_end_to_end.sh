@@ -133,8 +133,8 @@ echo "Step 6: Validating production service patterns..."
 
 # Test service manager PID tracking
 docker exec $TEST_CONTAINER bash -c "
-echo 'Checking service manager PID tracking...'
-ps aux | grep -E 'service_manager.sh' | grep -v grep
+echo 'Checking supervisor PID tracking...'
+ps aux | grep -E 'nexis_supervisor.py' | grep -v grep
 echo 'Checking service processes...'
 ps aux | grep -E '(python.*main.py|filebrowser)' | grep -v grep
 "
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for LRU eviction of downloaded models (nexis_eviction.py and nexis_downloader.py)
+"""
+
+import sys
+import os
+import hashlib
+import tempfile
+import time
+from collections import namedtuple
+from pathlib import Path
+
+# Add the scripts and benchmarks directories to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import nexis_downloader
+from nexis_eviction import AccessLog, Evictor, parse_pins
+from nexis_hashing import VerifiedManifest
+from nexis_lockfile import LockFile
+from nexis_store import ModelStore
+from standin_server import StandinServer
+
+KB = 1024
+DAY = 86400
+DiskUsage = namedtuple('DiskUsage', 'total used free')
+
+
+def _model(root, store, verified, relative, days_ago, size=128 * KB):
+    """A downloaded model: stored, verified and last read days_ago"""
+    path = root / "models" / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = os.urandom(size)
+    path.write_bytes(data)
+    sha256 = hashlib.sha256(data).hexdigest()
+    store.ingest(path, sha256, alias=f"test:{relative}")
+    verified.record(path, sha256)
+    used = time.time() - days_ago * DAY
+    os.utime(path, (used, used))
+    return path, sha256
+
+
+def test_least_recently_used_models_are_evicted():
+    """Oldest unpinned, unrequested store models go first, until the volume is under the low-water mark"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        state = root / ".nexis"
+        store = ModelStore(state / "store")
+        verified = VerifiedManifest(state / "verified_files.json")
+        lockfile = LockFile(state / "nexis.lock.json")
+        access = AccessLog(state / "model_access.json")
+
+        oldest, oldest_sha = _model(root, store, verified, "loras/oldest.safetensors", 30)
+        pinned, _ = _model(root, store, verified, "loras/pinned.safetensors", 40)
+        requested, _ = _model(root, store, verified, "checkpoints/requested.safetensors", 50)
+        repo, repo_sha = _model(root, store, verified, "org/repo/unet/model.safetensors", 20)
+        config = repo.parent.parent / "config.json"
+        config.write_text("{}")
+        os.utime(config, (time.time() - 20 * DAY,) * 2)
+        recent, _ = _model(root, store, verified, "loras/recent.safetensors", 1)
+        rerequested, _ = _model(root, store, verified, "loras/rerequested.safetensors", 25)
+        access.touch(["loras/rerequested.safetensors"])
+        by_hand = root / "models" / "loras" / "by_hand.safetensors"
+        by_hand.write_bytes(os.urandom(128 * KB))
+        os.utime(by_hand, (0, 0))
+
+        lockfile.write([{'source': 'civitai', 'category': 'loras', 'item_id': '1'}],
+                       {'civitai:loras:1': {'files': [{'path': "models/loras/oldest.safetensors",
+                                                       'sha256': oldest_sha}]}})
+
+        messages = []
+        # 1000 KB volume, 900 KB used: 256 KB must go to get under 70%
+        evictor = Evictor(root, store, verified, lockfile, access, messages.append, high_water=0.8,
+                          low_water=0.7, pins=parse_pins("loras/pinned*, "),
+                          disk_usage=lambda path: DiskUsage(1000 * KB, 900 * KB, 100 * KB))
+        assert evictor.make_room(need=56 * KB, protected=["checkpoints/requested.safetensors"]) >= 256 * KB
+
+        assert not (root / "models" / "org").exists(), "A whole HF tree is one unit"
+        assert not oldest.exists()
+        for kept in (pinned, requested, recent, rerequested, by_hand):
+            assert kept.exists(), kept
+        assert not store.has(oldest_sha) and not store.has(repo_sha)
+        assert store.lookup("test:loras/oldest.safetensors") is None
+        assert lockfile.load()['items'] == {}
+        assert len(ModelStore(state / "store").blob_hashes()) == 4
+        assert any("Evicted org/repo" in message for message in messages)
+
+        # Below the high-water mark nothing is touched
+        evictor.disk_usage = lambda path: DiskUsage(1000 * KB, 500 * KB, 500 * KB)
+        assert evictor.make_room(need=100 * KB) == 0
+        assert recent.exists()
+
+
+def _run(workspace, server, checkpoints, environment=None):
+    environ = dict(os.environ)
+    os.environ.update({
+        'WORKSPACE': workspace,
+        'CIVITAI_API_BASE': server.url,
+        'CIVITAI_CHECKPOINTS_TO_DOWNLOAD': checkpoints,
+        'NEXIS_DISK_RESERVE_MB': '1',
+        **(environment or {}),
+    })
+    try:
+        return nexis_downloader.main([])
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+
+
+def test_downloader_evicts_before_downloading():
+    """Rotating models past the high-water mark evicts the previous ones but never the requested ones"""
+    old, new = os.urandom(1536 * KB), os.urandom(1536 * KB)
+    with StandinServer() as server, tempfile.TemporaryDirectory() as workspace:
+        server.add_civitai_model(70, "old.safetensors", old)
+        server.add_civitai_model(71, "new.safetensors", new)
+        checkpoints = Path(workspace) / "models" / "checkpoints"
+
+        assert _run(workspace, server, "70") == 0
+        # Any real volume is fuller than 1%, so everything not requested is evicted
+        assert _run(workspace, server, "71", {'NEXIS_EVICTION_HIGH_WATER_PERCENT': '1'}) == 0
+        assert not (checkpoints / "old.safetensors").exists()
+        assert (checkpoints / "new.safetensors").read_bytes() == new
+
+        assert _run(workspace, server, "71", {'NEXIS_EVICTION_HIGH_WATER_PERCENT': '1'}) == 0
+        assert (checkpoints / "new.safetensors").read_bytes() == new
+
+
+if __name__ == "__main__":
+    print("Running eviction tests")
+    test_least_recently_used_models_are_evicted()
+    test_downloader_evicts_before_downloading()
+    print("🎉 All eviction tests passed!")
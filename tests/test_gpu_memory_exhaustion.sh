@@ -12,7 +12,7 @@ ALLOC_PID=$!
 sleep 5
 
 # Run the application
-/home/comfyuser/scripts/service_manager.sh &
+python3 /home/comfyuser/scripts/nexis_supervisor.py &
 APP_PID=$!
 
 # Wait for the application to start
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for in-process and streaming SHA256 hashing used by nexis_downloader.py
+"""
+
+import sys
+import os
+import hashlib
+import tempfile
+from pathlib import Path
+
+# Add the scripts directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import nexis_hashing
+from nexis_hashing import StreamingHasher, VerifiedManifest, hash_file
+from nexis_organizer import ModelOrganizer
+from nexis_state import read_json
+
+PAYLOAD = os.urandom(300 * 1024 + 17)
+EXPECTED = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+def test_hash_file_matches_hashlib():
+    """The large-buffer file hash matches a plain hashlib digest"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "model.safetensors"
+        path.write_bytes(PAYLOAD)
+        assert hash_file(path, buffer_size=64 * 1024) == EXPECTED
+
+
+def test_out_of_order_segments_are_hashed_once():
+    """Segments written out of order are folded in as soon as the prefix reaches them"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "model.safetensors"
+        path.write_bytes(b"\0" * len(PAYLOAD))
+        hasher = StreamingHasher(path, buffer_size=4096)
+        segment = 100 * 1024
+        starts = list(range(0, len(PAYLOAD), segment))
+        with open(path, 'r+b') as f:
+            for start in reversed(starts):
+                data = PAYLOAD[start:start + segment]
+                f.seek(start)
+                f.write(data)
+                f.flush()
+                hasher.update(start, data)
+                if start:
+                    assert hasher.hashed_offset == 0, "Later segments must wait for the prefix"
+        assert hasher.hashed_offset == len(PAYLOAD)
+        assert hasher.hexdigest() == EXPECTED
+
+
+def test_manifest_trusts_unchanged_files():
+    """Unchanged files are not reread; renamed files keep their entry; edits force a rehash"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "model.safetensors"
+        path.write_bytes(PAYLOAD)
+        manifest_path = Path(temp_dir) / "verified_files.json"
+        assert VerifiedManifest(manifest_path).file_hash(path) == EXPECTED
+
+        reads = []
+        original_hash_file = nexis_hashing.hash_file
+        nexis_hashing.hash_file = lambda p, *a, **k: reads.append(p) or original_hash_file(p)
+        try:
+            moved = Path(temp_dir) / "moved.safetensors"
+            path.rename(moved)
+            manifest = VerifiedManifest(manifest_path)
+            assert manifest.file_hash(moved) == EXPECTED
+            assert reads == [], "A renamed but unchanged file should not be rehashed"
+
+            with open(moved, 'r+b') as f:
+                f.write(b"corrupt")
+            assert manifest.file_hash(moved) != EXPECTED
+            assert reads == [moved], "A modified file must be rehashed"
+        finally:
+            nexis_hashing.hash_file = original_hash_file
+
+
+def test_manifest_batches_writes_and_prunes_stale_entries():
+    """A batch writes the manifest once; deleted, replaced and moved files never leave stale entries"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        workspace = Path(temp_dir)
+        manifest_path = workspace / "verified_files.json"
+        downloads = workspace / "downloads_tmp" / "loras"
+        downloads.mkdir(parents=True)
+        paths = []
+        for i in range(3):
+            paths.append(downloads / f"lora{i}.safetensors")
+            paths[-1].write_bytes(PAYLOAD[i:])
+
+        manifest = VerifiedManifest(manifest_path)
+        writes = []
+        original_write = nexis_hashing.atomic_write_json
+        nexis_hashing.atomic_write_json = lambda *a, **k: writes.append(a[0]) or original_write(*a, **k)
+        try:
+            with manifest.batch():
+                for path in paths:
+                    manifest.file_hash(path)
+                assert writes == [] and not manifest_path.exists(), "Nothing is written until the batch ends"
+                assert manifest.lookup(paths[0]) == hashlib.sha256(PAYLOAD).hexdigest()
+                manifest.reload()
+                assert manifest.lookup(paths[0]), "Reloading keeps the batched entries"
+        finally:
+            nexis_hashing.atomic_write_json = original_write
+        assert writes == [manifest_path]
+        assert len(read_json(manifest_path)) == 3
+
+        paths[1].unlink()
+        paths[2].unlink()
+        paths[2].write_bytes(b"a different file under the same name")  # new inode, old path
+        ModelOrganizer(workspace, lambda *a, **k: None, verified=manifest).organize()
+
+        entries = read_json(manifest_path)
+        moved = workspace / "models" / "loras" / paths[0].name
+        assert [entry['path'] for entry in entries.values()] == [str(moved)], entries
+        assert VerifiedManifest(manifest_path).lookup(moved) == hashlib.sha256(PAYLOAD).hexdigest()
+
+
+if __name__ == "__main__":
+    print("Running hashing tests for nexis_downloader.py")
+    test_hash_file_matches_hashlib()
+    test_out_of_order_segments_are_hashed_once()
+    test_manifest_trusts_unchanged_files()
+    test_manifest_batches_writes_and_prunes_stale_entries()
+    print("🎉 All hashing tests passed!")
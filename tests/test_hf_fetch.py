@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for the selective, in-process HuggingFace fetch used by nexis_downloader.py
+"""
+
+import sys
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+# Add the scripts and benchmarks directories to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import requests
+
+from nexis_downloader import NexisDownloader
+from nexis_hf import parse_hf_spec
+from standin_server import StandinServer
+
+REPO = "org/diffusers-repo"
+COMMIT = "0123456789abcdef0123456789abcdef01234567"
+FILES = {
+    "unet/model.fp16.safetensors": os.urandom(2 * 1024 * 1024 + 3),
+    "unet/model.safetensors": os.urandom(2 * 1024 * 1024 + 5),
+    "unet/config.json": b'{"sample_size": 128}',
+    "onnx/model.onnx": os.urandom(1024 * 1024),
+}
+LFS = {"unet/model.fp16.safetensors", "unet/model.safetensors", "onnx/model.onnx"}
+
+
+class HubHandler(BaseHTTPRequestHandler):
+    """Serves a revision listing and resolve URLs for one fake repo"""
+
+    def do_GET(self):
+        path = unquote(urlparse(self.path).path)
+        self.server.paths.append(path)
+        if path == f"/api/models/{REPO}/revision/main":
+            siblings = []
+            for name, data in FILES.items():
+                sibling = {'rfilename': name}
+                if name in LFS:
+                    sibling['lfs'] = {'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+                else:
+                    sibling['size'] = len(data)
+                siblings.append(sibling)
+            body = json.dumps({'id': REPO, 'sha': COMMIT, 'siblings': siblings}).encode()
+            self.send_response(200)
+        elif path.startswith(f"/{REPO}/resolve/{COMMIT}/"):
+            body = FILES[path[len(f"/{REPO}/resolve/{COMMIT}/"):]]
+            byte_range = self.headers.get('Range')
+            if byte_range:
+                start, end = byte_range.split('=')[1].split('-')
+                start, end = int(start), min(int(end), len(body) - 1)
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{len(body)}')
+                body = body[start:end + 1]
+            else:
+                self.send_response(200)
+        else:
+            body = b'{}'
+            self.send_response(404)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _downloader(server, workspace):
+    downloader = NexisDownloader(debug_mode=False, workspace_dir=workspace)
+    downloader.session = requests.Session()
+    downloader.hf_endpoint = f"http://127.0.0.1:{server.server_port}"
+    downloader.hf_backend = 'native'
+    return downloader
+
+
+def test_parse_hf_spec():
+    """Revisions and ';'-separated include/exclude globs are parsed from one entry"""
+    assert parse_hf_spec(" org/repo ") == {
+        'repo_id': 'org/repo', 'revision': 'main', 'include': [], 'exclude': []}
+    spec = parse_hf_spec("org/repo@v1.0?include=*.safetensors;*.json&exclude=*fp32*")
+    assert spec['repo_id'] == 'org/repo'
+    assert spec['revision'] == 'v1.0'
+    assert spec['include'] == ['*.safetensors', '*.json']
+    assert spec['exclude'] == ['*fp32*']
+
+
+def test_selective_fetch_and_pinned_rerun():
+    """Only matching files are fetched; a pinned rerun neither lists nor downloads"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), HubHandler)
+    server.paths = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as workspace:
+            downloader = _downloader(server, workspace)
+            spec = f"{REPO}?include=unet/*&exclude=*.fp16.*"
+            assert downloader.download_hf_repo(spec)
+
+            repo_dir = Path(workspace) / "downloads_tmp" / "huggingface" / REPO
+            fetched = sorted(str(p.relative_to(repo_dir)) for p in repo_dir.rglob('*') if p.is_file())
+            assert fetched == ["unet/config.json", "unet/model.safetensors"]
+            assert (repo_dir / "unet/model.safetensors").read_bytes() == FILES["unet/model.safetensors"]
+            assert not any("onnx" in p or "fp16" in p for p in server.paths)
+
+            server.paths.clear()
+            downloader = _downloader(server, workspace)
+            assert downloader.download_hf_repo(f"{REPO}@{COMMIT}?include=unet/*&exclude=*.fp16.*")
+            assert server.paths == [], "A pinned, already fetched repo needs no requests"
+    finally:
+        server.shutdown()
+
+
+def test_files_without_sha256_follow_their_blob_id():
+    """A small file changed upstream at the same size is fetched again; an unchanged one is not"""
+    with StandinServer() as server, tempfile.TemporaryDirectory() as workspace:
+        weights = os.urandom(64 * 1024)
+        server.add_hf_repo("org/small", {"config.json": b'{"steps": 10}', "model.bin": weights},
+                           commit="1" * 40)
+        downloader = NexisDownloader(debug_mode=False, workspace_dir=workspace)
+        downloader.hf_endpoint = server.url
+        assert downloader.download_hf_repo("org/small")
+
+        server.add_hf_repo("org/small", {"config.json": b'{"steps": 20}', "model.bin": weights},
+                           commit="2" * 40)
+        server.reset_stats()
+        downloader = NexisDownloader(debug_mode=False, workspace_dir=workspace)
+        downloader.hf_endpoint = server.url
+        assert downloader._job_need({'source': 'hf', 'category': 'huggingface', 'item_id': "org/small"}) == 13
+        assert downloader.download_hf_repo("org/small")
+
+        repo_dir = Path(workspace) / "downloads_tmp" / "huggingface" / "org/small"
+        assert (repo_dir / "config.json").read_bytes() == b'{"steps": 20}'
+        assert server.stats['range_requests'] == 2, "Only the changed file is probed and fetched again"
+
+
+if __name__ == "__main__":
+    print("Running HuggingFace fetch tests for nexis_downloader.py")
+    test_parse_hf_spec()
+    test_selective_fetch_and_pinned_rerun()
+    test_files_without_sha256_follow_their_blob_id()
+    print("🎉 All HuggingFace fetch tests passed!")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for the lock-file fast path of nexis_downloader.py
+"""
+
+import sys
+import os
+import json
+import tempfile
+from pathlib import Path
+
+# Add the scripts and benchmarks directories to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import nexis_downloader
+from standin_server import StandinServer
+
+
+def _run(workspace, server, argv=()):
+    environ = dict(os.environ)
+    os.environ.update({
+        'WORKSPACE': workspace,
+        'CIVITAI_API_BASE': server.url,
+        'HF_ENDPOINT': server.url,
+        'CIVITAI_LORAS_TO_DOWNLOAD': '51',
+        'HF_REPOS_TO_DOWNLOAD': 'org/tiny?include=*.safetensors;*.json',
+        'NEXIS_DISK_RESERVE_MB': '1',
+    })
+    try:
+        return nexis_downloader.main(list(argv))
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+
+
+def test_warm_restart_makes_no_requests():
+    """An unchanged restart is served from the lock-file; changes and --refresh go to the network"""
+    with StandinServer() as server, tempfile.TemporaryDirectory() as workspace:
+        server.add_civitai_model(51, "style.safetensors", os.urandom(256 * 1024))
+        server.add_hf_repo("org/tiny", {
+            "model.safetensors": os.urandom(128 * 1024),
+            "config.json": b'{"layers": 2}',
+            "notes.txt": b"not requested",
+        })
+
+        assert _run(workspace, server) == 0
+        lock = json.loads((Path(workspace) / ".nexis" / "nexis.lock.json").read_text())
+        assert len(lock['items']) == 2
+        hf_item = lock['items']['hf:huggingface:org/tiny?include=*.safetensors;*.json']
+        assert hf_item['commit'] and len(hf_item['files']) == 2
+
+        server.reset_stats()
+        assert _run(workspace, server) == 0
+        assert server.stats['requests'] == 0, "A warm restart must not touch the network"
+
+        # A modified model no longer verifies, so the run goes back to the network
+        model = Path(workspace) / "models" / "loras" / "style.safetensors"
+        model.write_bytes(b"corrupted")
+        assert _run(workspace, server) == 0
+        assert server.stats['requests'] > 0
+        assert model.stat().st_size == 256 * 1024
+
+        server.reset_stats()
+        assert _run(workspace, server, ['--refresh']) == 0
+        assert server.stats['requests'] >= 2, "--refresh revalidates CivitAI metadata and the HF revision"
+        assert server.stats['range_requests'] == 0, "Nothing changed, so nothing is downloaded again"
+
+
+if __name__ == "__main__":
+    print("Running lock-file tests for nexis_downloader.py")
+    test_warm_restart_makes_no_requests()
+    print("🎉 All lock-file tests passed!")
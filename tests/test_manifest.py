@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the prioritized download manifest (nexis_manifest.py and nexis_downloader.py)
+"""
+
+import sys
+import os
+import json
+import tempfile
+from pathlib import Path
+
+# Add the scripts and benchmarks directories to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import nexis_downloader
+from nexis_manifest import ManifestError, load_manifest, make_job, merge_jobs, prioritize
+from standin_server import StandinServer
+
+
+def test_items_are_validated_merged_and_ordered():
+    """Items get defaults, duplicates merge, and order is required, priority, size, then list order"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        manifest = Path(temp_dir) / "models.yaml"
+        manifest.write_text(
+            "items:\n"
+            "  - {id: '10', category: loras, required: false}\n"
+            "  - {id: org/repo, priority: 5}\n"
+            "  - {id: '11', category: Checkpoints, priority: 5, subfolder: /sdxl/}\n"
+            "  - {id: '12', category: loras, priority: 1}\n"
+        )
+        listed = load_manifest(manifest)
+        assert listed[1] == {'source': 'hf', 'category': 'huggingface', 'item_id': 'org/repo',
+                             'priority': 5, 'required': True}
+        assert listed[2]['category'] == 'checkpoints' and listed[2]['subfolder'] == 'sdxl'
+
+        jobs, duplicates = merge_jobs([make_job('civitai', 'loras', '10')] + listed)
+        assert duplicates == 1 and len(jobs) == 4
+        assert jobs[0]['required'] is True, "Required wins when an item is listed twice"
+
+        ordered, needs = prioritize(jobs, [300, None, 200, 100])
+        assert [job['item_id'] for job in ordered] == ['11', 'org/repo', '12', '10']
+        assert needs == [200, None, 100, 300]
+
+        for bad in ([{'id': '1', 'category': 'unet'}], [{'id': '1', 'category': 'loras', 'required': 'no'}],
+                    [{'id': 'org/repo', 'subfolder': 'x'}], [{'id': '1', 'category': 'loras', 'subfolder': '../x'}],
+                    {'models': []}, [{'category': 'loras'}], [{'id': '1', 'category': 'loras', 'prio': 1}]):
+            manifest = Path(temp_dir) / "bad.json"
+            manifest.write_text(json.dumps(bad))
+            try:
+                load_manifest(manifest)
+            except ManifestError:
+                continue
+            raise AssertionError(f"{bad} must be rejected")
+
+
+def _run(workspace, server, manifest, environment=None):
+    environ = dict(os.environ)
+    os.environ.update({
+        'WORKSPACE': workspace,
+        'CIVITAI_API_BASE': server.url,
+        'NEXIS_DOWNLOAD_MANIFEST': str(manifest),
+        'NEXIS_MAX_CONCURRENT_DOWNLOADS': '1',
+        'NEXIS_DISK_RESERVE_MB': '1',
+        **(environment or {}),
+    })
+    try:
+        return nexis_downloader.main([])
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+
+
+def test_downloader_follows_the_manifest():
+    """Priorities set the dispatch order, subfolders the placement, and optional failures do not fail the run"""
+    with StandinServer() as server, tempfile.TemporaryDirectory() as workspace:
+        server.add_civitai_model(90, "big.safetensors", os.urandom(400 * 1024))
+        server.add_civitai_model(91, "small.safetensors", os.urandom(100 * 1024))
+        server.add_civitai_model(92, "first.safetensors", os.urandom(200 * 1024))
+        manifest = Path(workspace) / "manifest.json"
+        manifest.write_text(json.dumps({'items': [
+            {'id': '90', 'category': 'loras'},
+            {'id': '91', 'category': 'loras'},
+            {'id': '92', 'category': 'checkpoints', 'priority': 10, 'subfolder': 'sdxl'},
+            {'id': '99', 'category': 'loras', 'required': False},
+        ]}))
+
+        assert _run(workspace, server, manifest, {'CIVITAI_LORAS_TO_DOWNLOAD': '90'}) == 0
+        models = Path(workspace) / "models"
+        assert (models / "checkpoints" / "sdxl" / "first.safetensors").is_file()
+        assert (models / "loras" / "small.safetensors").is_file()
+
+        events = [json.loads(line) for line in
+                  (Path(workspace) / ".nexis" / "metrics" / "events.jsonl").read_text().splitlines()]
+        order = [e['item'] for e in events if e['event'] == 'download']
+        assert order == ['92', '91', '90', '99'], order
+        status = json.loads((Path(workspace) / ".nexis" / "status.json").read_text())
+        assert {item['item']: item['state'] for item in status['items']}['99'] == 'failed'
+
+        manifest.write_text(manifest.read_text().replace('"required": false', '"required": true'))
+        assert _run(workspace, server, manifest) == 1, "A missing required item fails the run"
+
+
+if __name__ == "__main__":
+    print("Running download manifest tests")
+    test_items_are_validated_merged_and_ordered()
+    test_downloader_follows_the_manifest()
+    print("🎉 All download manifest tests passed!")
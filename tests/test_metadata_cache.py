@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent CivitAI metadata cache and prefetch in nexis_downloader.py
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+
+# Add the scripts directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from nexis_downloader import NexisDownloader
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self._data = data
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+class FakeSession:
+    """Answers model-version requests and records the headers it was sent"""
+
+    def __init__(self, not_modified=False):
+        self.not_modified = not_modified
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None):
+        version_id = url.rsplit('/', 1)[-1]
+        with self.lock:
+            self.calls.append((version_id, dict(headers or {})))
+        if self.not_modified:
+            return FakeResponse(304)
+        return FakeResponse(200, {
+            'modelId': 1,
+            'files': [{
+                'name': f"model_{version_id}.safetensors",
+                'sizeKB': 2.0,
+                'hashes': {'SHA256': 'ABCDEF'},
+                'downloadUrl': f"https://civitai.com/api/download/models/{version_id}",
+            }],
+        }, headers={'ETag': f'"etag-{version_id}"'})
+
+
+def _downloader(workspace, session):
+    downloader = NexisDownloader(debug_mode=False, workspace_dir=workspace)
+    downloader.session = session
+    return downloader
+
+
+def test_metadata_is_reused_across_boots():
+    """A second downloader instance resolves metadata from disk without network calls"""
+    with tempfile.TemporaryDirectory() as workspace:
+        first_session = FakeSession()
+        info = _downloader(workspace, first_session).get_civitai_model_info("42")
+        assert info['filename'] == "model_42.safetensors"
+        assert info['hash'] == "abcdef", "Hash should be normalised to lower case"
+        assert info['size'] == 2048
+        assert len(first_session.calls) == 1
+
+        second_session = FakeSession()
+        info = _downloader(workspace, second_session).get_civitai_model_info("42")
+        assert info['filename'] == "model_42.safetensors"
+        assert second_session.calls == [], "Cached metadata should not hit the API"
+
+
+def test_stale_entries_are_revalidated_conditionally():
+    """Old entries are revalidated with If-None-Match and kept on 304"""
+    with tempfile.TemporaryDirectory() as workspace:
+        _downloader(workspace, FakeSession()).get_civitai_model_info("7")
+
+        cache_file = os.path.join(workspace, ".nexis", "civitai_metadata", "7.json")
+        with open(cache_file) as f:
+            entry = json.load(f)
+        entry['fetched_at'] = 0
+        with open(cache_file, 'w') as f:
+            json.dump(entry, f)
+
+        session = FakeSession(not_modified=True)
+        info = _downloader(workspace, session).get_civitai_model_info("7")
+        assert info['filename'] == "model_7.safetensors"
+        assert session.calls[0][1].get('If-None-Match') == '"etag-7"'
+
+
+def test_files_without_sha256_are_not_revalidated():
+    """A missing SHA256 is cached like any other fact and needs no request until the entry ages"""
+    with tempfile.TemporaryDirectory() as workspace:
+        _downloader(workspace, FakeSession()).get_civitai_model_info("8")
+
+        cache_file = os.path.join(workspace, ".nexis", "civitai_metadata", "8.json")
+        with open(cache_file) as f:
+            entry = json.load(f)
+        entry['files'][0]['sha256'] = ''
+        with open(cache_file, 'w') as f:
+            json.dump(entry, f)
+
+        session = FakeSession()
+        info = _downloader(workspace, session).get_civitai_model_info("8")
+        assert info['filename'] == "model_8.safetensors"
+        assert not info['hash']
+        assert session.calls == []
+
+
+def test_prefetch_resolves_all_ids_once():
+    """Prefetch dedupes IDs and fills the in-memory view for the download phase"""
+    with tempfile.TemporaryDirectory() as workspace:
+        session = FakeSession()
+        downloader = _downloader(workspace, session)
+        infos = downloader.prefetch_civitai_metadata(["1", "2", "3", "2"])
+        assert sorted(infos) == ["1", "2", "3"]
+        assert len(session.calls) == 3
+
+        downloader.get_civitai_model_info("3")
+        assert len(session.calls) == 3, "Prefetched metadata should be served from memory"
+
+
+if __name__ == "__main__":
+    print("Running metadata cache tests for nexis_downloader.py")
+    test_metadata_is_reused_across_boots()
+    test_stale_entries_are_revalidated_conditionally()
+    test_files_without_sha256_are_not_revalidated()
+    test_prefetch_resolves_all_ids_once()
+    print("🎉 All metadata cache tests passed!")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Tests for the structured download metrics written by nexis_downloader.py
+"""
+
+import sys
+import os
+import json
+import tempfile
+from pathlib import Path
+
+# Add the scripts and benchmarks directories to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from nexis_downloader import NexisDownloader
+from nexis_metrics import MetricsRecorder
+from standin_server import StandinServer
+
+# Stands in for aria2c: fetches the URL (the last argument) into --dir/--out
+FAKE_ARIA2C = """#!/usr/bin/env python3
+import sys, urllib.request
+options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:-1] if arg.startswith('--') and '=' in arg)
+with urllib.request.urlopen(sys.argv[-1]) as response:
+    data = response.read()
+with open(options['dir'] + '/' + options['out'], 'wb') as f:
+    f.write(data)
+"""
+
+
+def _recorded_run(metrics_dir):
+    metrics = MetricsRecorder(metrics_dir, run_id="run1")
+    metrics.emit('metadata', source='civitai', item='1', status=200, duration_seconds=0.25)
+    metrics.emit('transfer', host='civitai.com', file='a.safetensors', bytes=4000, resumed_bytes=1000,
+                 duration_seconds=2.0, ttfb_seconds=0.1, throughput_bps=1500.0, retries=2, connections=4)
+    metrics.emit('checksum', file='a.safetensors', mode='streaming', duration_seconds=0.5)
+    metrics.emit('download', source='civitai', category='loras', item='1', result='success',
+                 duration_seconds=3.0)
+    metrics.emit('download', source='hf', category='huggingface', item='org/repo', result='failed',
+                 duration_seconds=1.0)
+    return metrics
+
+
+def test_events_are_written_as_json_lines():
+    """Each event is one JSON object per line, tagged with the run id"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        metrics = _recorded_run(Path(temp_dir))
+        events = [json.loads(line) for line in metrics.events_path.read_text().splitlines()]
+        assert [e['event'] for e in events] == ['metadata', 'transfer', 'checksum', 'download', 'download']
+        assert all(e['run'] == 'run1' for e in events)
+
+
+def test_summary_is_built_from_events():
+    """The end-of-run summary aggregates events without looking at the filesystem"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        summary = _recorded_run(Path(temp_dir)).summary()
+        assert summary['results'] == {'success': 1, 'failed': 1}
+        assert summary['bytes_transferred'] == 3000, "Resumed bytes were not transferred this run"
+        assert summary['throughput_bps'] == 1500.0
+        assert summary['retries'] == 2
+        assert summary['slowest'][0]['item'] == '1'
+
+
+def test_prometheus_textfile():
+    """The textfile uses the exposition format node_exporter expects"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        metrics = _recorded_run(Path(temp_dir))
+        metrics.write_prometheus()
+        text = metrics.prometheus_path.read_text()
+        assert '# TYPE nexis_transfer_bytes_total counter' in text
+        assert 'nexis_transfer_bytes_total{component="downloader",host="civitai.com"} 3000' in text
+        assert 'nexis_download_duration_seconds_count{category="loras",component="downloader",result="success",source="civitai"} 1' in text
+        assert 'nexis_transfer_retries_total{component="downloader",host="civitai.com"} 2' in text
+
+
+def test_prometheus_textfile_with_aria2c_transfers():
+    """aria2c transfers have no time to first byte; they count everywhere except the ttfb summary"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        metrics = _recorded_run(Path(temp_dir))
+        metrics.emit('transfer', host='civitai.com', file='b.safetensors', bytes=2000, resumed_bytes=0,
+                     duration_seconds=1.0, ttfb_seconds=None, throughput_bps=2000.0, retries=0, connections=8)
+        metrics.write_prometheus()
+        text = metrics.prometheus_path.read_text()
+        assert 'nexis_transfer_bytes_total{component="downloader",host="civitai.com"} 5000' in text
+        assert 'nexis_transfer_duration_seconds_count{component="downloader",host="civitai.com"} 2' in text
+        assert 'nexis_transfer_ttfb_seconds_count{component="downloader",host="civitai.com"} 1' in text
+
+
+def test_component_textfiles_do_not_collide():
+    """The downloader, organizer and prewarm textfiles can be scraped from one directory"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        metrics_dir = Path(temp_dir)
+        _recorded_run(metrics_dir).write_prometheus()
+        for name, phase in (("nexis_organizer", 'organize'), ("nexis_prewarm", 'prewarm')):
+            metrics = MetricsRecorder(metrics_dir, name=name)
+            metrics.emit(phase, duration_seconds=0.5)
+            metrics.write_prometheus()
+
+        series, families = set(), {}
+        files = sorted(metrics_dir.glob("*.prom"))
+        assert [f.name for f in files] == ["nexis_downloader.prom", "nexis_organizer.prom", "nexis_prewarm.prom"]
+        for path in files:
+            for line in path.read_text().splitlines():
+                if line.startswith('# '):
+                    _, kind, name, text = line.split(' ', 3)
+                    assert families.setdefault((kind, name), text) == text, f"{name} {kind} differs between files"
+                    continue
+                sample = line.rsplit(' ', 1)[0]
+                assert sample not in series, f"{sample} appears in more than one textfile"
+                series.add(sample)
+        assert 'nexis_phase_duration_seconds_count{component="prewarm",phase="prewarm"}' in series
+        assert 'nexis_run_timestamp_seconds{component="organizer"}' in series
+
+
+def test_backends_emit_the_same_transfer_fields():
+    """native and aria2c transfer events carry the same fields"""
+    with StandinServer() as server, tempfile.TemporaryDirectory() as workspace:
+        server.add_civitai_model(41, "native.safetensors", os.urandom(300 * 1024))
+        server.add_civitai_model(42, "aria2c.safetensors", os.urandom(300 * 1024))
+        fake = Path(workspace) / "bin" / "aria2c"
+        fake.parent.mkdir()
+        fake.write_text(FAKE_ARIA2C)
+        fake.chmod(0o755)
+        path = os.environ['PATH']
+        os.environ['PATH'] = f"{fake.parent}{os.pathsep}{path}"
+        try:
+            downloader = NexisDownloader(workspace_dir=workspace)
+            downloader.civitai_api_base = server.url
+            downloader.create_directory_structure()
+            assert downloader.download_civitai_model('41', 'loras')
+            downloader.download_backend = 'aria2c'
+            assert downloader.download_civitai_model('42', 'loras')
+        finally:
+            os.environ['PATH'] = path
+
+        native, aria2c = [e for e in downloader.metrics.events if e['event'] == 'transfer']
+        assert set(native) == set(aria2c), set(native) ^ set(aria2c)
+        assert aria2c['bytes'] == 300 * 1024 and aria2c['retries'] == 0 and aria2c['ttfb_seconds'] is None
+
+
+if __name__ == "__main__":
+    print("Running metrics tests for nexis_downloader.py")
+    test_events_are_written_as_json_lines()
+    test_summary_is_built_from_events()
+    test_prometheus_textfile()
+    test_prometheus_textfile_with_aria2c_transfers()
+    test_component_textfiles_do_not_collide()
+    test_backends_emit_the_same_transfer_fields()
+    print("🎉 All metrics tests passed!")
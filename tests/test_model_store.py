@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed model store used by nexis_downloader.py
+"""
+
+import sys
+import os
+import hashlib
+import tempfile
+from pathlib import Path
+
+# Add the scripts directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from nexis_store import ModelStore
+from nexis_downloader import NexisDownloader
+
+CONTENT = b"safetensors payload" * 1000
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+
+
+def test_duplicates_share_one_blob():
+    """Ingesting the same content twice leaves both paths linked to one blob"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        store = ModelStore(root / "store")
+        first = root / "checkpoints" / "a.safetensors"
+        second = root / "loras" / "b.safetensors"
+        for path in (first, second):
+            path.parent.mkdir(parents=True)
+            path.write_bytes(CONTENT)
+
+        store.ingest(first, SHA256, alias="civitai:1")
+        store.ingest(second, SHA256, alias="civitai:2")
+
+        blob = store.blob_path(SHA256)
+        assert os.path.samefile(first, blob)
+        assert os.path.samefile(second, blob)
+        assert blob.stat().st_nlink == 3, "Store blob plus two model links"
+        assert store.lookup("civitai:2") == (SHA256, "b.safetensors")
+
+        # A fresh instance sees the same index
+        assert ModelStore(root / "store").has(SHA256)
+
+
+class OfflineSession:
+    def get(self, *args, **kwargs):
+        raise AssertionError("No network request expected for a stored model")
+
+
+def test_stored_model_is_placed_without_network():
+    """A model already in the store is linked into models/ with no API call"""
+    with tempfile.TemporaryDirectory() as workspace:
+        downloader = NexisDownloader(debug_mode=False, workspace_dir=workspace)
+        source = Path(workspace) / "downloads_tmp" / "checkpoints" / "model.safetensors"
+        source.parent.mkdir(parents=True)
+        source.write_bytes(CONTENT)
+        downloader.store.ingest(source, SHA256, alias="civitai:99")
+        source.unlink()
+
+        downloader = NexisDownloader(debug_mode=False, workspace_dir=workspace)
+        downloader.session = OfflineSession()
+        assert downloader.download_civitai_model("99", "checkpoints")
+
+        placed = Path(workspace) / "models" / "checkpoints" / "model.safetensors"
+        assert placed.read_bytes() == CONTENT
+        assert os.path.samefile(placed, downloader.store.blob_path(SHA256))
+
+
+if __name__ == "__main__":
+    print("Running model store tests for nexis_downloader.py")
+    test_duplicates_share_one_blob()
+    test_stored_model_is_placed_without_network()
+    print("🎉 All model store tests passed!")
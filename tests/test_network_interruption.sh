@@ -1,13 +1,16 @@
 #!/bin/bash
 
 # Test for network interruption recovery
+# The interrupted download must be resumed from its journal, not restarted.
 
 echo "Starting network interruption recovery test..."
 
+LOG_FILE=$(mktemp)
+
 # Start the download in the background
 export CIVITAI_CHECKPOINTS_TO_DOWNLOAD="133745"
 export DEBUG_MODE=true
-python3 /home/comfyuser/scripts/nexis_downloader.py &
+python3 /home/comfyuser/scripts/nexis_downloader.py > "$LOG_FILE" 2>&1 &
 DOWNLOAD_PID=$!
 
 # Wait for a few seconds to let the download start
@@ -20,19 +23,27 @@ iptables -A OUTPUT -d civitai.com -j DROP
 # Wait for a few seconds
 sleep 20
 
+# Simulate the pod being preempted while the link is down
+echo "Killing the downloader mid-transfer..."
+kill -9 $DOWNLOAD_PID 2>/dev/null
+wait $DOWNLOAD_PID 2>/dev/null
+
 # Restore network access
 echo "Restoring network access..."
 iptables -D OUTPUT -d civitai.com -j DROP
 
-# Wait for the download to complete
-wait $DOWNLOAD_PID
+# Run the downloader again; it should pick up the journaled partial file
+python3 /home/comfyuser/scripts/nexis_downloader.py >> "$LOG_FILE" 2>&1
 EXIT_CODE=$?
+cat "$LOG_FILE"
 
-# Check if the download was successful
-if [ $EXIT_CODE -eq 0 ]; then
+# Check that the download succeeded and was resumed rather than restarted
+if [ $EXIT_CODE -eq 0 ] && grep -q "Resuming" "$LOG_FILE"; then
     echo "Network interruption recovery test PASSED!"
+    rm -f "$LOG_FILE"
     exit 0
 else
     echo "Network interruption recovery test FAILED!"
+    rm -f "$LOG_FILE"
     exit 1
-fi
\ No newline at end of file
+fi
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for moving finished downloads into models/ (nexis_organizer.py)
+"""
+
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Add the scripts directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import nexis_organizer
+from nexis_organizer import ModelOrganizer
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def test_organize_renames_and_merges_hf_trees():
+    """Category files are renamed flat, HF trees merge into existing repos, partials stay"""
+    with tempfile.TemporaryDirectory() as workspace:
+        workspace = Path(workspace)
+        tmp = workspace / "downloads_tmp"
+        _write(tmp / "loras" / "style.safetensors", b"lora")
+        _write(tmp / "checkpoints" / "big.safetensors.part", b"partial")
+        _write(tmp / "checkpoints" / "big.safetensors.part.journal", b"{}")
+        _write(tmp / "huggingface" / "org" / "repo" / "unet" / "model.safetensors", b"unet")
+        _write(workspace / "models" / "org" / "repo" / "vae" / "model.safetensors", b"existing vae")
+
+        moves = ModelOrganizer(workspace, lambda *a, **k: None).organize()
+
+        assert moves['rename'] == 2 and moves['failed'] == 0
+        assert (workspace / "models" / "loras" / "style.safetensors").read_bytes() == b"lora"
+        assert (workspace / "models" / "org" / "repo" / "unet" / "model.safetensors").read_bytes() == b"unet"
+        assert (workspace / "models" / "org" / "repo" / "vae" / "model.safetensors").read_bytes() == b"existing vae"
+        assert (tmp / "checkpoints" / "big.safetensors.part").exists(), "Partial downloads must stay to resume"
+        assert not (tmp / "huggingface").exists(), "Emptied directories are cleaned up"
+
+
+def test_cross_filesystem_copy_is_parallel_and_complete():
+    """The copy fallback splits the file into ranges and reproduces it exactly"""
+    original_chunk = nexis_organizer.COPY_CHUNK_SIZE
+    nexis_organizer.COPY_CHUNK_SIZE = 64 * 1024
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "model.safetensors"
+            data = os.urandom(5 * 64 * 1024 + 123)
+            source.write_bytes(data)
+            target = Path(temp_dir) / ".model.safetensors.tmp"
+            method = ModelOrganizer(temp_dir, lambda *a, **k: None, copy_workers=3)._copy(source, target)
+            assert method in ('reflink', 'copy')
+            assert target.read_bytes() == data
+    finally:
+        nexis_organizer.COPY_CHUNK_SIZE = original_chunk
+
+
+if __name__ == "__main__":
+    print("Running organizer tests for nexis_organizer.py")
+    test_organize_renames_and_merges_hf_trees()
+    test_cross_filesystem_copy_is_parallel_and_complete()
+    print("🎉 All organizer tests passed!")
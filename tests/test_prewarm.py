@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for page-cache prewarming of downloaded models (nexis_prewarm.py)
+"""
+
+import sys
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# Add the scripts directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from nexis_prewarm import Prewarmer, mem_available, parse_patterns, select_files
+
+
+def _model(models_dir, relative, size, age=0):
+    path = models_dir / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(os.urandom(size))
+    os.utime(path, (time.time() - age, time.time() - age))
+    return path
+
+
+def test_priority_order():
+    """Files follow the pattern order, newest first within a pattern, each only once"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        models = Path(temp_dir)
+        old = _model(models, "checkpoints/old.safetensors", 16, age=100)
+        new = _model(models, "checkpoints/new.safetensors", 16)
+        lora = _model(models, "loras/style.safetensors", 16)
+        _model(models, "loras/readme.txt", 16)
+        vae = _model(models, "vae/sdxl_vae.safetensors", 16)
+
+        assert select_files(models, parse_patterns("loras/*, checkpoints/*")) == [lora, new, old]
+        assert select_files(models, parse_patterns("sdxl_vae.safetensors,all")) == [vae, lora, new, old]
+        assert select_files(models, []) == []
+
+
+def test_budget_is_respected():
+    """Files that no longer fit the budget are skipped, smaller later ones still fit"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        models = Path(temp_dir)
+        files = [_model(models, "a.safetensors", 600 * 1024),
+                 _model(models, "b.safetensors", 900 * 1024),
+                 _model(models, "c.safetensors", 300 * 1024)]
+        prewarmer = Prewarmer(lambda *a, **k: None, memory_fraction=0.5, available=lambda: 2 * 1024 * 1024)
+        totals = prewarmer.prewarm(files)
+        assert totals['files'] == 2 and totals['skipped'] == 1
+        assert totals['bytes'] == 900 * 1024
+
+
+def test_mem_available_respects_cgroup():
+    """The cgroup's remaining memory caps MemAvailable"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        (root / "meminfo").write_text("MemTotal: 8000000 kB\nMemAvailable: 4000000 kB\n")
+        (root / "memory.max").write_text("2147483648\n")
+        (root / "memory.current").write_text("1073741824\n")
+        cgroup = ((str(root / "memory.max"), str(root / "memory.current")),)
+        assert mem_available(root / "meminfo", cgroup) == 1073741824
+        (root / "memory.max").write_text("max\n")
+        assert mem_available(root / "meminfo", cgroup) == 4000000 * 1024
+        assert mem_available(root / "missing", ()) == 0
+
+
+if __name__ == "__main__":
+    print("Running prewarm tests for nexis_prewarm.py")
+    test_priority_order()
+    test_budget_is_respected()
+    test_mem_available_respects_cgroup()
+    print("🎉 All prewarm tests passed!")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for progressive startup: download status and publishing verified models
+"""
+
+import sys
+import os
+import json
+import tempfile
+from pathlib import Path
+
+# Add the scripts directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from nexis_downloader import NexisDownloader
+
+
+class PublishingDownloader(NexisDownloader):
+    """Downloader whose jobs write a verified file instead of downloading"""
+
+    def __init__(self, workspace):
+        super().__init__(debug_mode=False, workspace_dir=workspace)
+        self.publish_on_verify = True
+        self.seen_status = []
+
+    def download_civitai_model(self, model_id, model_type, token=None):
+        self.seen_status.append(json.loads(self.status.path.read_text()))
+        if model_id == 'bad':
+            return False
+        output_file = self.download_tmp_dir / model_type / f"{model_id}.safetensors"
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        output_file.write_bytes(b"weights")
+        self._publish(output_file, self.models_dir / model_type / output_file.name)
+        return True
+
+
+def test_status_file_tracks_pending_models():
+    """status.json lists every job and ends with complete and failed counts"""
+    with tempfile.TemporaryDirectory() as workspace:
+        downloader = PublishingDownloader(workspace)
+        downloader.max_concurrent_downloads = 1
+        jobs = [{'source': 'civitai', 'category': 'loras', 'item_id': item} for item in ('1', 'bad', '2')]
+        downloader.run_download_jobs(jobs)
+        downloader.status.finish()
+
+        assert downloader.seen_status[0]['pending'] == 3, "Nothing is complete before the first job"
+        status = json.loads(downloader.status.path.read_text())
+        assert status['state'] == 'complete'
+        assert (status['pending'], status['complete'], status['failed']) == (0, 2, 1)
+
+
+def test_verified_models_are_published_immediately():
+    """Published models are renamed into models/ and leave nothing for the organizer"""
+    with tempfile.TemporaryDirectory() as workspace:
+        downloader = PublishingDownloader(workspace)
+        downloader.run_download_jobs([{'source': 'civitai', 'category': 'loras', 'item_id': '1'}])
+        assert (Path(workspace) / "models" / "loras" / "1.safetensors").read_bytes() == b"weights"
+        assert not (Path(workspace) / "downloads_tmp" / "loras" / "1.safetensors").exists()
+
+
+if __name__ == "__main__":
+    print("Running progressive startup tests for nexis_downloader.py")
+    test_status_file_tracks_pending_models()
+    test_verified_models_are_published_immediately()
+    print("🎉 All progressive startup tests passed!")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tests for host-aware retries, circuit breakers and job requeueing
+"""
+
+import sys
+import os
+import tempfile
+import time
+from email.utils import formatdate
+
+# Add the scripts and benchmarks directories to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import requests
+
+from nexis_downloader import NexisDownloader
+from nexis_retry import HostRetry, HostUnavailable, parse_retry_after
+from standin_server import StandinServer
+
+
+def _response(status, retry_after=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = b''
+    response._content_consumed = True
+    if retry_after is not None:
+        response.headers['Retry-After'] = retry_after
+    return response
+
+
+def test_parse_retry_after():
+    """Both delta-seconds and HTTP-date forms are understood"""
+    assert parse_retry_after("7") == 7.0
+    assert 25 < parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_call_honours_retry_after():
+    """A 429 is retried after the server's Retry-After instead of the backoff"""
+    retry = HostRetry(base_delay=30, max_delay=5)
+    replies = [_response(429, "1"), _response(200)]
+    started = time.monotonic()
+    response = retry.call("api.example", lambda: replies.pop(0))
+    elapsed = time.monotonic() - started
+    assert response.status_code == 200
+    assert 0.9 < elapsed < 2.0, elapsed
+
+    # Client errors are not retried and do not count against the host
+    assert retry.call("api.example", lambda: _response(404)).status_code == 404
+    assert abs(retry.failure_rate("api.example") - 1 / 3) < 1e-9
+
+
+def test_circuit_breaker():
+    """Repeated failures pause a host; a long Retry-After pauses it at once"""
+    events = []
+    retry = HostRetry(attempts=2, base_delay=0.01, failure_threshold=3, cooldown=0.3,
+                      emit=lambda event, **fields: events.append((event, fields.get('state'))))
+    calls = []
+
+    def failing():
+        calls.append(1)
+        return _response(503)
+
+    assert retry.call("cdn.example", failing).status_code == 503
+    assert len(calls) == 2
+    try:
+        retry.call("cdn.example", failing)
+        raise AssertionError("The third failure must open the circuit")
+    except HostUnavailable as e:
+        assert e.host == "cdn.example"
+    try:
+        retry.check("cdn.example")
+        raise AssertionError("Calls to an open circuit must be refused")
+    except HostUnavailable:
+        pass
+    retry.check("other.example")
+
+    time.sleep(0.35)
+    assert retry.call("cdn.example", lambda: _response(200)).status_code == 200
+    assert ('circuit', 'open') in events and ('circuit', 'closed') in events
+
+    retry.record_failure("slow.example", 429, retry_after=3600)
+    assert retry.is_open("slow.example")
+
+
+def test_paused_jobs_are_requeued():
+    """A job whose host is paused runs again after the pause while others continue"""
+    with tempfile.TemporaryDirectory() as workspace:
+        downloader = NexisDownloader(workspace_dir=workspace)
+        downloader.create_directory_structure()
+        order = []
+        paused = {'count': 0}
+
+        def download(model_id, model_type, token=None):
+            if model_id == '1' and paused['count'] == 0:
+                paused['count'] += 1
+                raise HostUnavailable("rate-limited.example", time.monotonic() + 0.3)
+            order.append(model_id)
+            return True
+
+        downloader.download_civitai_model = download
+        jobs = [{'source': 'civitai', 'category': 'loras', 'item_id': str(i)} for i in (1, 2, 3)]
+        results = downloader.run_download_jobs(jobs)
+
+        assert results['loras'] == {'successful': 3, 'failed': 0}
+        assert sorted(order[:2]) == ['2', '3'] and order[2] == '1', order
+        assert downloader.status.counts()['complete'] == 3
+
+
+def test_download_through_rate_limits():
+    """Metadata and file requests are retried through 429 replies"""
+    with StandinServer(rate_limited_requests=2) as server, tempfile.TemporaryDirectory() as workspace:
+        server.add_civitai_model(31, "limited.safetensors", os.urandom(512 * 1024))
+        downloader = NexisDownloader(workspace_dir=workspace)
+        downloader.civitai_api_base = server.url
+        downloader.retry.base_delay = 0.01
+        downloader.create_directory_structure()
+
+        assert downloader.download_civitai_model('31', 'checkpoints')
+        assert server.stats['rate_limited'] >= 4
+        assert any(e['event'] == 'retry' for e in downloader.metrics.events)
+
+
+if __name__ == "__main__":
+    print("Running retry and circuit breaker tests")
+    test_parse_retry_after()
+    test_call_honours_retry_after()
+    test_circuit_breaker()
+    test_paused_jobs_are_requeued()
+    test_download_through_rate_limits()
+    print("🎉 All retry and circuit breaker tests passed!")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tests for the structural safetensors check (nexis_safetensors.py) and its use in nexis_downloader.py
+"""
+
+import sys
+import os
+import json
+import struct
+import tempfile
+from pathlib import Path
+
+# Add the scripts and benchmarks directories to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import requests
+
+from nexis_downloader import NexisDownloader
+from nexis_safetensors import InvalidSafetensors, check, check_all, find_files, quarantine
+from standin_server import StandinServer
+
+
+def _safetensors(tensors, header_extra=None):
+    """Build a file from {name: (dtype, shape, nbytes)} laid out back to back"""
+    header, offset = {'__metadata__': {'format': 'pt'}}, 0
+    for name, (dtype, shape, nbytes) in tensors.items():
+        header[name] = {'dtype': dtype, 'shape': shape, 'data_offsets': [offset, offset + nbytes]}
+        offset += nbytes
+    header.update(header_extra or {})
+    raw = json.dumps(header).encode()
+    return struct.pack('<Q', len(raw)) + raw + os.urandom(offset)
+
+
+VALID = _safetensors({'w': ('F16', [4, 8], 64), 'b': ('F32', [8], 32), 'x': ('NEW_DTYPE', [3], 7)})
+
+
+def _expect_invalid(path, fragment):
+    try:
+        check(path)
+    except InvalidSafetensors as e:
+        assert fragment in str(e), str(e)
+    else:
+        raise AssertionError(f"{path.name} should be rejected ({fragment})")
+
+
+def test_check_accepts_valid_and_rejects_broken_files():
+    """Truncation, padding, bad offsets, size mismatches and garbled headers are all caught"""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / "valid.safetensors").write_bytes(VALID)
+        assert check(tmp / "valid.safetensors") == 3
+
+        cases = {
+            'truncated': (VALID[:-5], "truncated"),
+            'padded': (VALID + b'\0' * 16, "trailing bytes"),
+            'tiny': (b'\x01\x02', "too short"),
+            'huge_header': (struct.pack('<Q', 1 << 40) + b'{}', "does not fit"),
+            'garbled': (struct.pack('<Q', 4) + b'{{{{', "not valid JSON"),
+            'size': (_safetensors({'w': ('F16', [4, 8], 60)}), "expected 64"),
+            'gap': (_safetensors({'w': ('U8', [4], 4)}, {'v': {'dtype': 'U8', 'shape': [2],
+                                                               'data_offsets': [6, 8]}}), "gap"),
+            'overlap': (_safetensors({'w': ('U8', [4], 4)}, {'v': {'dtype': 'U8', 'shape': [2],
+                                                                   'data_offsets': [2, 4]}}), "overlaps"),
+            'malformed': (_safetensors({}, {'v': {'dtype': 'U8'}}), "malformed"),
+            'string_offsets': (_safetensors({}, {'v': {'dtype': 'U8', 'shape': [4],
+                                                       'data_offsets': ["0", 4]}}), "invalid shape or offsets"),
+            'list_dtype': (_safetensors({}, {'v': {'dtype': ['U8'], 'shape': [0],
+                                                   'data_offsets': [0, 0]}}), "invalid shape or offsets"),
+        }
+        for name, (data, fragment) in cases.items():
+            path = tmp / f"{name}.safetensors"
+            path.write_bytes(data)
+            _expect_invalid(path, fragment)
+
+        files = find_files([tmp])
+        broken = check_all(files, workers=4)
+        assert set(broken) == {tmp / f"{name}.safetensors" for name in cases}
+
+
+def test_quarantine_drops_the_shared_store_blob():
+    """A broken model is moved out of models/ and its hardlinked store blob is removed"""
+    with tempfile.TemporaryDirectory() as workspace:
+        workspace = Path(workspace)
+        models_dir = workspace / "models"
+        model = models_dir / "loras" / "broken.safetensors"
+        blob = workspace / ".nexis" / "store" / "sha256" / "ab" / ("ab" + "0" * 62)
+        model.parent.mkdir(parents=True)
+        blob.parent.mkdir(parents=True)
+        blob.write_bytes(VALID[:-1])
+        os.link(blob, model)
+
+        dest = quarantine(model, models_dir, workspace / "debug" / "corrupted_models",
+                          workspace / ".nexis" / "store")
+        assert dest == workspace / "debug" / "corrupted_models" / "loras" / "broken.safetensors"
+        assert dest.read_bytes() == VALID[:-1]
+        assert not model.exists() and not blob.exists()
+
+
+def test_downloader_rejects_broken_files_without_a_hash():
+    """Files the hub publishes no SHA256 for are checked structurally after download"""
+    with StandinServer() as server, tempfile.TemporaryDirectory() as workspace:
+        # Files under 1 KiB get no LFS entry, so the listing carries no hash for them
+        server.add_hf_repo("org/small", {"adapter.safetensors": VALID})
+        server.add_hf_repo("org/broken", {"adapter.safetensors": VALID[:-3]})
+
+        downloader = NexisDownloader(debug_mode=False, workspace_dir=workspace)
+        downloader.session = requests.Session()
+        downloader.hf_endpoint = server.url
+        downloader.hf_backend = 'native'
+
+        assert downloader.download_hf_repo("org/small")
+        assert not downloader.download_hf_repo("org/broken")
+        hf_dir = Path(workspace) / "downloads_tmp" / "huggingface"
+        assert (hf_dir / "org/small/adapter.safetensors").read_bytes() == VALID
+        assert not (hf_dir / "org/broken/adapter.safetensors").exists()
+
+
+if __name__ == "__main__":
+    print("Running safetensors structure tests")
+    test_check_accepts_valid_and_rejects_broken_files()
+    test_quarantine_drops_the_shared_store_blob()
+    test_downloader_rejects_broken_files_without_a_hash()
+    print("🎉 All safetensors structure tests passed!")
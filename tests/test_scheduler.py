@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for the concurrent download scheduler in nexis_downloader.py
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+
+# Add the scripts directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from nexis_downloader import NexisDownloader
+
+
+class RecordingDownloader(NexisDownloader):
+    """Downloader whose jobs sleep instead of downloading and record concurrency"""
+
+    def __init__(self, fail_ids=()):
+        # A throwaway workspace so state and metrics never land in the default one
+        self.workspace = tempfile.TemporaryDirectory()
+        super().__init__(debug_mode=False, workspace_dir=self.workspace.name)
+        self.fail_ids = set(fail_ids)
+        self.lock = threading.Lock()
+        self.active = {'total': 0, 'hf': 0, 'civitai': 0}
+        self.peak = {'total': 0, 'hf': 0, 'civitai': 0}
+
+    def _run_download_job(self, job, hf_token=None, civitai_token=None):
+        with self.lock:
+            for key in ('total', job['source']):
+                self.active[key] += 1
+                self.peak[key] = max(self.peak[key], self.active[key])
+        time.sleep(0.05)
+        with self.lock:
+            for key in ('total', job['source']):
+                self.active[key] -= 1
+        if job['item_id'] in self.fail_ids:
+            raise RuntimeError("simulated failure")
+        return True
+
+
+def _jobs():
+    jobs = [{'source': 'hf', 'category': 'huggingface', 'item_id': f"org/repo{i}"} for i in range(4)]
+    jobs += [{'source': 'civitai', 'category': 'checkpoints', 'item_id': str(i)} for i in range(5)]
+    jobs += [{'source': 'civitai', 'category': 'loras', 'item_id': str(100 + i)} for i in range(5)]
+    return jobs
+
+
+def test_limits_are_respected():
+    """Global and per-source limits are never exceeded, but sources overlap"""
+    downloader = RecordingDownloader()
+    downloader.max_concurrent_downloads = 4
+    downloader.source_limits = {'hf': 1, 'civitai': 3}
+
+    results = downloader.run_download_jobs(_jobs())
+
+    assert downloader.peak['total'] == 4, "Should fill the global pool"
+    assert downloader.peak['hf'] == 1, "Should respect the HF limit"
+    assert downloader.peak['civitai'] == 3, "Should respect the CivitAI limit"
+    assert results == {
+        'huggingface': {'successful': 4, 'failed': 0},
+        'checkpoints': {'successful': 5, 'failed': 0},
+        'loras': {'successful': 5, 'failed': 0},
+    }
+
+
+def test_failures_are_counted_per_category():
+    """A raising job is counted as failed without stopping the others"""
+    downloader = RecordingDownloader(fail_ids={'1', '102'})
+
+    results = downloader.run_download_jobs(_jobs())
+
+    assert results['checkpoints'] == {'successful': 4, 'failed': 1}
+    assert results['loras'] == {'successful': 4, 'failed': 1}
+    assert results['huggingface'] == {'successful': 4, 'failed': 0}
+
+
+if __name__ == "__main__":
+    print("Running scheduler tests for nexis_downloader.py")
+    test_limits_are_respected()
+    test_failures_are_counted_per_category()
+    print("🎉 All scheduler tests passed!")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for seed pack export and import (nexis_seedpack.py and nexis_downloader.py)
+"""
+
+import sys
+import os
+import hashlib
+import tempfile
+from pathlib import Path
+
+# Add the scripts and benchmarks directories to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import nexis_downloader
+from nexis_downloader import NexisDownloader
+from nexis_seedpack import SeedPack
+from standin_server import StandinServer
+
+MB = 1024 * 1024
+
+
+def _populate(workspace):
+    """A few models as a finished download run leaves them, one of them in the store under an alias"""
+    downloader = NexisDownloader(workspace_dir=workspace)
+    models = Path(workspace) / "models"
+    files = {
+        "checkpoints/base.safetensors": os.urandom(2 * MB + 17),
+        "loras/style.safetensors": os.urandom(300 * 1024),
+        "loras/detail.safetensors": os.urandom(5000),
+        "org/repo/config.json": b'{"a": 1}',
+    }
+    for relative, data in files.items():
+        (models / relative).parent.mkdir(parents=True, exist_ok=True)
+        (models / relative).write_bytes(data)
+    checkpoint = models / "checkpoints/base.safetensors"
+    downloader.store.ingest(checkpoint, hashlib.sha256(files["checkpoints/base.safetensors"]).hexdigest(),
+                            alias="civitai:80")
+    return downloader, files
+
+
+def test_export_and_selective_import():
+    """Selected entries are restored and verified; a corrupted entry is rejected, the rest still import"""
+    with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as target:
+        downloader, files = _populate(source)
+        pack_path = Path(source) / "seed.nxpk"
+        assert downloader.export_seed_pack(pack_path) == 4
+
+        with SeedPack(pack_path) as pack:
+            entries = {entry['path']: entry for entry in pack.entries}
+            assert entries["checkpoints/base.safetensors"]['aliases'] == ["civitai:80"]
+            assert all(entry['offset'] % 4096 == 0 for entry in pack.entries)
+            data_offset = pack.data_offset
+
+        restorer = NexisDownloader(workspace_dir=target)
+        assert restorer.import_seed_pack(pack_path, ["loras", "org/repo"]) == 0
+        models = Path(target) / "models"
+        for relative in ("loras/style.safetensors", "loras/detail.safetensors", "org/repo/config.json"):
+            assert (models / relative).read_bytes() == files[relative]
+            assert restorer.verified.lookup(models / relative) == hashlib.sha256(files[relative]).hexdigest()
+        assert not (models / "checkpoints").exists(), "Only the selected entries are extracted"
+
+        # Flip one byte of the checkpoint inside the pack
+        offset = data_offset + entries["checkpoints/base.safetensors"]['offset'] + 1000
+        with open(pack_path, 'r+b') as f:
+            f.seek(offset)
+            byte = f.read(1)
+            f.seek(offset)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        (models / "loras/style.safetensors").unlink()
+        assert restorer.import_seed_pack(pack_path) == 1
+        assert not (models / "checkpoints/base.safetensors").exists()
+        assert not list((models / "checkpoints").iterdir()), "No temporary file is left behind"
+        assert (models / "loras/style.safetensors").read_bytes() == files["loras/style.safetensors"]
+
+
+def test_import_over_http_replaces_downloads():
+    """A pod seeded over HTTP gets a model its sources no longer serve, with one ranged stream"""
+    data = os.urandom(3 * MB)
+    with StandinServer() as server, tempfile.TemporaryDirectory() as source, \
+            tempfile.TemporaryDirectory() as target:
+        server.add_civitai_model(81, "seeded.safetensors", data)
+        environ = dict(os.environ)
+        os.environ.update({'CIVITAI_API_BASE': server.url, 'CIVITAI_CHECKPOINTS_TO_DOWNLOAD': '81',
+                           'NEXIS_DISK_RESERVE_MB': '1'})
+        try:
+            os.environ['WORKSPACE'] = source
+            assert nexis_downloader.main([]) == 0
+            pack_path = Path(source) / "seed.nxpk"
+            assert nexis_downloader.main(['export', str(pack_path), 'checkpoints']) == 0
+
+            url = server.add_file("seed.nxpk", pack_path.read_bytes())
+            del server.models['81']
+            server.reset_stats()
+            os.environ.update({'WORKSPACE': target, 'NEXIS_SEED_PACK': url})
+            assert nexis_downloader.main([]) == 0
+            seeded = dict(server.stats)
+
+            server.reset_stats()
+            assert nexis_downloader.main([]) == 0
+            assert server.stats['requests'] == 0, "A warm restart does not touch the seed pack"
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
+        assert (Path(target) / "models" / "checkpoints" / "seeded.safetensors").read_bytes() == data
+        assert seeded['range_requests'] == 3, "Header, index and one stream for the data"
+
+
+if __name__ == "__main__":
+    print("Running seed pack tests")
+    test_export_and_selective_import()
+    test_import_over_http_replaces_downloads()
+    print("🎉 All seed pack tests passed!")
@@ -98,9 +98,9 @@ echo "Testing enhanced signal handling..."
 
 # Start container and get service manager PID
 docker exec $TEST_CONTAINER bash -c "
-echo 'Getting service manager PID...'
-pgrep -f service_manager.sh || echo 'Service manager not found'
-ps aux | grep -E '(service_manager|comfyui|filebrowser)' | grep -v grep
+echo 'Getting supervisor PID...'
+pgrep -f nexis_supervisor.py || echo 'Supervisor not found'
+ps aux | grep -E '(nexis_supervisor|comfyui|filebrowser)' | grep -v grep
 "
 
 # Test SIGTERM forwarding
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for cross-process single-flight downloads in nexis_downloader.py
+"""
+
+import sys
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+
+# Add the scripts and benchmarks directories to the path
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from nexis_locks import FileLock, LockTimeout, lock_name, single_flight
+from nexis_store import ModelStore
+from standin_server import StandinServer
+
+DOWNLOAD = """
+import sys
+sys.path.insert(0, {scripts!r})
+from nexis_downloader import NexisDownloader
+downloader = NexisDownloader(workspace_dir={workspace!r})
+downloader.create_directory_structure()
+sys.exit(0 if downloader.download_civitai_model('77', 'checkpoints') else 1)
+"""
+
+
+def test_lock_excludes_and_times_out():
+    """A held lock makes others wait, and report that they waited"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        locks_dir = Path(temp_dir)
+        holder = FileLock(locks_dir / "sha256-abc.lock")
+        holder.acquire()
+        try:
+            try:
+                with single_flight(locks_dir, "sha256-abc", timeout=0.6):
+                    raise AssertionError("The lock must not be granted while held")
+            except LockTimeout:
+                pass
+        finally:
+            holder.release()
+        with single_flight(locks_dir, "sha256-abc") as waited:
+            assert waited is False
+
+
+def test_lock_names_stay_distinct():
+    """Long or rewritten keys keep their own lock instead of sharing a truncated name"""
+    prefix = "hf-org/repo-" + "a" * 250
+    first, second = lock_name(prefix + "/unet/model.safetensors"), lock_name(prefix + "/vae/model.safetensors")
+    assert first != second
+    assert len(first) <= 210 and first.endswith('.lock')
+    assert lock_name("hf:org/a b") != lock_name("hf:org/a_b")
+    assert lock_name("sha256-0123abcd") == "sha256-0123abcd.lock", "Safe keys keep a readable name"
+
+
+def test_store_instances_merge_updates():
+    """Two stores on one directory keep each other's aliases instead of overwriting them"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        first = ModelStore(Path(temp_dir))
+        second = ModelStore(Path(temp_dir))
+        first.add_alias("civitai:1", "a" * 64, "one.safetensors")
+        second.add_alias("civitai:2", "b" * 64, "two.safetensors")
+        merged = ModelStore(Path(temp_dir))
+        assert set(merged._index["aliases"]) == {"civitai:1", "civitai:2"}
+
+
+def test_concurrent_processes_download_once():
+    """Two processes asking for the same model transfer its bytes only once"""
+    size = 4 * 1024 * 1024
+    with StandinServer(bandwidth_bps=8 * 1024 * 1024) as server, tempfile.TemporaryDirectory() as workspace:
+        server.add_civitai_model(77, "shared.safetensors", os.urandom(size))
+        env = {**os.environ, 'CIVITAI_API_BASE': server.url, 'NEXIS_MAX_CONNECTIONS_PER_HOST': '1'}
+        code = DOWNLOAD.format(scripts=os.path.abspath(SCRIPTS_DIR), workspace=workspace)
+        processes = [subprocess.Popen([sys.executable, '-c', code], env=env, stdout=subprocess.PIPE,
+                                      stderr=subprocess.STDOUT, text=True) for _ in range(2)]
+        outputs = [p.communicate(timeout=120)[0] for p in processes]
+        assert [p.returncode for p in processes] == [0, 0], outputs
+        assert server.stats['bytes_sent'] < 2 * size, "The second process must reuse the first download"
+        assert any("another process" in output for output in outputs)
+
+
+if __name__ == "__main__":
+    print("Running single-flight tests for nexis_downloader.py")
+    test_lock_excludes_and_times_out()
+    test_lock_names_stay_distinct()
+    test_store_instances_merge_updates()
+    test_concurrent_processes_download_once()
+    print("🎉 All single-flight tests passed!")
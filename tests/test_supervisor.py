@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the process supervisor (nexis_supervisor.py)
+"""
+
+import sys
+import os
+import signal
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add the scripts directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from nexis_supervisor import Service, Supervisor
+
+SERVER = """
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+HTTPServer(('127.0.0.1', int(sys.argv[1])), Handler).serve_forever()
+"""
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def _supervisor(services, metrics_dir=None, **kwargs):
+    options = dict(probe_interval=0.02, probe_timeout=1.0, startup_timeout=10.0, check_interval=0.1,
+                   backoff_base=0.05, backoff_max=0.2, stop_grace=2.0)
+    options.update(kwargs)
+    return Supervisor(services, lambda message: None, metrics_dir=metrics_dir, **options)
+
+
+def test_crashed_service_is_restarted_in_place():
+    """A killed child is restarted and ready again quickly; metrics record the recovery"""
+    port = _free_port()
+    service = Service("web", [sys.executable, '-c', SERVER, str(port)], f"http://127.0.0.1:{port}/")
+    with tempfile.TemporaryDirectory() as metrics_dir:
+        supervisor = _supervisor([service], Path(metrics_dir))
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(code=supervisor.run()))
+        thread.start()
+        try:
+            _until(lambda: service.state == 'ready')
+            first_pid = service.process.pid
+
+            crashed = time.monotonic()
+            os.kill(first_pid, signal.SIGKILL)
+            _until(lambda: service.state == 'ready' and service.process and service.process.pid != first_pid)
+            assert time.monotonic() - crashed < 5
+            assert supervisor.restarts[("web", "exit")] == 1
+            assert supervisor.recovery_latency.count(service="web") == 1
+        finally:
+            supervisor.stop()
+            thread.join(10)
+        assert result['code'] == 0
+        assert service.state == 'stopped'
+
+        prom = (Path(metrics_dir) / "nexis_supervisor.prom").read_text()
+        assert 'nexis_supervisor_restarts_total{service="web",reason="exit"} 1' in prom
+        assert 'nexis_supervisor_probe_duration_seconds_bucket{phase="readiness",result="ok",service="web"' in prom
+        assert 'nexis_supervisor_recovery_seconds_count{service="web"} 1' in prom
+
+
+def test_crash_loop_gives_up():
+    """A required service that keeps dying exhausts its restart budget and fails the supervisor"""
+    port = _free_port()
+    service = Service("broken", [sys.executable, '-c', 'import sys; sys.exit(3)'], f"http://127.0.0.1:{port}/")
+    supervisor = _supervisor([service], restart_limit=2)
+    assert supervisor.run() == 1
+    assert service.state == 'failed'
+    assert supervisor.restarts[("broken", "exit")] == 3
+
+
+def test_optional_service_failure_is_tolerated():
+    """An optional service that cannot start does not stop the required one"""
+    port = _free_port()
+    web = Service("web", [sys.executable, '-c', SERVER, str(port)], f"http://127.0.0.1:{port}/")
+    extra = Service("extra", ["/nonexistent/binary"], "http://127.0.0.1:1/", required=False)
+    supervisor = _supervisor([web, extra], restart_limit=1)
+    thread = threading.Thread(target=supervisor.run)
+    thread.start()
+    try:
+        _until(lambda: extra.state == 'failed' and web.state == 'ready')
+    finally:
+        supervisor.stop()
+        thread.join(10)
+    assert supervisor.exit_code == 0
+
+
+if __name__ == "__main__":
+    print("Running supervisor tests")
+    test_crashed_service_is_restarted_in_place()
+    test_crash_loop_gives_up()
+    test_optional_service_failure_is_tolerated()
+    print("🎉 All supervisor tests passed!")
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Tests for the segmented range download engine used by nexis_downloader.py
+"""
+
+import sys
+import os
+import hashlib
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add the scripts directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import requests
+
+from nexis_downloader import NexisDownloader
+from nexis_hashing import StreamingHasher, hash_file
+from nexis_retry import HostRetry
+from nexis_transfer import SegmentedDownloader
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 4321)
+EXPECTED = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves PAYLOAD, honouring Range headers unless the server disables them"""
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get('Range'))
+        byte_range = self.headers.get('Range')
+        if byte_range and byte_range != 'bytes=0-0' and self.server.ranges:
+            self.server.served_ranges.append(byte_range)
+            if self.server.piece_status:
+                self.send_response(self.server.piece_status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+        if byte_range and self.server.ranges:
+            start, end = byte_range.split('=')[1].split('-')
+            start, end = int(start), min(int(end or len(PAYLOAD) - 1), len(PAYLOAD) - 1)
+            body = PAYLOAD[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(PAYLOAD)}')
+        else:
+            body = PAYLOAD
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', self.server.etag)
+        self.end_headers()
+        if self.server.budget is not None and byte_range != 'bytes=0-0':
+            # Simulate the link dropping once the budget of bytes has been served
+            allowed = max(0, min(len(body), self.server.budget))
+            self.server.budget -= allowed
+            self.wfile.write(body[:allowed])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(ranges=True, budget=None, etag='"payload-v1"', piece_status=None):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    server.ranges = ranges
+    server.piece_status = piece_status
+    server.budget = budget
+    server.etag = etag
+    server.requests = []
+    server.served_ranges = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _download(server, workspace):
+    downloader = NexisDownloader(debug_mode=False, workspace_dir=workspace)
+    downloader.session = requests.Session()
+    downloader.segment_size = 256 * 1024
+    output_file = Path(workspace) / "model.safetensors"
+    digest = downloader._http_download(f"http://127.0.0.1:{server.server_port}/model", output_file)
+    return output_file, digest
+
+
+def test_segmented_download_uses_ranges():
+    """Pieces are fetched with several range requests and hashed as they land"""
+    server = _serve()
+    try:
+        with tempfile.TemporaryDirectory() as workspace:
+            output_file, digest = _download(server, workspace)
+            assert digest == EXPECTED
+            assert output_file.read_bytes() == PAYLOAD
+            assert not Path(f"{output_file}.part").exists(), "Part file should be renamed into place"
+            piece_requests = [r for r in server.requests if r and r != 'bytes=0-0']
+            assert len(piece_requests) == 13, "One request per 256 KiB piece"
+    finally:
+        server.shutdown()
+
+
+def test_client_errors_on_ranges_fail_without_retrying():
+    """A 403 or 404 for a piece fails the download at once instead of backing off"""
+    for status in (403, 404):
+        server = _serve(piece_status=status)
+        try:
+            with tempfile.TemporaryDirectory() as workspace:
+                part_file = Path(workspace) / "model.safetensors.part"
+                engine = SegmentedDownloader(requests.Session(), lambda *a, **k: None, max_connections=1,
+                                             piece_size=len(PAYLOAD), retry=HostRetry(attempts=5))
+                started = time.monotonic()
+                try:
+                    engine.download(f"http://127.0.0.1:{server.server_port}/model", part_file)
+                    raise AssertionError(f"HTTP {status} for a range should fail the download")
+                except requests.HTTPError as e:
+                    assert e.response.status_code == status
+                assert time.monotonic() - started < 1.0, "No backoff for an error that will not recover"
+                assert len(server.served_ranges) == 1
+        finally:
+            server.shutdown()
+
+
+class CountingHasher(StreamingHasher):
+    """Counts the bytes read back from disk instead of hashed from memory"""
+
+    read_back = 0
+
+    def _read_from_disk(self, end):
+        self.read_back += end - self.hashed_offset
+        super()._read_from_disk(end)
+
+
+def test_in_order_pieces_are_hashed_without_read_back():
+    """A clean download hashes in-order pieces from memory and never re-reads the file"""
+    server = _serve()
+    try:
+        with tempfile.TemporaryDirectory() as workspace:
+            part_file = Path(workspace) / "model.safetensors.part"
+            engine = SegmentedDownloader(requests.Session(), lambda *a, **k: None,
+                                         max_connections=1, piece_size=256 * 1024)
+            hasher = CountingHasher(part_file)
+            result = engine.download(f"http://127.0.0.1:{server.server_port}/model", part_file, hasher)
+            assert len(server.served_ranges) == 13
+            assert hasher.hexdigest(result['size']) == EXPECTED
+            assert hasher.read_back == 0
+    finally:
+        server.shutdown()
+
+
+def test_server_without_ranges_falls_back_to_one_stream():
+    """A 200 reply to the probe is used as a single full-body stream"""
+    server = _serve(ranges=False)
+    try:
+        with tempfile.TemporaryDirectory() as workspace:
+            output_file, digest = _download(server, workspace)
+            assert digest == EXPECTED
+            assert output_file.read_bytes() == PAYLOAD
+            assert len(server.requests) == 1
+    finally:
+        server.shutdown()
+
+
+def test_failing_host_is_retried_once_per_attempt():
+    """Piece retries are the only retry layer: one probe, then one request per allowed attempt"""
+    server = _serve(budget=0)
+    try:
+        with tempfile.TemporaryDirectory() as workspace:
+            downloader = NexisDownloader(debug_mode=False, workspace_dir=workspace)
+            downloader.session = requests.Session()
+            downloader.segment_size = len(PAYLOAD)
+            downloader.retry = HostRetry(attempts=3, base_delay=0.01, failure_threshold=100)
+            try:
+                downloader._http_download(f"http://127.0.0.1:{server.server_port}/model",
+                                          Path(workspace) / "model.safetensors")
+                raise AssertionError("A host that never sends the body should fail the download")
+            except requests.RequestException:
+                pass
+            assert len(server.requests) == 1 + 3, server.requests
+            host = f"127.0.0.1:{server.server_port}"
+            assert downloader.retry.failure_rate(host) == 3 / 4, "Each failure is counted once"
+    finally:
+        server.shutdown()
+
+
+def _engine_download(server, part_file):
+    engine = SegmentedDownloader(requests.Session(), lambda *a, **k: None,
+                                 piece_size=256 * 1024, max_piece_attempts=1)
+    journal = Path(f"{part_file}.journal")
+    hasher = StreamingHasher(part_file)
+    result = engine.download(f"http://127.0.0.1:{server.server_port}/model", part_file, hasher,
+                             journal_path=journal)
+    return result, hasher.hexdigest(result['size'])
+
+
+def _interrupted_partial(workspace):
+    """Leave a journaled partial file behind, as a dropped link would"""
+    part_file = Path(workspace) / "model.safetensors.part"
+    server = _serve(budget=len(PAYLOAD) // 2)
+    try:
+        _engine_download(server, part_file)
+        raise AssertionError("The interrupted download should fail")
+    except requests.RequestException:
+        pass
+    finally:
+        server.shutdown()
+    assert Path(f"{part_file}.journal").exists(), "A failed transfer keeps its journal"
+    return part_file
+
+
+def test_interrupted_download_resumes_from_journal():
+    """A second attempt only fetches the ranges the journal does not cover"""
+    with tempfile.TemporaryDirectory() as workspace:
+        part_file = _interrupted_partial(workspace)
+        server = _serve()
+        try:
+            result, digest = _engine_download(server, part_file)
+        finally:
+            server.shutdown()
+        assert digest == EXPECTED
+        assert part_file.read_bytes() == PAYLOAD
+        assert result['resumed_bytes'] > 0, "Journaled bytes should be reused"
+        assert len(server.served_ranges) < 13, "Already journaled pieces must not be fetched again"
+
+
+def test_corrupted_journaled_range_is_hashed_after_refetch():
+    """A journaled range failing its CRC32 is fetched again and hashed from the new bytes"""
+    with tempfile.TemporaryDirectory() as workspace:
+        part_file = _interrupted_partial(workspace)
+        journal = json.loads(Path(f"{part_file}.journal").read_text())
+        start, end, _ = min(journal['ranges'])
+        with open(part_file, 'r+b') as f:
+            f.seek((start + end) // 2)
+            f.write(b'\xff' * 16)
+        server = _serve()
+        try:
+            result, digest = _engine_download(server, part_file)
+        finally:
+            server.shutdown()
+        assert part_file.read_bytes() == PAYLOAD
+        assert digest == hash_file(part_file) == EXPECTED
+        assert result['resumed_bytes'] > 0, "The other journaled ranges are still reused"
+
+
+def test_resume_is_refused_when_remote_changed():
+    """A different ETag discards the partial file and downloads from scratch"""
+    with tempfile.TemporaryDirectory() as workspace:
+        part_file = _interrupted_partial(workspace)
+        server = _serve(etag='"payload-v2"')
+        try:
+            result, digest = _engine_download(server, part_file)
+        finally:
+            server.shutdown()
+        assert digest == EXPECTED
+        assert result['resumed_bytes'] == 0
+        assert len(server.served_ranges) == 13
+
+
+if __name__ == "__main__":
+    print("Running transfer engine tests for nexis_downloader.py")
+    test_segmented_download_uses_ranges()
+    test_in_order_pieces_are_hashed_without_read_back()
+    test_server_without_ranges_falls_back_to_one_stream()
+    test_failing_host_is_retried_once_per_attempt()
+    test_client_errors_on_ranges_fail_without_retrying()
+    test_interrupted_download_resumes_from_journal()
+    test_corrupted_journaled_range_is_hashed_after_refetch()
+    test_resume_is_refused_when_remote_changed()
+    print("🎉 All transfer engine tests passed!")
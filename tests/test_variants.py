@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for CivitAI file variant selection (nexis_variants.py and nexis_downloader.py)
+"""
+
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Add the scripts and benchmarks directories to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import nexis_downloader
+from nexis_variants import parse_civitai_spec, parse_policy, select_variant, variant_url
+from standin_server import StandinServer
+
+FILES = [
+    {'name': 'full.safetensors', 'size': 6000, 'type': 'Model', 'primary': True,
+     'metadata': {'format': 'SafeTensor', 'fp': 'fp32', 'size': 'full'}},
+    {'name': 'pruned.ckpt', 'size': 2000, 'type': 'Model', 'primary': False,
+     'metadata': {'format': 'PickleTensor', 'fp': 'fp16', 'size': 'pruned'}},
+    {'name': 'pruned.safetensors', 'size': 2100, 'type': 'Model', 'primary': False,
+     'metadata': {'format': 'SafeTensor', 'fp': 'fp16', 'size': 'pruned'}},
+    {'name': 'training.zip', 'size': 10, 'type': 'Training Data', 'primary': False, 'metadata': {}},
+]
+
+
+def test_policies_and_selection():
+    """Preferences rank files in order; unmatched preferences still pick a model file"""
+    assert parse_policy(" FP16, pruned;safetensors,fp16 ") == ['fp16', 'pruned', 'safetensors']
+    assert parse_civitai_spec("123") == ('123', None)
+    assert parse_civitai_spec("123?variant=fp16;smallest") == ('123', 'fp16;smallest')
+    try:
+        parse_policy("fp16,tiny")
+    except ValueError as e:
+        assert 'tiny' in str(e)
+    else:
+        raise AssertionError("unknown preferences must be rejected")
+
+    assert select_variant(FILES, ['fp16', 'pruned', 'safetensors'])['name'] == 'pruned.safetensors'
+    assert select_variant(FILES, ['fp16', 'smallest'])['name'] == 'pruned.ckpt'
+    assert select_variant(FILES, ['smallest'])['name'] == 'pruned.ckpt', "training data is not a model"
+    assert select_variant(FILES, ['bf16'])['name'] == 'full.safetensors', "no match falls back to the primary"
+    assert select_variant([], ['fp16']) is None
+    assert variant_url("https://civitai.com", "9", FILES[2]) == \
+        "https://civitai.com/api/download/models/9?type=Model&format=SafeTensor&size=pruned&fp=fp16"
+
+
+def _run(workspace, server, checkpoints, environment=None):
+    environ = dict(os.environ)
+    os.environ.update({
+        'WORKSPACE': workspace,
+        'CIVITAI_API_BASE': server.url,
+        'CIVITAI_CHECKPOINTS_TO_DOWNLOAD': checkpoints,
+        'NEXIS_DISK_RESERVE_MB': '1',
+        **(environment or {}),
+    })
+    try:
+        return nexis_downloader.main([])
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+
+
+def test_downloader_follows_policies():
+    """Category and per-item policies pick the matching file; a policy change invalidates the lock-file"""
+    full, pruned = os.urandom(600 * 1024), os.urandom(200 * 1024)
+    with StandinServer() as server, tempfile.TemporaryDirectory() as workspace:
+        server.add_civitai_model(60, "model-fp32.safetensors", full,
+                                 {'format': 'SafeTensor', 'fp': 'fp32', 'size': 'full'})
+        server.add_civitai_variant(60, "model-fp16.safetensors", pruned,
+                                   {'format': 'SafeTensor', 'fp': 'fp16', 'size': 'pruned'})
+        checkpoints = Path(workspace) / "models" / "checkpoints"
+        policy = {'NEXIS_CIVITAI_VARIANT_CHECKPOINTS': 'fp16,pruned'}
+
+        assert _run(workspace, server, "60", policy) == 0
+        assert (checkpoints / "model-fp16.safetensors").read_bytes() == pruned
+        assert not (checkpoints / "model-fp32.safetensors").exists()
+
+        server.reset_stats()
+        assert _run(workspace, server, "60", policy) == 0
+        assert server.stats['requests'] == 0, "Same policy: served from the lock-file"
+        assert _run(workspace, server, "60") == 0
+        assert server.stats['requests'] > 0, "Without the policy the lock-file no longer applies"
+
+        assert _run(workspace, server, "60?variant=fp32", policy) == 0
+        assert (checkpoints / "model-fp32.safetensors").read_bytes() == full
+
+
+if __name__ == "__main__":
+    print("Running CivitAI variant tests")
+    test_policies_and_selection()
+    test_downloader_follows_policies()
+    print("🎉 All CivitAI variant tests passed!")